@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Cold start benchmark for the fastq sync lambdas
+
+Each lambda under app/lambdas is imported in a fresh python interpreter (as in a new lambda container),
+we record how long the handler module takes to import and how long the first handler call takes.
+
+The layer source directories are added to the python path, any other dependencies
+(i.e. orcabus_api_tools, boto3, aws_durable_execution_sdk_python) must already be importable,
+a lambda whose dependencies cannot be imported is reported with an import error.
+
+First calls are made with the sample events below (override them with --event-file),
+calls that need aws credentials or the orcabus apis will fail outside of aws,
+the error is recorded alongside the time taken to fail.
+
+Usage:
+  python app/benchmarks/cold_start.py [--repeat 5] [--lambda-name unlock_callback_id] [--output cold_start.json]
+"""
+
+# Standard library imports
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Globals
+APP_ROOT = Path(__file__).absolute().parent.parent
+LAMBDA_ROOT = APP_ROOT / "lambdas"
+LAYERS_ROOT = APP_ROOT / "layers"
+
+# Lambda name (snake case, without the _py suffix) -> sample event for the first call
+SAMPLE_EVENTS: Dict[str, Dict[str, Any]] = {
+    "check_fastq_id_list_against_requirements": {
+        "fastqIdList": ["fqr.01JQ3BEKS05C74XWT5PYED6KV5"],
+        "requirements": {"hasQc": True},
+    },
+    "check_running_jobs_for_fastq_id_list": {
+        "fastqIdList": ["fqr.01JQ3BEKS05C74XWT5PYED6KV5"],
+    },
+    "get_fastq_and_remaining_requirements": {
+        "fastqId": "fqr.01JQ3BEKS05C74XWT5PYED6KV5",
+        "requirements": ["hasQc"],
+    },
+    "handle_messages": {
+        "Records": [],
+    },
+    "launch_requirement_job": {
+        "fastqId": "fqr.01JQ3BEKS05C74XWT5PYED6KV5",
+        "requirementType": "hasQc",
+    },
+    "launch_requirements_for_fastq_id_list": {
+        "fastqIdList": ["fqr.01JQ3BEKS05C74XWT5PYED6KV5"],
+        "requirements": ["hasQc"],
+    },
+    "unlock_callback_id": {
+        "callbackId": None,
+    },
+    "update_task_token_store": {
+        "action": "UNREGISTER",
+        "taskToken": "task-token",
+        "fastqIdList": ["fqr.01JQ3BEKS05C74XWT5PYED6KV5"],
+    },
+}
+
+# Run in the fresh interpreter, prints a single json line
+COLD_START_SNIPPET = '''
+import json, sys, time
+lambda_name, event = sys.argv[1], json.loads(sys.argv[2])
+result = {"importSeconds": None, "firstCallSeconds": None, "error": None}
+start_time = time.perf_counter()
+try:
+    module = __import__(lambda_name)
+except Exception as e:
+    result["error"] = f"import: {type(e).__name__}: {e}"
+else:
+    result["importSeconds"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    try:
+        module.handler(event, None)
+    except Exception as e:
+        result["error"] = f"first call: {type(e).__name__}: {e}"
+    result["firstCallSeconds"] = time.perf_counter() - start_time
+print(json.dumps(result))
+'''
+
+
+def get_lambda_name_list() -> List[str]:
+    return sorted(map(
+        lambda lambda_dir_iter_: lambda_dir_iter_.name.removesuffix("_py"),
+        filter(
+            lambda lambda_dir_iter_: lambda_dir_iter_.is_dir() and lambda_dir_iter_.name.endswith("_py"),
+            LAMBDA_ROOT.iterdir()
+        )
+    ))
+
+
+def get_python_path(lambda_name: str) -> str:
+    return os.pathsep.join(
+        [
+            str(LAMBDA_ROOT / f"{lambda_name}_py"),
+            *map(str, sorted(LAYERS_ROOT.glob("*/src"))),
+        ] + (
+            [os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else []
+        )
+    )
+
+
+def run_cold_start(lambda_name: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Import the lambda and call its handler once, in a fresh python interpreter
+    """
+    process = subprocess.run(
+        [sys.executable, "-c", COLD_START_SNIPPET, lambda_name, json.dumps(event)],
+        env={
+            **os.environ,
+            "PYTHONPATH": get_python_path(lambda_name),
+            # Don't let a warm bytecode cache hide the compile time of a real cold start
+            "PYTHONDONTWRITEBYTECODE": "1",
+        },
+        capture_output=True,
+        text=True,
+    )
+
+    if process.returncode != 0:
+        return {
+            "importSeconds": None,
+            "firstCallSeconds": None,
+            "error": f"interpreter exited with {process.returncode}: {process.stderr.strip()[-500:]}",
+        }
+
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def benchmark_lambda(lambda_name: str, event: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """
+    Run the cold start repeat times, report the median import and first call times
+    """
+    run_list = [run_cold_start(lambda_name, event) for _ in range(repeat)]
+
+    def _median_or_none(key: str) -> Optional[float]:
+        value_list = [run_iter_[key] for run_iter_ in run_list if run_iter_[key] is not None]
+        return round(median(value_list), 6) if len(value_list) > 0 else None
+
+    return {
+        "lambdaName": lambda_name,
+        "repeat": repeat,
+        "importSeconds": _median_or_none("importSeconds"),
+        "firstCallSeconds": _median_or_none("firstCallSeconds"),
+        "errors": sorted(set(filter(None, map(lambda run_iter_: run_iter_["error"], run_list)))),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of cold starts per lambda")
+    parser.add_argument(
+        "--lambda-name", action="append", default=None,
+        help="Only benchmark this lambda (snake case, without the _py suffix), may be given more than once"
+    )
+    parser.add_argument("--event-file", type=Path, default=None, help="Json file of lambda name to sample event")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    sample_events = dict(SAMPLE_EVENTS)
+    if args.event_file is not None:
+        sample_events.update(json.loads(args.event_file.read_text()))
+
+    results = list(map(
+        lambda lambda_name_iter_: benchmark_lambda(
+            lambda_name_iter_,
+            sample_events.get(lambda_name_iter_, {}),
+            args.repeat,
+        ),
+        args.lambda_name if args.lambda_name else get_lambda_name_list()
+    ))
+
+    results_str = json.dumps(results, indent=2)
+    print(results_str)
+    if args.output is not None:
+        args.output.write_text(results_str + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-ins for the services the fastq sync lambdas call, for benchmarking
+
+* The fastq manager, fastq unarchiving and workflow apis are replaced by fake orcabus_api_tools modules,
+  installed into sys.modules before any lambda or layer module is imported.
+* The step functions, lambda and dynamodb apis are replaced by fake boto3 clients,
+  installed into the fastq_sync_tools client registry.
+  The dynamodb client only supports the task token store and requirement state calls,
+  and doesn't evaluate condition expressions.
+
+Every call is counted by endpoint, can be slowed down by a fixed latency and can fail with an injected HTTPError.
+Fastqs are generated on demand from their id, so any fastq id list can be used.
+"""
+
+# Standard library imports
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+import random
+import sys
+import time
+import types
+import uuid
+
+# Third party imports
+from requests import HTTPError
+
+# Globals
+FASTQ_ID_PREFIX = "fqr.BENCH"
+
+# Every ARCHIVED_FASTQ_INTERVAL th fastq has an archived readset,
+# every MISSING_QC_FASTQ_INTERVAL th fastq has no qc
+ARCHIVED_FASTQ_INTERVAL = 10
+MISSING_QC_FASTQ_INTERVAL = 4
+
+# The fake services the fake modules and clients currently dispatch to
+_ACTIVE_SERVICES: Optional['FakeServices'] = None
+
+
+def get_fastq_id(index: int) -> str:
+    return f"{FASTQ_ID_PREFIX}{index:017d}"
+
+
+def get_fastq_id_list(size: int) -> List[str]:
+    return [get_fastq_id(index_iter_) for index_iter_ in range(size)]
+
+
+def get_fastq_index(fastq_id: str) -> int:
+    return int(fastq_id.removeprefix(FASTQ_ID_PREFIX))
+
+
+class FakeServices:
+    """
+    In-memory fastq manager, fastq unarchiving, workflow, step functions, lambda and dynamodb services
+    """
+
+    def __init__(
+            self,
+            latency_seconds: float = 0.0,
+            error_rate: float = 0.0,
+            seed: int = 0,
+    ):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+
+        self.api_calls: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+
+        # Launched jobs, fastq id -> jobs
+        self.fastq_jobs: Dict[str, List[Dict[str, Any]]] = {}
+        self.unarchiving_jobs: List[Dict[str, Any]] = []
+        self.sfn_executions: List[Dict[str, Any]] = []
+        self.callback_ids: List[str] = []
+        # Task token table, (id, id_type) -> item
+        self.dynamodb_items: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def call(self, endpoint: str) -> None:
+        """
+        Record a call to an endpoint, wait for the latency and maybe raise an injected error
+        """
+        with self._lock:
+            self.api_calls[endpoint] += 1
+            is_error = self.error_rate > 0 and self._random.random() < self.error_rate
+            if is_error:
+                self.injected_errors[endpoint] += 1
+
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        if is_error:
+            raise HTTPError(f"500 Server Error: injected error for {endpoint}")
+
+    # Fastq manager
+    def get_fastq(self, fastq_id: str, include_s3_details: bool = False) -> Dict[str, Any]:
+        self.call("fastq.get_fastq")
+        return get_fake_fastq(fastq_id, include_s3_details=include_s3_details)
+
+    def get_fastq_jobs(self, fastq_id: str) -> List[Dict[str, Any]]:
+        self.call("fastq.get_fastq_jobs")
+        with self._lock:
+            return list(self.fastq_jobs.get(fastq_id, []))
+
+    def run_fastq_job(self, endpoint: str, fastq_id: str, job_type: str) -> Dict[str, Any]:
+        self.call(endpoint)
+        job = {
+            "id": f"fqj.{uuid.uuid4().hex}",
+            "fastqId": fastq_id,
+            "jobType": job_type,
+            "status": "PENDING",
+        }
+        with self._lock:
+            self.fastq_jobs.setdefault(fastq_id, []).append(job)
+        return job
+
+    def to_fastq_list_row(self, fastq_id: str, bucket: str, key_prefix: str) -> Dict[str, Any]:
+        self.call("fastq.to_fastq_list_row")
+        return {
+            "rgid": fastq_id,
+            "read1FileUri": f"s3://{bucket}/{key_prefix}{fastq_id}_R1_001.fastq.gz",
+        }
+
+    # Fastq unarchiving
+    def get_unarchiving_job_list_for_fastq(
+            self, fastq_id: str, job_status: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        self.call("fastq_unarchiving.get_job_list_for_fastq")
+        with self._lock:
+            return list(filter(
+                lambda job_iter_: (
+                    fastq_id in job_iter_['fastqIds'] and
+                    (job_status is None or job_iter_['status'] == job_status)
+                ),
+                self.unarchiving_jobs
+            ))
+
+    def create_unarchiving_job(self, fastq_ids: List[str], job_type: str) -> Dict[str, Any]:
+        self.call("fastq_unarchiving.create_job")
+        job = {
+            "id": f"ufj.{uuid.uuid4().hex}",
+            "fastqIds": list(fastq_ids),
+            "jobType": job_type,
+            "status": "PENDING",
+        }
+        with self._lock:
+            self.unarchiving_jobs.append(job)
+        return job
+
+    # Workflow manager, no active workflow runs
+    def list_workflow_runs(self, workflow_name: str, current_status: str) -> List[Dict[str, Any]]:
+        self.call("workflow.list_workflow_runs")
+        return []
+
+    def get_workflow_run(self, workflow_run_orcabus_id: str) -> Dict[str, Any]:
+        self.call("workflow.get_workflow_run")
+        return {
+            "orcabusId": workflow_run_orcabus_id,
+            "libraries": [],
+        }
+
+    # Step functions
+    def start_execution(self, stateMachineArn: str, input: str, **kwargs) -> Dict[str, Any]:
+        self.call("stepfunctions.start_execution")
+        execution_arn = f"{stateMachineArn.replace(':stateMachine:', ':execution:')}:{uuid.uuid4()}"
+        with self._lock:
+            self.sfn_executions.append({"executionArn": execution_arn, "input": input})
+        return {
+            "executionArn": execution_arn,
+        }
+
+    # Lambda
+    def send_durable_execution_callback_success(self, CallbackId: str, Result: Any, **kwargs) -> Dict[str, Any]:
+        self.call("lambda.send_durable_execution_callback_success")
+        with self._lock:
+            self.callback_ids.append(CallbackId)
+        return {}
+
+    # DynamoDB
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.call("dynamodb.batch_get_item")
+        with self._lock:
+            return {
+                "Responses": {
+                    table_name_iter_: list(filter(None, map(
+                        lambda key_iter_: self.dynamodb_items.get(_get_dynamodb_key_tuple(key_iter_)),
+                        request_iter_['Keys']
+                    )))
+                    for table_name_iter_, request_iter_ in RequestItems.items()
+                },
+                "UnprocessedKeys": {},
+            }
+
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.call("dynamodb.transact_write_items")
+        with self._lock:
+            for transact_item_iter_ in TransactItems:
+                if "Put" in transact_item_iter_:
+                    item = transact_item_iter_['Put']['Item']
+                    self.dynamodb_items[_get_dynamodb_key_tuple(item)] = item
+                    continue
+
+                request = transact_item_iter_.get('Update') or transact_item_iter_['Delete']
+                key_tuple = _get_dynamodb_key_tuple(request['Key'])
+                if "Delete" in transact_item_iter_:
+                    self.dynamodb_items.pop(key_tuple, None)
+                    continue
+
+                # ADD (or DELETE) task_token_set :task_token_set
+                item = self.dynamodb_items.setdefault(key_tuple, dict(request['Key']))
+                task_token_set = set(item.get('task_token_set', {}).get('SS', []))
+                value_set = set(request['ExpressionAttributeValues'][':task_token_set']['SS'])
+                task_token_set = (
+                    task_token_set | value_set
+                    if request['UpdateExpression'].startswith("ADD")
+                    else task_token_set - value_set
+                )
+                item['task_token_set'] = {"SS": sorted(task_token_set)}
+        return {}
+
+    def update_item(
+            self,
+            TableName: str,
+            Key: Dict[str, Any],
+            ExpressionAttributeValues: Dict[str, Any],
+            **kwargs
+    ) -> Dict[str, Any]:
+        self.call("dynamodb.update_item")
+        with self._lock:
+            # [ADD satisfied_requirement_set :satisfied_requirement_set] SET <attribute> = :<attribute>, ...
+            item = self.dynamodb_items.setdefault(_get_dynamodb_key_tuple(Key), dict(Key))
+            for value_name_iter_, value_iter_ in ExpressionAttributeValues.items():
+                attribute_name = value_name_iter_.lstrip(":")
+                if attribute_name == "satisfied_requirement_set":
+                    value_iter_ = {"SS": sorted(set(item.get(attribute_name, {}).get('SS', [])) | set(value_iter_['SS']))}
+                item["expiresAt" if attribute_name == "expires_at" else attribute_name] = value_iter_
+        return {}
+
+    def delete_item(self, TableName: str, Key: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self.call("dynamodb.delete_item")
+        with self._lock:
+            self.dynamodb_items.pop(_get_dynamodb_key_tuple(Key), None)
+        return {}
+
+
+def _get_dynamodb_key_tuple(key: Dict[str, Any]) -> Tuple[str, str]:
+    return key['id']['S'], key['id_type']['S']
+
+
+def get_fake_fastq(fastq_id: str, include_s3_details: bool = False) -> Dict[str, Any]:
+    """
+    Generate a fastq object from its id, i.e. a small mix of archived fastqs and fastqs without qc
+    """
+    fastq_index = get_fastq_index(fastq_id)
+    storage_class = "DeepArchive" if fastq_index % ARCHIVED_FASTQ_INTERVAL == ARCHIVED_FASTQ_INTERVAL - 1 else "Standard"
+
+    def _get_readset_obj(read_number: int) -> Dict[str, Any]:
+        readset_obj = {
+            "ingestId": str(uuid.UUID(int=fastq_index * 2 + read_number)),
+            "s3Uri": f"s3://pipeline-cache-bucket/primary/{fastq_id}/L_R{read_number}_001.fastq.ora",
+            "storageClass": storage_class,
+            "gzipCompressionSizeInBytes": 123456789,
+            "rawMd5sum": "b" * 32,
+        }
+        if include_s3_details:
+            readset_obj["s3Details"] = {
+                "bucket": "pipeline-cache-bucket",
+                "key": f"primary/{fastq_id}/L_R{read_number}_001.fastq.ora",
+                "sizeInBytes": 123456789,
+            }
+        return readset_obj
+
+    return {
+        "id": fastq_id,
+        "index": "AAAAAAAA+CCCCCCCC",
+        "lane": 1,
+        "instrumentRunId": "250101_A01052_0001_AHXXXXXXX",
+        "library": {
+            "orcabusId": f"lib.{fastq_id}",
+            "libraryId": f"L{fastq_index:07d}",
+        },
+        "readSet": {
+            "r1": _get_readset_obj(1),
+            "r2": _get_readset_obj(2),
+            "compressionFormat": "ORA",
+        },
+        "qc": None if fastq_index % MISSING_QC_FASTQ_INTERVAL == 0 else {"insertSizeEstimate": 300},
+        "ntsm": {"ntsmUri": f"s3://pipeline-cache-bucket/ntsm/{fastq_id}.ntsm"},
+        "readCount": 1000000,
+        "baseCountEst": 150000000,
+    }
+
+
+def _get_active_services() -> FakeServices:
+    if _ACTIVE_SERVICES is None:
+        raise RuntimeError("No fake services are active, call install_fake_services first")
+    return _ACTIVE_SERVICES
+
+
+def _build_fake_orcabus_api_tools_modules() -> Dict[str, types.ModuleType]:
+    orcabus_api_tools = types.ModuleType("orcabus_api_tools")
+
+    # Models are typed dicts in the real package, plain dicts are all we need here
+    def _build_models_module(name: str) -> types.ModuleType:
+        models_module = types.ModuleType(name)
+        models_module.Fastq = dict
+        models_module.Job = dict
+        models_module.JobType = str
+        return models_module
+
+    fastq = types.ModuleType("orcabus_api_tools.fastq")
+    fastq.get_fastq = lambda fastq_id, includeS3Details=False, **kwargs: (
+        _get_active_services().get_fastq(fastq_id, include_s3_details=includeS3Details)
+    )
+    fastq.get_fastq_jobs = lambda fastq_id, **kwargs: _get_active_services().get_fastq_jobs(fastq_id)
+    fastq.run_qc_stats = lambda fastq_id: _get_active_services().run_fastq_job("fastq.run_qc_stats", fastq_id, "QC")
+    fastq.run_ntsm = lambda fastq_id: _get_active_services().run_fastq_job("fastq.run_ntsm", fastq_id, "NTSM")
+    fastq.run_file_compression_stats = lambda fastq_id: _get_active_services().run_fastq_job(
+        "fastq.run_file_compression_stats", fastq_id, "FILE_COMPRESSION"
+    )
+    fastq.run_read_count_stats = lambda fastq_id: _get_active_services().run_fastq_job(
+        "fastq.run_read_count_stats", fastq_id, "READ_COUNT"
+    )
+    fastq.to_fastq_list_row = lambda fastq_id, bucket, key_prefix: (
+        _get_active_services().to_fastq_list_row(fastq_id, bucket, key_prefix)
+    )
+
+    fastq_unarchiving = types.ModuleType("orcabus_api_tools.fastq_unarchiving")
+    fastq_unarchiving.get_job_list_for_fastq = lambda fastq_id, job_status=None: (
+        _get_active_services().get_unarchiving_job_list_for_fastq(fastq_id, job_status=job_status)
+    )
+    fastq_unarchiving.create_job = lambda fastq_ids, job_type: (
+        _get_active_services().create_unarchiving_job(fastq_ids, job_type)
+    )
+
+    workflow = types.ModuleType("orcabus_api_tools.workflow")
+    workflow.list_workflow_runs = lambda workflow_name, current_status, **kwargs: (
+        _get_active_services().list_workflow_runs(workflow_name, current_status)
+    )
+    workflow.get_workflow_run = lambda workflow_run_orcabus_id: (
+        _get_active_services().get_workflow_run(workflow_run_orcabus_id)
+    )
+
+    module_list = [
+        orcabus_api_tools,
+        fastq, _build_models_module("orcabus_api_tools.fastq.models"),
+        fastq_unarchiving, _build_models_module("orcabus_api_tools.fastq_unarchiving.models"),
+        workflow, _build_models_module("orcabus_api_tools.workflow.models"),
+    ]
+
+    # Attach submodules to their parents
+    module_by_name = dict(map(lambda module_iter_: (module_iter_.__name__, module_iter_), module_list))
+    for module_name_iter_, module_iter_ in module_by_name.items():
+        parent_name, _, child_name = module_name_iter_.rpartition(".")
+        if parent_name:
+            setattr(module_by_name[parent_name], child_name, module_iter_)
+
+    return module_by_name
+
+
+class FakeLambdaClientExceptions:
+    class InvalidParameterValueException(Exception):
+        pass
+
+    class ResourceNotFoundException(Exception):
+        pass
+
+    class CallbackTimeoutException(Exception):
+        pass
+
+
+class FakeSFNClient:
+    def start_execution(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().start_execution(**kwargs)
+
+
+class FakeLambdaClient:
+    exceptions = FakeLambdaClientExceptions
+
+    def send_durable_execution_callback_success(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().send_durable_execution_callback_success(**kwargs)
+
+
+class FakeDynamoDBClientExceptions:
+    class ConditionalCheckFailedException(Exception):
+        pass
+
+    class TransactionCanceledException(Exception):
+        pass
+
+
+class FakeDynamoDBClient:
+    exceptions = FakeDynamoDBClientExceptions
+
+    def batch_get_item(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().batch_get_item(**kwargs)
+
+    def transact_write_items(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().transact_write_items(**kwargs)
+
+    def update_item(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().update_item(**kwargs)
+
+    def delete_item(self, **kwargs) -> Dict[str, Any]:
+        return _get_active_services().delete_item(**kwargs)
+
+
+def install_fake_orcabus_api_tools() -> None:
+    """
+    Install the fake orcabus_api_tools modules, their api calls dispatch to the active fake services.
+    Must be called before any lambda or layer module is imported.
+    The layer tests use these modules too, since orcabus_api_tools is only available as a lambda layer.
+    """
+    if not getattr(sys.modules.get("orcabus_api_tools"), "__fake__", False):
+        for module_name_iter_, module_iter_ in _build_fake_orcabus_api_tools_modules().items():
+            module_iter_.__fake__ = True
+            sys.modules[module_name_iter_] = module_iter_
+
+
+def install_fake_services(services: FakeServices) -> None:
+    """
+    Install the fake orcabus_api_tools modules and boto3 clients, and dispatch them to these services.
+    Must be called before any lambda or layer module is imported.
+    """
+    global _ACTIVE_SERVICES
+    _ACTIVE_SERVICES = services
+
+    install_fake_orcabus_api_tools()
+
+    # Imported here so the fake modules are in place first
+    from fastq_sync_tools.utils import clients
+    clients._CLIENT_REGISTRY["stepfunctions"] = FakeSFNClient()
+    clients._CLIENT_REGISTRY["lambda"] = FakeLambdaClient()
+    clients._CLIENT_REGISTRY["dynamodb"] = FakeDynamoDBClient()
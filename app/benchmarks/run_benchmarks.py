@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark suite for the fastq sync lambdas, against local fake services (see fake_services.py)
+
+Every lambda under app/lambdas is run for each fastq list size (1, 10, 100 and 1,000 by default).
+Each (lambda, size) case runs in a fresh python interpreter, and reports:
+  * wallSeconds: the time spent in the handler calls
+  * apiCalls: the number of calls to each fake service endpoint
+  * peakMemoryBytes: the peak memory allocated (by python) during the handler calls
+
+Lambdas that take a fastq id list are called once with the whole list,
+lambdas that take a single fastq id (or callback id) are called once per fastq (as the state machines do),
+handleMessages is called with batches of 10 messages, one fastq per message,
+updateTaskTokenStore registers a task token against the whole list, then unregisters it.
+
+Use --update-baseline to save the results as the baseline, and --compare to fail (exit code 1)
+if any case makes more api calls than the baseline, or is much slower or uses much more memory.
+The baseline records the latency and error rate it was run with, a comparison must use the same settings.
+
+Usage:
+  python app/benchmarks/run_benchmarks.py --compare
+  python app/benchmarks/run_benchmarks.py --lambda-name check_running_jobs_for_fastq_id_list --sizes 1000
+  python app/benchmarks/run_benchmarks.py --error-rate 0.05 --output results.json
+  python app/benchmarks/run_benchmarks.py --update-baseline
+"""
+
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Local imports
+from cold_start import get_lambda_name_list, get_python_path
+
+# Globals
+BENCHMARKS_ROOT = Path(__file__).absolute().parent
+DEFAULT_BASELINE_PATH = BENCHMARKS_ROOT / "baseline.json"
+
+DEFAULT_SIZES = [1, 10, 100, 1000]
+DEFAULT_LATENCY_MS = 1.0
+DEFAULT_ERROR_RATE = 0.0
+DEFAULT_SEED = 0
+
+# Comparisons against the baseline
+# Api calls must not increase at all, wall time and memory are allowed some noise
+DEFAULT_WALL_TIME_TOLERANCE = 1.0
+DEFAULT_WALL_TIME_SLACK_SECONDS = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.5
+DEFAULT_MEMORY_SLACK_BYTES = 256 * 1024
+
+# The same requirements as a typical fastq sync request
+REQUIREMENTS_LIST = ["hasActiveReadSet", "hasQc", "hasFingerprint"]
+
+# handleMessages receives at most this many messages per invocation
+SQS_BATCH_SIZE = 10
+
+TASK_TOKEN_TABLE_NAME = "FastqSyncTaskTokenTable"
+
+STATE_MACHINE_ARN = "arn:aws:states:ap-southeast-2:123456789012:stateMachine:fastq-sync--initialiseTaskTokenForFastqIdList"
+
+
+class FakeBatchItem:
+    def __init__(self, index: int, status: Any, error: Optional[str] = None):
+        self.index = index
+        self.status = status
+        self.error = error
+
+
+class FakeBatchResult:
+    def __init__(self, all_items: List[FakeBatchItem]):
+        self.all = all_items
+
+
+class FakeDurableContext:
+    """
+    Runs durable operations in-process: map branches run in parallel threads,
+    and callbacks are submitted then treated as already unlocked by the initialise state machine
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("handle_messages")
+
+    def map(self, inputs, func, name=None, config=None) -> FakeBatchResult:
+        from aws_durable_execution_sdk_python.concurrency.models import BatchItemStatus
+
+        def _run_branch(index: int) -> FakeBatchItem:
+            try:
+                func(self, inputs[index], index, inputs)
+            except Exception as e:
+                return FakeBatchItem(index, BatchItemStatus.FAILED, f"{type(e).__name__}: {e}")
+            return FakeBatchItem(index, BatchItemStatus.SUCCEEDED)
+
+        if len(inputs) == 0:
+            return FakeBatchResult([])
+
+        with ThreadPoolExecutor(max_workers=len(inputs)) as executor:
+            return FakeBatchResult(list(executor.map(_run_branch, range(len(inputs)))))
+
+    def wait_for_callback(self, submitter, name=None, config=None) -> None:
+        submitter(f"callback-{time.monotonic_ns()}", self)
+
+
+def get_handle_messages_events(fastq_id_list: List[str]) -> List[Dict[str, Any]]:
+    record_list = [
+        {
+            "messageId": f"message-{index_iter_}",
+            "body": json.dumps({
+                "taskToken": f"task-token-{index_iter_}",
+                "payload": {
+                    "fastqIdList": [fastq_id_iter_],
+                    "requirements": dict.fromkeys(REQUIREMENTS_LIST, True),
+                },
+            }),
+        }
+        for index_iter_, fastq_id_iter_ in enumerate(fastq_id_list)
+    ]
+    return [
+        {"Records": record_list[batch_index:batch_index + SQS_BATCH_SIZE]}
+        for batch_index in range(0, len(record_list), SQS_BATCH_SIZE)
+    ]
+
+
+# Lambda name -> function of the fastq id list, returning the events to call the handler with
+EVENT_BUILDERS: Dict[str, Callable[[List[str]], List[Dict[str, Any]]]] = {
+    "check_fastq_id_list_against_requirements": lambda fastq_id_list: [{
+        "fastqIdList": fastq_id_list,
+        "requirements": dict.fromkeys(REQUIREMENTS_LIST, True),
+        "isUnarchivingAllowed": True,
+    }],
+    "check_running_jobs_for_fastq_id_list": lambda fastq_id_list: [{
+        "fastqIdList": fastq_id_list,
+    }],
+    "get_fastq_and_remaining_requirements": lambda fastq_id_list: [
+        {
+            "fastqId": fastq_id_iter_,
+            "requirements": REQUIREMENTS_LIST,
+            "isUnarchivingAllowed": True,
+        }
+        for fastq_id_iter_ in fastq_id_list
+    ],
+    "handle_messages": get_handle_messages_events,
+    "launch_requirement_job": lambda fastq_id_list: [
+        {
+            "fastqId": fastq_id_iter_,
+            "requirementType": "hasQc",
+        }
+        for fastq_id_iter_ in fastq_id_list
+    ],
+    "launch_requirements_for_fastq_id_list": lambda fastq_id_list: [{
+        "fastqIdList": fastq_id_list,
+        "requirements": REQUIREMENTS_LIST,
+        "isUnarchivingAllowed": True,
+    }],
+    "unlock_callback_id": lambda fastq_id_list: [
+        {
+            "callbackId": f"callback-{fastq_id_iter_}",
+        }
+        for fastq_id_iter_ in fastq_id_list
+    ],
+    "update_task_token_store": lambda fastq_id_list: [
+        {
+            "action": "REGISTER",
+            "taskTokenList": ["task-token-0"],
+            "fastqIdList": fastq_id_list,
+            "requirements": REQUIREMENTS_LIST,
+        },
+        {
+            "action": "UNREGISTER",
+            "taskToken": "task-token-0",
+            "fastqIdList": fastq_id_list,
+        },
+    ],
+}
+
+
+def run_case_in_process(
+        lambda_name: str,
+        size: int,
+        latency_ms: float,
+        error_rate: float,
+        seed: int,
+) -> Dict[str, Any]:
+    """
+    Run a single (lambda, size) case in this interpreter, the fake services must be installed before
+    the lambda is imported, so this should only be called once per interpreter
+    """
+    from fake_services import FakeServices, get_fastq_id_list, install_fake_services
+
+    services = FakeServices(latency_seconds=latency_ms / 1000, error_rate=error_rate, seed=seed)
+    install_fake_services(services)
+
+    # Environment the lambdas expect
+    os.environ.setdefault("INITIALISE_TASK_TOKEN_FOR_FASTQ_ID_LIST_SFN_ARN", STATE_MACHINE_ARN)
+    os.environ.setdefault("FASTQ_SYNC_TASK_TOKEN_TABLE_NAME", TASK_TOKEN_TABLE_NAME)
+    os.environ.setdefault("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_NAME", "ActiveTaskTokenIndex")
+    os.environ.setdefault("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME", "task_token_status")
+    os.environ.setdefault("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE", "ACTIVE")
+
+    lambda_module = importlib.import_module(lambda_name)
+    if lambda_name == "handle_messages":
+        # The durable execution wrapper needs the durable functions service, call the record processing directly
+        handler = lambda event, context: lambda_module.process_records(event, FakeDurableContext())
+    else:
+        handler = lambda_module.handler
+
+    event_list = EVENT_BUILDERS[lambda_name](get_fastq_id_list(size))
+
+    invocation_errors: List[str] = []
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for event_iter_ in event_list:
+        try:
+            handler(event_iter_, None)
+        except Exception as e:
+            invocation_errors.append(f"{type(e).__name__}: {e}")
+    wall_seconds = time.perf_counter() - start_time
+    _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "lambdaName": lambda_name,
+        "size": size,
+        "invocations": len(event_list),
+        "invocationErrors": len(invocation_errors),
+        "wallSeconds": round(wall_seconds, 6),
+        "peakMemoryBytes": peak_memory_bytes,
+        "apiCalls": dict(sorted(services.api_calls.items())),
+        "injectedErrors": dict(sorted(services.injected_errors.items())),
+        # Enough to debug with, without flooding the output
+        "errorSamples": sorted(set(invocation_errors))[:5],
+    }
+
+
+def run_case(
+        lambda_name: str,
+        size: int,
+        latency_ms: float,
+        error_rate: float,
+        seed: int,
+) -> Dict[str, Any]:
+    """
+    Run a single (lambda, size) case in a fresh python interpreter
+    """
+    process = subprocess.run(
+        [
+            sys.executable, str(Path(__file__).absolute()),
+            "--run-case", lambda_name, str(size),
+            "--latency-ms", str(latency_ms),
+            "--error-rate", str(error_rate),
+            "--seed", str(seed),
+        ],
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([str(BENCHMARKS_ROOT), get_python_path(lambda_name)]),
+        },
+        capture_output=True,
+        text=True,
+    )
+
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Benchmark case {lambda_name}/{size} exited with {process.returncode}:\n{process.stderr}"
+        )
+
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def get_case_key(case: Dict[str, Any]) -> str:
+    return f"{case['lambdaName']}/{case['size']}"
+
+
+def compare_to_baseline(
+        results: Dict[str, Any],
+        baseline: Dict[str, Any],
+        wall_time_tolerance: float = DEFAULT_WALL_TIME_TOLERANCE,
+        memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE,
+) -> List[str]:
+    """
+    Compare the results to the baseline, returns a list of regressions (empty if there are none).
+    Cases that are not in the baseline are not compared.
+    """
+    if results['settings'] != baseline['settings']:
+        return [
+            f"Benchmark settings {results['settings']} do not match the baseline settings {baseline['settings']}"
+        ]
+
+    baseline_case_by_key = dict(map(
+        lambda case_iter_: (get_case_key(case_iter_), case_iter_),
+        baseline['cases']
+    ))
+
+    regressions: List[str] = []
+    for case_iter_ in results['cases']:
+        case_key = get_case_key(case_iter_)
+        baseline_case = baseline_case_by_key.get(case_key, None)
+        if baseline_case is None:
+            continue
+
+        for endpoint_iter_, call_count_iter_ in case_iter_['apiCalls'].items():
+            baseline_call_count = baseline_case['apiCalls'].get(endpoint_iter_, 0)
+            if call_count_iter_ > baseline_call_count:
+                regressions.append(
+                    f"{case_key}: {call_count_iter_} calls to {endpoint_iter_}, baseline is {baseline_call_count}"
+                )
+
+        max_wall_seconds = baseline_case['wallSeconds'] * (1 + wall_time_tolerance) + DEFAULT_WALL_TIME_SLACK_SECONDS
+        if case_iter_['wallSeconds'] > max_wall_seconds:
+            regressions.append(
+                f"{case_key}: wall time {case_iter_['wallSeconds']:.3f}s, "
+                f"baseline is {baseline_case['wallSeconds']:.3f}s (limit {max_wall_seconds:.3f}s)"
+            )
+
+        max_peak_memory_bytes = baseline_case['peakMemoryBytes'] * (1 + memory_tolerance) + DEFAULT_MEMORY_SLACK_BYTES
+        if case_iter_['peakMemoryBytes'] > max_peak_memory_bytes:
+            regressions.append(
+                f"{case_key}: peak memory {case_iter_['peakMemoryBytes']} bytes, "
+                f"baseline is {baseline_case['peakMemoryBytes']} bytes (limit {int(max_peak_memory_bytes)} bytes)"
+            )
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Fastq list sizes")
+    parser.add_argument(
+        "--lambda-name", action="append", default=None,
+        help="Only benchmark this lambda (snake case, without the _py suffix), may be given more than once"
+    )
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="Latency of every api call")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE, help="Fraction of api calls that fail")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the error injection")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results here as well as to stdout")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE_PATH, help="Baseline results file")
+    parser.add_argument("--compare", action="store_true", help="Exit with 1 if the results regress on the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the results as the baseline")
+    parser.add_argument("--wall-time-tolerance", type=float, default=DEFAULT_WALL_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--run-case", nargs=2, metavar=("LAMBDA_NAME", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Internal, a single case in this (fresh) interpreter
+    if args.run_case is not None:
+        print(json.dumps(run_case_in_process(
+            args.run_case[0], int(args.run_case[1]),
+            latency_ms=args.latency_ms,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )))
+        return 0
+
+    cases: List[Dict[str, Any]] = []
+    for lambda_name_iter_ in (args.lambda_name if args.lambda_name else get_lambda_name_list()):
+        for size_iter_ in args.sizes:
+            case = run_case(
+                lambda_name_iter_, size_iter_,
+                latency_ms=args.latency_ms,
+                error_rate=args.error_rate,
+                seed=args.seed,
+            )
+            print(
+                f"{get_case_key(case)}: {case['wallSeconds']:.3f}s, "
+                f"{sum(case['apiCalls'].values())} api calls, {case['peakMemoryBytes']} bytes peak",
+                file=sys.stderr
+            )
+            cases.append(case)
+
+    results = {
+        "settings": {
+            "latencyMs": args.latency_ms,
+            "errorRate": args.error_rate,
+            "seed": args.seed,
+        },
+        "cases": cases,
+    }
+
+    results_str = json.dumps(results, indent=2)
+    print(results_str)
+    if args.output is not None:
+        args.output.write_text(results_str + "\n")
+
+    if args.update_baseline:
+        args.baseline.write_text(results_str + "\n")
+        return 0
+
+    if args.compare:
+        regressions = compare_to_baseline(
+            results,
+            json.loads(args.baseline.read_text()),
+            wall_time_tolerance=args.wall_time_tolerance,
+            memory_tolerance=args.memory_tolerance,
+        )
+        for regression_iter_ in regressions:
+            print(f"REGRESSION {regression_iter_}", file=sys.stderr)
+        if len(regressions) > 0:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
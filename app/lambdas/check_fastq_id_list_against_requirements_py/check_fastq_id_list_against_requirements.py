@@ -7,27 +7,39 @@ Takes in the inputs:
   * fastqIdList: list of fastq ids
   * requirements: dict of requirement names to boolean or context object values
   * isUnarchivingAllowed: boolean indicating if unarchiving is allowed
+  * fastqObjList (optional): fastq objects from an event payload (i.e. a FastqStateChange event detail)
+  * eventTime (optional): the time of the event the fastq objects came from
+    Fresh and complete fastq objects are used in place of fetching the fastq from the fastq manager
+
+Fastqs whose recorded requirement state shows they already satisfy every requirement are not fetched at all,
+and the requirement state of every fastq we do evaluate is recorded for the next check.
 
 And outputs the following:
 
 * hasAllRequirements: boolean
 * fastqIdListWithMissingRequirements: list of fastq ids that are missing requirements
+* fastqIdListWithErrors: list of fastq ids that could not be retrieved from the fastq manager
+* fastqIdListNotFound: the fastq ids with errors that the fastq manager reports do not exist (404),
+  a task token waiting on these fastqs can never be satisfied
 
 """
 
 # Standard imports
 from typing import Dict, List, Optional, Union, cast
-from requests import HTTPError
 
 # Layer imports
-from orcabus_api_tools.fastq import get_fastq
 from fastq_sync_tools import (
-    check_fastq_list_against_requirements_list,
+    get_requirements_matrix_with_requirement_state,
+    get_requirements_from_requirements_matrix,
+    get_fastq_id_list_with_missing_requirements_from_requirements_matrix,
+    get_not_found_fastq_id_list,
     validate_has_active_readset_input,
+    with_api_metrics,
     REQUIREMENT,
 )
 
 
+@with_api_metrics
 def handler(event, context):
     """
     Check the fastq id list against the requirements set
@@ -38,6 +50,8 @@ def handler(event, context):
     fastq_id_list: List[str] = event.get("fastqIdList", [])
     requirements: Union[List[REQUIREMENT], Dict[REQUIREMENT, Union[bool, Dict[str, str]]]] = event.get("requirements", None)
     is_unarchiving_allowed: bool = event.get("isUnarchivingAllowed", False)
+    event_fastq_obj_list: Optional[List[Dict]] = event.get("fastqObjList", None)
+    event_time: Optional[str] = event.get("eventTime", None)
 
     # Requirements is a required field
     if requirements is None:
@@ -82,42 +96,44 @@ def handler(event, context):
             if req_value:
                 requirements_list.append(cast(REQUIREMENT, req_name))
 
-    # Get fastqs
-    try:
-        fastq_obj_list = list(map(
-            lambda fastq_id_iter_: get_fastq(fastq_id_iter_, includeS3Details=True),
-            fastq_id_list
-        ))
-    except HTTPError:
-        # Return the results
-        return {
-            "fastqIdListWithMissingRequirements": fastq_id_list,
-            "hasAllRequirements": False,
-        }
-
-    # Check requirements for the full list — ContextNotEligibleError propagates
-    satisfied_requirements, unsatisfied_requirements = check_fastq_list_against_requirements_list(
-        fastq_list=fastq_obj_list,
+    # Get fastqs (concurrently), using any fresh fastqs from the event payload first,
+    # and skipping the fastqs known to satisfy every requirement already
+    # Fastqs we could not retrieve are treated as missing requirements
+    # Evaluate each (fastq, requirement) pair at most once — ContextNotEligibleError propagates
+    # We only need to know which fastqs are missing requirements, so stop at the first requirement a fastq fails
+    requirements_matrix, failed_fastq_id_list = get_requirements_matrix_with_requirement_state(
+        fastq_id_list,
         requirements=requirements_list,
         is_unarchiving_allowed=is_unarchiving_allowed,
         has_active_readset_context=has_active_readset_context,
+        event_fastq_obj_list=event_fastq_obj_list,
+        event_time=event_time,
+        include_s3_details=True,
+        stop_on_first_unsatisfied=True,
     )
 
-    fastq_id_list_with_missing_requirements = []
+    # Derive the aggregate and per-fastq results from the matrix
+    satisfied_requirements, unsatisfied_requirements = get_requirements_from_requirements_matrix(
+        requirements_matrix,
+        requirements_list,
+    )
+    fastq_id_list_with_missing_requirements = (
+        get_fastq_id_list_with_missing_requirements_from_requirements_matrix(requirements_matrix)
+    )
 
-    if len(unsatisfied_requirements) > 0:
-        for fastq_obj_iter in fastq_obj_list:
-            satisfied_requirements_iter, unsatisfied_requirements_iter = check_fastq_list_against_requirements_list(
-                fastq_list=[fastq_obj_iter],
-                requirements=requirements_list,
-                is_unarchiving_allowed=is_unarchiving_allowed,
-                has_active_readset_context=has_active_readset_context,
-            )
-            if len(unsatisfied_requirements_iter) > 0:
-                fastq_id_list_with_missing_requirements.append(fastq_obj_iter['id'])
+    # Add in any fastqs we could not retrieve, preserving the order of the input list
+    missing_fastq_id_set = set(fastq_id_list_with_missing_requirements + failed_fastq_id_list)
+    fastq_id_list_with_missing_requirements = list(filter(
+        lambda fastq_id_iter_: fastq_id_iter_ in missing_fastq_id_set,
+        fastq_id_list
+    ))
 
     # Return the results
     return {
         "fastqIdListWithMissingRequirements": fastq_id_list_with_missing_requirements,
-        "hasAllRequirements": (True if len(unsatisfied_requirements) == 0 else False),
+        "fastqIdListWithErrors": failed_fastq_id_list,
+        "fastqIdListNotFound": get_not_found_fastq_id_list(failed_fastq_id_list),
+        "hasAllRequirements": (
+            True if (len(unsatisfied_requirements) == 0 and len(failed_fastq_id_list) == 0) else False
+        ),
     }
@@ -9,40 +9,36 @@ We return a 'true' if any of the fastq ids have jobs running, as this means that
 is still active.
 
 Otherwise we return 'false'.
+
+We also return the fastq ids the fastq manager reports do not exist (fastqIdListNotFound),
+a task token waiting on these fastqs can never be satisfied, so can be failed straight away.
+Failed fastq manager calls are cached (see fastq_error_cache.py), so we don't repeat them on every heartbeat.
+
+All checks (for each fastq id and each job source) are run concurrently on the shared async thread pool
+(see running_jobs.py in the fastq sync tools layer), the first positive result cancels any outstanding checks.
+Every fastq is still looked up before we return, so fastqIdListNotFound is complete even when jobs are running.
 """
 
 # Standard library imports
-from typing import List, Literal, Dict
-from requests import HTTPError
+from typing import Dict, List, Union
+import logging
 
 # Layer imports
-# Workflow
-from orcabus_api_tools.workflow import list_workflow_runs, get_workflow_run
-# Fastq
-from orcabus_api_tools.fastq import (
-    get_fastq_jobs as get_fastq_manager_jobs,
-    get_fastq
+# Fastq sync tools (the orcabus api calls are instrumented with api metrics)
+from fastq_sync_tools import (
+    check_running_jobs_for_fastq_id_list,
+    get_not_found_fastq_id_list,
+    with_api_metrics,
 )
-# Fastq Unarchiving
-from orcabus_api_tools.fastq_unarchiving import (
-    get_job_list_for_fastq as get_unarchiving_job_list_for_fastq
-)
-
-# Globals
-ACTIVE_JOB_STATUS_LIST_TYPE = Literal['PENDING', 'RUNNING']
-ACTIVE_JOB_STATUS_LIST: List[ACTIVE_JOB_STATUS_LIST_TYPE] = ['PENDING', 'RUNNING']
 
-BCLCONVERT_WORKFLOW_NAME = 'bclconvert'
-BSSH_TO_AWS_S3_WORKFLOW_NAME = 'bssh-to-aws-s3'
-ACTIVE_WORKFLOW_STATUS_LIST = [
-    'DRAFT',
-    'READY',
-    'STARTING'
-    'RUNNING',
-]
+# Logging - the fastq sync tools layer logs the time spent in each job source
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logging.getLogger('fastq_sync_tools').setLevel(logging.INFO)
 
 
-def handler(event, context) -> Dict[str, bool]:
+@with_api_metrics
+def handler(event, context) -> Dict[str, Union[bool, List[str]]]:
     """
     Check running jobs for fastq id list
     :param event:
@@ -53,72 +49,10 @@ def handler(event, context) -> Dict[str, bool]:
     # Get fastq id list
     fastq_id_list: List[str] = event['fastqIdList']
 
-    # Iterate over fastq ids
-    # If any of them have jobs running, return true immediately
-    for fastq_id in fastq_id_list:
-        try:
-            # Check fastq manager jobs
-            if len(
-                    list(filter(
-                        lambda job: job['status'] in ACTIVE_JOB_STATUS_LIST,
-                        get_fastq_manager_jobs(fastq_id=fastq_id)
-                    ))
-            ) > 0:
-                return {
-                    "jobsRunning": True
-                }
-        except HTTPError:
-            # If we get an error, assume no jobs (fastqs may no longer exist)
-            continue
-        # Check fastq unarchiver jobs
-        for active_status in ACTIVE_JOB_STATUS_LIST:
-            if len(get_unarchiving_job_list_for_fastq(
-                    fastq_id=fastq_id,
-                    job_status=active_status
-            )) > 0:
-                return {
-                    "jobsRunning": True
-                }
-
-        # Get the library id of the fastq
-        try:
-            library_id = get_fastq(fastq_id)['library']['libraryId']
-        except HTTPError:
-            # If we get an error, assume fastq may no longer exist
-            continue
-
-        # Check workflow runs for bclconvert + bssh-to-aws-s3 associated with this library
-        for workflow_status_iter in ACTIVE_WORKFLOW_STATUS_LIST:
-            # Check bclconvert workflow runs
-            bclconvert_workflow_runs = list_workflow_runs(
-                workflow_name=BCLCONVERT_WORKFLOW_NAME,
-                current_status=workflow_status_iter,
-            )
-            bssh_to_aws_s3_workflow_runs = list_workflow_runs(
-                workflow_name=BSSH_TO_AWS_S3_WORKFLOW_NAME,
-                current_status=workflow_status_iter,
-            )
-
-            # Check if the library is associated with any of the workflow runs
-            for workflow_run in (bclconvert_workflow_runs + bssh_to_aws_s3_workflow_runs):
-                # Get the library id list
-                library_id_list = list(map(
-                    lambda library_iter_: library_iter_['libraryId'],
-                    get_workflow_run(workflow_run['orcabusId'])['libraries']
-                ))
-
-                # Check if our library id is in the list
-                if (
-                        any(
-                            library_id == library_id_iter_
-                            for library_id_iter_ in library_id_list
-                        )
-                ):
-                    return {
-                        "jobsRunning": True
-                    }
+    jobs_running = check_running_jobs_for_fastq_id_list(fastq_id_list)
+    logger.info(f"Checked {len(fastq_id_list)} fastq ids, jobs running: {jobs_running}")
 
-    # If we get here, no jobs are running
     return {
-        "jobsRunning": False
+        "jobsRunning": jobs_running,
+        "fastqIdListNotFound": get_not_found_fastq_id_list(fastq_id_list),
     }
@@ -7,9 +7,11 @@ Inputs:
   * fastqId
   * requirements
   * hasActiveReadSetContext (optional)
+  * fastqProjectionMode (optional): SLIM (default) or FULL
 
 Outputs:
-* fastqObj
+* fastqObj: by default a slim projection of the fastq (see fastq_sync_tools.get_fastq_projection),
+  the full fastq object if fastqProjectionMode is FULL
 * satisfiedRequirements
 * unsatisfiedRequirements
 
@@ -18,17 +20,19 @@ Outputs:
 # Standard imports
 from typing import Dict, List, Optional
 
-# Orcabus imports
-from orcabus_api_tools.fastq import get_fastq
-
 # Local layer imports
 from fastq_sync_tools import (
+    get_fastq,
+    with_api_metrics,
     check_fastq_against_requirements_list,
+    project_fastq,
     ContextNotEligibleError,
+    FASTQ_PROJECTION_MODE,
     REQUIREMENT,
 )
 
 
+@with_api_metrics
 def handler(event, context):
     """
     Lambda handler function
@@ -37,6 +41,7 @@ def handler(event, context):
     requirements: List[REQUIREMENT] = event.get("requirements", [])
     is_unarchiving_allowed: bool = event.get("isUnarchivingAllowed", False)
     has_active_readset_context: Optional[Dict[str, str]] = event.get("hasActiveReadSetContext", None)
+    fastq_projection_mode: FASTQ_PROJECTION_MODE = event.get("fastqProjectionMode", "SLIM")
 
     if not fastq_id:
         raise ValueError("fastqId is required")
@@ -56,7 +61,7 @@ def handler(event, context):
         raise
 
     return {
-        "fastqObj": fastq_obj,
+        "fastqObj": project_fastq(fastq_obj, fastq_projection_mode),
         "satisfiedRequirements": satisfied_requirements,
         "unsatisfiedRequirements": unsatisfied_requirements,
     }
@@ -9,37 +9,45 @@ simultaneously, each of which we assume will only take a few seconds to complete
 We run the step functions asynchonously with a callback id.
 
 We let the step functions handle the task tokens
+
+Each invocation takes a batch of SQS records, every record is run in its own durable branch,
+so the initialise executions are started in parallel and their callbacks are waited on concurrently.
+Records that fail (or whose callback times out) are reported back as a partial batch response,
+so only those records are returned to the queue.
+
+Records in a batch with the same canonical request (fastq id set, requirements and options) are coalesced
+into a single initialise execution, so the fastqs are only evaluated and the jobs only launched once.
+The execution is given every task token in the group (taskTokenList) and registers each one separately,
+so each original request still gets its own callback.
 """
 
 # Standard library imports
 import json
 from os import environ
-import boto3
-import typing
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # Durable context imports
 from aws_durable_execution_sdk_python import (
+    BatchResult,
     DurableContext,
     durable_execution,
 )
 from aws_durable_execution_sdk_python.config import (
-    Duration, WaitForCallbackConfig
+    CompletionConfig, Duration, MapConfig, WaitForCallbackConfig
 )
+from aws_durable_execution_sdk_python.concurrency.models import BatchItemStatus
 
 from aws_durable_execution_sdk_python.retries import create_retry_strategy
 from aws_durable_execution_sdk_python.types import WaitForCallbackContext
 
-if typing.TYPE_CHECKING:
-    from mypy_boto3_stepfunctions.client import SFNClient
+# Layer imports
+from fastq_sync_tools import get_sfn_client
 
 
 # Globals
 INITIALISE_TASK_TOKEN_FOR_FASTQ_ID_LIST_SFN_ARN_ENV_VAR = "INITIALISE_TASK_TOKEN_FOR_FASTQ_ID_LIST_SFN_ARN"
 
-
-def get_sfn_client() -> 'SFNClient':
-    return boto3.client('stepfunctions')
+REQUIRED_RECORD_BODY_KEYS = ['payload']
 
 
 def run_execution(sfn_input: Dict[str, Any], context: DurableContext) -> None:
@@ -68,27 +76,137 @@ def run_execution(sfn_input: Dict[str, Any], context: DurableContext) -> None:
         ),
     )
 
-@durable_execution
-def handler(event, context: DurableContext):
+
+def get_record_body(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse the body of an SQS record, raises a ValueError if the body is not valid
+    """
+    record_body = json.loads(record.get("body", "{}"))
+    # Check if the event contains the required keys
+    for key in REQUIRED_RECORD_BODY_KEYS:
+        if key not in record_body:
+            raise ValueError(f"Missing required key: {key}")
+    return record_body
+
+
+def get_canonical_request_key(record_body: Dict[str, Any]) -> str:
+    """
+    Requests with the same key can share a single evaluation.
+    The key covers the whole payload, with the fastq id list treated as a set
+    """
+    payload = record_body['payload']
+    return json.dumps(
+        {
+            **payload,
+            "fastqIdList": sorted(set(payload.get("fastqIdList", []))),
+        },
+        sort_keys=True,
+    )
+
+
+def coalesce_record_bodies(
+        message_id_list: List[str],
+        record_body_list: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Group the record bodies by their canonical request key, in order of first appearance.
+
+    Returns one group per key with the following keys:
+      * messageIdList: the message ids of the records in the group
+      * sfnInput: the first record body in the group, with the task tokens of every record in the group
+    """
+    group_by_key: Dict[str, Dict[str, Any]] = {}
+    for message_id, record_body in zip(message_id_list, record_body_list):
+        request_key = get_canonical_request_key(record_body)
+        if request_key not in group_by_key:
+            group_by_key[request_key] = {
+                "messageIdList": [],
+                "sfnInput": {
+                    **record_body,
+                    "taskTokenList": [],
+                },
+            }
+        group_by_key[request_key]["messageIdList"].append(message_id)
+        if record_body.get("taskToken") not in group_by_key[request_key]["sfnInput"]["taskTokenList"]:
+            group_by_key[request_key]["sfnInput"]["taskTokenList"].append(record_body.get("taskToken"))
+
+    return list(group_by_key.values())
+
+
+def run_group_execution(
+        context: DurableContext,
+        group: Dict[str, Any],
+        index: int,
+        group_list: List[Dict[str, Any]],
+) -> None:
+    # Each group of coalesced records runs in its own durable branch
+    run_execution(group["sfnInput"], context)
+
+
+def process_records(event, context: DurableContext) -> Dict[str, List[Dict[str, str]]]:
     """
-    Expect the following inputs from the event object:
-      * inputs
-      * engineParameters
-      * tags
+    Process a batch of SQS records, each with a json body containing the following keys:
+      * payload
+
+    Returns a partial batch response, listing the message ids of the records that failed
 
     :param event:
     :param context:
     :return:
     """
+    batch_item_failures: List[Dict[str, str]] = []
 
-    # Not sure what this will look like from the sqs event source
+    # Parse the records, records with an invalid body fail without starting an execution
+    message_id_list: List[str] = []
+    record_body_list: List[Dict[str, Any]] = []
     for record in event.get("Records", []):
-        record_body = json.loads(record.get("body", "{}"))
-        # Check if the event contains the required keys
-        required_keys = ['payload']
-        for key in required_keys:
-            if key not in record_body:
-                raise ValueError(f"Missing required key: {key}")
-
-        # Run the durable execution callback configuration
-        run_execution(record_body, context)
+        try:
+            record_body = get_record_body(record)
+        except ValueError as e:
+            context.logger.error(f"Could not parse record {record.get('messageId')}: {e}")
+            batch_item_failures.append({"itemIdentifier": record.get("messageId")})
+            continue
+        message_id_list.append(record.get("messageId"))
+        record_body_list.append(record_body)
+
+    # Coalesce matching requests, one initialise execution per group
+    group_list = coalesce_record_bodies(message_id_list, record_body_list)
+    if len(group_list) < len(record_body_list):
+        context.logger.info(f"Coalesced {len(record_body_list)} fastq sync requests into {len(group_list)}")
+
+    if len(group_list) > 0:
+        # Start all initialise executions in parallel and wait for their callbacks concurrently
+        # We wait for every branch to complete, rather than failing the batch on the first failure
+        batch_result: BatchResult[None] = context.map(
+            inputs=group_list,
+            func=run_group_execution,
+            name="run_group_executions",
+            config=MapConfig(
+                completion_config=CompletionConfig.all_completed(),
+            ),
+        )
+
+        # A failed group fails every record in it
+        for batch_item in batch_result.all:
+            if batch_item.status is BatchItemStatus.SUCCEEDED:
+                continue
+            failed_message_id_list = group_list[batch_item.index]["messageIdList"]
+            context.logger.error(f"Fastq sync requests {failed_message_id_list} failed: {batch_item.error}")
+            for message_id in failed_message_id_list:
+                batch_item_failures.append({"itemIdentifier": message_id})
+
+    return {
+        "batchItemFailures": batch_item_failures,
+    }
+
+
+@durable_execution
+def handler(event, context: DurableContext):
+    """
+    Expect a batch of SQS records from the fastq sync request queue, see process_records
+
+    :param event:
+    :param context:
+    :return:
+    """
+    return process_records(event, context)
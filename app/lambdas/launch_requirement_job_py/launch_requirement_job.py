@@ -15,14 +15,13 @@ COMPRESSION_METADATA
 
 """
 
-# Orcabus API tools
-from orcabus_api_tools.fastq import (
-    get_fastq
-)
-
 # Layer imports
 from fastq_sync_tools import (
+    get_fastq,
+    with_api_metrics,
     REQUIREMENT,
+    REQUIREMENT_TO_JOB_TYPE_MAP,
+    FastqJobSnapshot,
     run_fastq_job,
     run_fastq_unarchiving_job,
     check_fastq_unarchiving_job,
@@ -30,6 +29,7 @@ from fastq_sync_tools import (
 )
 
 
+@with_api_metrics
 def handler(event, context):
     """
     Get the requirement type and launch the job
@@ -51,17 +51,15 @@ def handler(event, context):
         )
 
     # Run internal jobs
-    if check_fastq_job(fastq_id, "QC") and requirement_type == "hasQc":
-        return run_fastq_job(fastq_obj, "QC")
-
-    if check_fastq_job(fastq_id, "NTSM") and requirement_type == "hasFingerprint":
-        return run_fastq_job(fastq_obj, "NTSM")
+    job_type = REQUIREMENT_TO_JOB_TYPE_MAP.get(requirement_type, None)
+    if job_type is None:
+        return None
 
-    if check_fastq_job(fastq_id, "FILE_COMPRESSION") and requirement_type == "hasFileCompressionInformation":
-        return run_fastq_job(fastq_obj, "FILE_COMPRESSION")
+    # Get the fastq jobs once, both the check and the launch answer from this snapshot
+    job_snapshot = FastqJobSnapshot(fastq_id)
 
-    if check_fastq_job(fastq_id, "READ_COUNT") and requirement_type == "hasReadCountInformation":
-        return run_fastq_job(fastq_obj, "READ_COUNT")
+    if check_fastq_job(fastq_id, job_type, job_snapshot=job_snapshot):
+        return run_fastq_job(fastq_obj, job_type, job_snapshot=job_snapshot)
 
     # If we reach here, we have no job to run
     return None
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Launch requirement jobs for a list of fastq ids
+
+Replaces launching one launchFastqListRowRequirements execution per fastq id.
+
+Inputs:
+  * fastqIdList
+  * requirements
+  * isUnarchivingAllowed (optional)
+  * hasActiveReadSetContext (optional)
+  * unarchivingJobGroupSize (optional): maximum number of fastqs per unarchiving job,
+    defaults to the FASTQ_SYNC_UNARCHIVING_JOB_GROUP_SIZE environment variable
+
+Outputs:
+  * launchSummaryList: one summary per fastq id with the following keys
+    * fastqId
+    * satisfiedRequirements
+    * unsatisfiedRequirements
+    * launchedRequirements
+    * error
+
+"""
+
+# Standard imports
+from typing import Dict, List, Optional
+
+# Layer imports
+from fastq_sync_tools import (
+    launch_requirements_for_fastq_id_list,
+    with_api_metrics,
+    REQUIREMENT,
+)
+
+
+@with_api_metrics
+def handler(event, context):
+    """
+    Lambda handler function
+    """
+    fastq_id_list: List[str] = event.get("fastqIdList", [])
+    requirements: List[REQUIREMENT] = event.get("requirements", [])
+    is_unarchiving_allowed: bool = event.get("isUnarchivingAllowed", False)
+    has_active_readset_context: Optional[Dict[str, str]] = event.get("hasActiveReadSetContext", None)
+    unarchiving_job_group_size: Optional[int] = event.get("unarchivingJobGroupSize", None)
+
+    if len(fastq_id_list) == 0 or len(requirements) == 0:
+        return {
+            "launchSummaryList": []
+        }
+
+    return {
+        "launchSummaryList": launch_requirements_for_fastq_id_list(
+            fastq_id_list=fastq_id_list,
+            requirements=requirements,
+            is_unarchiving_allowed=is_unarchiving_allowed,
+            has_active_readset_context=has_active_readset_context,
+            unarchiving_job_group_size=unarchiving_job_group_size,
+        )
+    }
@@ -5,33 +5,50 @@ Unlock the callback id
 
 Once we've generated the uri lists we can unlock the callback id and let another request from the queue come in.
 
-https://docs.aws.amazon.com/lambda/latest/api/API_SendDurableExecutionCallbackSuccess.html
+Inputs:
+  * callbackId: a single callback id, may be null if this is the toplevel call
+  OR
+  * callbackIdList: a list of callback ids to release in one invocation (null entries are skipped)
 
-"""
+For a single callback id, an invalid callback id raises an error.
+For a callback id list, the callbacks are released concurrently and already released or invalid
+callback ids do not fail the invocation, we return the result for each callback id instead:
+  * callbackResultList: list of callbackId, status (RELEASED, NOT_FOUND, TIMED_OUT, INVALID or FAILED) and error
 
-# Standard library imports
-import boto3
-import typing
+The initialise task token state machine only ever has one callback id (coalesced requests share a single execution),
+so it sends callbackId. Nothing in this service sends a callbackIdList yet, it is there for callers that
+hold several callback ids, i.e. to release the callbacks of a drained or cancelled batch.
 
-# Types
-if typing.TYPE_CHECKING:
-    from mypy_boto3_lambda.client import LambdaClient
+https://docs.aws.amazon.com/lambda/latest/api/API_SendDurableExecutionCallbackSuccess.html
+
+"""
 
+# Standard imports
+from typing import Dict, List, Optional
 
-def get_lambda_client() -> 'LambdaClient':
-    return boto3.client('lambda')
+# Layer imports
+from fastq_sync_tools import (
+    CallbackResult,
+    get_lambda_client,
+    release_callback_id_list,
+)
 
 
-def handler(event, context):
+def handler(event, context) -> Optional[Dict[str, List[CallbackResult]]]:
     """
-    Given a library callback id, unlock it
+    Given a library callback id (or list of callback ids), unlock it
     :param event:
     :param context:
     :return:
     """
 
-    # Get the lambda client
-    lambda_client = get_lambda_client()
+    # Batch mode
+    if event.get('callbackIdList', None) is not None:
+        return {
+            "callbackResultList": release_callback_id_list(
+                list(filter(None, event['callbackIdList']))
+            )
+        }
 
     # Get the inputs
     callback_id = event['callbackId']
@@ -40,6 +57,9 @@ def handler(event, context):
     if callback_id is None:
         return
 
+    # Get the lambda client
+    lambda_client = get_lambda_client()
+
     try:
         lambda_client.send_durable_execution_callback_success(
             CallbackId=event['callbackId'],
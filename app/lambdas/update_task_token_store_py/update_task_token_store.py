@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Update the task token store
+
+Register or unregister task tokens against all of their fastq ids in one call,
+rather than one DynamoDB request per fastq id from the state machines.
+
+Inputs:
+  * action: REGISTER, UNREGISTER or MIGRATE
+
+  For REGISTER (initialise task token state machine):
+  * taskTokenList: the task tokens of the (coalesced) request
+  * fastqIdList: the fastq ids still missing requirements
+  * requirements: the list of requirements
+
+  For UNREGISTER (external heartbeat monitor, once the task token has been released):
+  * taskToken
+  * fastqIdList: the fastq ids the task token is still registered against
+
+  For MIGRATE (external heartbeat monitor, before it lists the active task tokens):
+  * no other inputs, migrates the task token rows written by earlier versions of the service
+
+Outputs:
+  * taskTokenCount: the number of task tokens registered or unregistered
+  * fastqIdCount: the number of fastq ids they were registered or unregistered against
+
+  For MIGRATE:
+  * updatedCount: the number of rows migrated
+"""
+
+# Standard imports
+from typing import Dict, List, Literal
+
+# Layer imports
+from fastq_sync_tools import (
+    migrate_task_token_table,
+    register_task_token_list,
+    unregister_task_token,
+)
+
+# Globals
+ACTION_TYPE = Literal['REGISTER', 'UNREGISTER', 'MIGRATE']
+
+
+def handler(event, context) -> Dict[str, int]:
+    """
+    Lambda handler function
+    """
+    action: ACTION_TYPE = event.get("action")
+    fastq_id_list: List[str] = event.get("fastqIdList", [])
+
+    if action == 'REGISTER':
+        task_token_list: List[str] = event.get("taskTokenList", [])
+        register_task_token_list(
+            task_token_list=task_token_list,
+            fastq_id_list_with_missing_requirements=fastq_id_list,
+            requirements=event.get("requirements", []),
+        )
+        return {
+            "taskTokenCount": len(set(task_token_list)),
+            "fastqIdCount": len(set(fastq_id_list)),
+        }
+
+    if action == 'UNREGISTER':
+        unregister_task_token(
+            task_token=event.get("taskToken"),
+            fastq_id_list=fastq_id_list,
+        )
+        return {
+            "taskTokenCount": 1,
+            "fastqIdCount": len(set(fastq_id_list)),
+        }
+
+    if action == 'MIGRATE':
+        return {
+            "updatedCount": migrate_task_token_table(),
+        }
+
+    raise ValueError(f"Unknown action '{action}', expected one of REGISTER, UNREGISTER, MIGRATE")
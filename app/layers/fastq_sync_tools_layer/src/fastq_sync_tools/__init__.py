@@ -2,45 +2,322 @@
 
 """
 Fastq tools to be used by various lambdas as needed
+
+Attributes are imported from their submodules on first access,
+so a lambda only pays the import cost (i.e. orcabus_api_tools, boto3) of the helpers it uses.
 """
-from .utils.globals import REQUIREMENT
-from .utils.exceptions import ContextNotEligibleError
-from .utils.utils import (
-    has_active_readset,
-    has_active_readset_in_context,
-    has_qc,
-    has_fingerprint,
-    has_compression_metadata,
-    check_fastq_job,
-    check_fastq_unarchiving_job,
-    run_fastq_job,
-    run_fastq_unarchiving_job,
-    check_fastq_against_requirements_list,
-    check_fastq_list_against_requirements_list,
-    get_pipeline_cache_config,
-    is_allowed_context,
-    validate_has_active_readset_input,
-)
-
-
-__all__ = [
+
+# Standard library imports
+from importlib import import_module
+from typing import Any, List
+import typing
+
+if typing.TYPE_CHECKING:
+    from .utils.globals import REQUIREMENT, REQUIREMENTS_MATRIX, REQUIREMENT_TO_JOB_TYPE_MAP
+    from .utils.exceptions import ContextNotEligibleError, TaskTokenStoreError
+    from .utils.requirement_checks import (
+        has_active_readset,
+        has_active_readset_in_context,
+        is_fastq_resolvable_in_context,
+        get_context_readset_cache_stats,
+        has_qc,
+        has_fingerprint,
+        has_compression_metadata,
+        get_pipeline_cache_config,
+        is_allowed_context,
+    )
+    from .utils.utils import (
+        check_fastq_job,
+        check_fastq_unarchiving_job,
+        run_fastq_job,
+        run_fastq_unarchiving_job,
+        check_fastq_against_requirements_list,
+        check_fastq_list_against_requirements_list,
+        check_fastq_list_against_requirements_list_async,
+        get_requirements_matrix,
+        get_requirements_matrix_async,
+        get_requirements_from_requirements_matrix,
+        get_fastq_id_list_with_missing_requirements_from_requirements_matrix,
+        validate_has_active_readset_input,
+    )
+    from .utils.requirement_plan import (
+        RequirementEvaluationContext,
+        RequirementEvaluator,
+        RequirementPlan,
+        register_requirement_evaluator,
+        get_requirement_evaluator,
+        compile_requirement_plan,
+    )
+    from .utils.concurrency import (
+        get_max_concurrency,
+        run_concurrently,
+    )
+    from .utils.fastq_helpers import (
+        FASTQ_PROJECTION_MODE,
+        FastqProjection,
+        get_fastq_list,
+        get_fastq_list_async,
+        get_fastq_list_with_event_fastqs,
+        is_event_fastq_usable,
+        get_fastq_projection,
+        project_fastq,
+    )
+    from .utils.cache import TtlLruCache
+    from .utils.fastq_error_cache import (
+        get_fastq_with_error_cache,
+        get_fastq_jobs_with_error_cache,
+        get_not_found_fastq_id_list,
+        get_fastq_error_cache_stats,
+    )
+    from .utils.job_snapshot import FastqJobSnapshot
+    from .utils.unarchiving_helpers import (
+        get_active_unarchiving_jobs_for_fastq_id_list,
+        get_fastq_id_list_with_active_unarchiving_jobs,
+        get_unarchiving_job_group_size,
+        run_grouped_unarchiving_jobs,
+    )
+    from .utils.launch_helpers import (
+        get_requirements_to_launch,
+        launch_requirements_for_fastq_id_list,
+        launch_requirements_for_fastq_id_list_async,
+    )
+    from .utils.running_jobs import (
+        has_fastq_manager_jobs_running,
+        has_unarchiving_jobs_running,
+        has_workflow_runs_running,
+        check_running_jobs_for_fastq_id_list,
+        check_running_jobs_for_fastq_id_list_async,
+    )
+    from .utils.clients import (
+        get_boto3_client,
+        clear_boto3_clients,
+        get_dynamodb_client,
+        get_lambda_client,
+        get_sfn_client,
+    )
+    from .utils.token_store import (
+        TaskTokenItem,
+        RequirementStateItem,
+        list_active_task_tokens,
+        get_task_token_item,
+        is_task_token_dirty,
+        register_task_token,
+        register_task_token_list,
+        unregister_task_token,
+        get_requirement_state_item_list,
+        update_requirement_state_item_list,
+        mark_fastq_id_satisfied,
+        mark_task_token_dirty,
+        backfill_active_task_token_index,
+        backfill_task_token_remaining_count,
+        get_task_token_table_version,
+        migrate_task_token_table,
+    )
+    from .utils.requirement_state import (
+        is_requirement_state_enabled,
+        get_requirement_state_from_fastq,
+        get_known_satisfied_requirements,
+        get_requirements_matrix_with_requirement_state,
+    )
+    from .utils.callbacks import (
+        CallbackResult,
+        release_callback_id,
+        release_callback_id_list,
+    )
+    from .utils.metrics import (
+        is_api_metrics_enabled,
+        record_api_call,
+        flush_api_metrics,
+        with_api_metrics,
+    )
+    from .utils.instrumented_api import (
+        get_fastq,
+        get_fastq_jobs,
+        run_qc_stats,
+        run_file_compression_stats,
+        run_ntsm,
+        run_read_count_stats,
+        to_fastq_list_row,
+        create_unarchiving_job,
+        get_unarchiving_job_list_for_fastq,
+        list_workflow_runs,
+        get_workflow_run,
+    )
+    from .utils.async_api import (
+        get_async_max_concurrency,
+        run_api_call_async,
+        run_async,
+        any_async,
+        get_fastq_async,
+        get_fastq_jobs_async,
+        get_fastq_with_error_cache_async,
+        get_fastq_jobs_with_error_cache_async,
+        run_qc_stats_async,
+        run_file_compression_stats_async,
+        run_ntsm_async,
+        run_read_count_stats_async,
+        to_fastq_list_row_async,
+        create_unarchiving_job_async,
+        get_unarchiving_job_list_for_fastq_async,
+        list_workflow_runs_async,
+        get_workflow_run_async,
+    )
+
+# Attribute name -> the module it is imported from, grouped as in __all__
+_LAZY_IMPORTS = {
     # Requirements enum
-    "REQUIREMENT",
+    "REQUIREMENT": ".utils.globals",
+    "REQUIREMENTS_MATRIX": ".utils.globals",
+    "REQUIREMENT_TO_JOB_TYPE_MAP": ".utils.globals",
     # Exceptions
-    "ContextNotEligibleError",
+    "ContextNotEligibleError": ".utils.exceptions",
+    "TaskTokenStoreError": ".utils.exceptions",
     # All helpers
-    "has_active_readset",
-    "has_active_readset_in_context",
-    "has_qc",
-    "has_fingerprint",
-    "has_compression_metadata",
-    "check_fastq_job",
-    "check_fastq_unarchiving_job",
-    "run_fastq_job",
-    "run_fastq_unarchiving_job",
-    "check_fastq_against_requirements_list",
-    "check_fastq_list_against_requirements_list",
-    "get_pipeline_cache_config",
-    "is_allowed_context",
-    "validate_has_active_readset_input",
-]
+    "has_active_readset": ".utils.requirement_checks",
+    "has_active_readset_in_context": ".utils.requirement_checks",
+    "is_fastq_resolvable_in_context": ".utils.requirement_checks",
+    "get_context_readset_cache_stats": ".utils.requirement_checks",
+    "has_qc": ".utils.requirement_checks",
+    "has_fingerprint": ".utils.requirement_checks",
+    "has_compression_metadata": ".utils.requirement_checks",
+    "check_fastq_job": ".utils.utils",
+    "check_fastq_unarchiving_job": ".utils.utils",
+    "run_fastq_job": ".utils.utils",
+    "run_fastq_unarchiving_job": ".utils.utils",
+    "check_fastq_against_requirements_list": ".utils.utils",
+    "check_fastq_list_against_requirements_list": ".utils.utils",
+    "check_fastq_list_against_requirements_list_async": ".utils.utils",
+    "get_requirements_matrix": ".utils.utils",
+    "get_requirements_matrix_async": ".utils.utils",
+    "get_requirements_from_requirements_matrix": ".utils.utils",
+    "get_fastq_id_list_with_missing_requirements_from_requirements_matrix": ".utils.utils",
+    "get_pipeline_cache_config": ".utils.requirement_checks",
+    "is_allowed_context": ".utils.requirement_checks",
+    "validate_has_active_readset_input": ".utils.utils",
+    # Requirement plans
+    "RequirementEvaluationContext": ".utils.requirement_plan",
+    "RequirementEvaluator": ".utils.requirement_plan",
+    "RequirementPlan": ".utils.requirement_plan",
+    "register_requirement_evaluator": ".utils.requirement_plan",
+    "get_requirement_evaluator": ".utils.requirement_plan",
+    "compile_requirement_plan": ".utils.requirement_plan",
+    # Concurrency helpers
+    "get_max_concurrency": ".utils.concurrency",
+    "run_concurrently": ".utils.concurrency",
+    # Bulk fastq helpers
+    "FASTQ_PROJECTION_MODE": ".utils.fastq_helpers",
+    "FastqProjection": ".utils.fastq_helpers",
+    "get_fastq_list": ".utils.fastq_helpers",
+    "get_fastq_list_async": ".utils.fastq_helpers",
+    "get_fastq_list_with_event_fastqs": ".utils.fastq_helpers",
+    "is_event_fastq_usable": ".utils.fastq_helpers",
+    "get_fastq_projection": ".utils.fastq_helpers",
+    "project_fastq": ".utils.fastq_helpers",
+    # Caches
+    "TtlLruCache": ".utils.cache",
+    # Fastq error cache
+    "get_fastq_with_error_cache": ".utils.fastq_error_cache",
+    "get_fastq_jobs_with_error_cache": ".utils.fastq_error_cache",
+    "get_not_found_fastq_id_list": ".utils.fastq_error_cache",
+    "get_fastq_error_cache_stats": ".utils.fastq_error_cache",
+    # Job snapshots
+    "FastqJobSnapshot": ".utils.job_snapshot",
+    # Unarchiving helpers
+    "get_active_unarchiving_jobs_for_fastq_id_list": ".utils.unarchiving_helpers",
+    "get_fastq_id_list_with_active_unarchiving_jobs": ".utils.unarchiving_helpers",
+    "get_unarchiving_job_group_size": ".utils.unarchiving_helpers",
+    "run_grouped_unarchiving_jobs": ".utils.unarchiving_helpers",
+    # Launch helpers
+    "get_requirements_to_launch": ".utils.launch_helpers",
+    "launch_requirements_for_fastq_id_list": ".utils.launch_helpers",
+    "launch_requirements_for_fastq_id_list_async": ".utils.launch_helpers",
+    # Running job checks
+    "has_fastq_manager_jobs_running": ".utils.running_jobs",
+    "has_unarchiving_jobs_running": ".utils.running_jobs",
+    "has_workflow_runs_running": ".utils.running_jobs",
+    "check_running_jobs_for_fastq_id_list": ".utils.running_jobs",
+    "check_running_jobs_for_fastq_id_list_async": ".utils.running_jobs",
+    # Token store
+    "TaskTokenItem": ".utils.token_store",
+    "RequirementStateItem": ".utils.token_store",
+    "list_active_task_tokens": ".utils.token_store",
+    "get_task_token_item": ".utils.token_store",
+    "is_task_token_dirty": ".utils.token_store",
+    "register_task_token": ".utils.token_store",
+    "register_task_token_list": ".utils.token_store",
+    "unregister_task_token": ".utils.token_store",
+    "get_requirement_state_item_list": ".utils.token_store",
+    "update_requirement_state_item_list": ".utils.token_store",
+    "mark_fastq_id_satisfied": ".utils.token_store",
+    "mark_task_token_dirty": ".utils.token_store",
+    "backfill_active_task_token_index": ".utils.token_store",
+    "backfill_task_token_remaining_count": ".utils.token_store",
+    "get_task_token_table_version": ".utils.token_store",
+    "migrate_task_token_table": ".utils.token_store",
+    # Requirement states
+    "is_requirement_state_enabled": ".utils.requirement_state",
+    "get_requirement_state_from_fastq": ".utils.requirement_state",
+    "get_known_satisfied_requirements": ".utils.requirement_state",
+    "get_requirements_matrix_with_requirement_state": ".utils.requirement_state",
+    # Clients
+    "get_boto3_client": ".utils.clients",
+    "clear_boto3_clients": ".utils.clients",
+    "get_dynamodb_client": ".utils.clients",
+    "get_lambda_client": ".utils.clients",
+    "get_sfn_client": ".utils.clients",
+    # Callbacks
+    "CallbackResult": ".utils.callbacks",
+    "release_callback_id": ".utils.callbacks",
+    "release_callback_id_list": ".utils.callbacks",
+    # Api metrics
+    "is_api_metrics_enabled": ".utils.metrics",
+    "record_api_call": ".utils.metrics",
+    "flush_api_metrics": ".utils.metrics",
+    "with_api_metrics": ".utils.metrics",
+    # Instrumented orcabus api calls
+    "get_fastq": ".utils.instrumented_api",
+    "get_fastq_jobs": ".utils.instrumented_api",
+    "run_qc_stats": ".utils.instrumented_api",
+    "run_file_compression_stats": ".utils.instrumented_api",
+    "run_ntsm": ".utils.instrumented_api",
+    "run_read_count_stats": ".utils.instrumented_api",
+    "to_fastq_list_row": ".utils.instrumented_api",
+    "create_unarchiving_job": ".utils.instrumented_api",
+    "get_unarchiving_job_list_for_fastq": ".utils.instrumented_api",
+    "list_workflow_runs": ".utils.instrumented_api",
+    "get_workflow_run": ".utils.instrumented_api",
+    # Asyncio api calls
+    "get_async_max_concurrency": ".utils.async_api",
+    "run_api_call_async": ".utils.async_api",
+    "run_async": ".utils.async_api",
+    "any_async": ".utils.async_api",
+    "get_fastq_async": ".utils.async_api",
+    "get_fastq_jobs_async": ".utils.async_api",
+    "get_fastq_with_error_cache_async": ".utils.async_api",
+    "get_fastq_jobs_with_error_cache_async": ".utils.async_api",
+    "run_qc_stats_async": ".utils.async_api",
+    "run_file_compression_stats_async": ".utils.async_api",
+    "run_ntsm_async": ".utils.async_api",
+    "run_read_count_stats_async": ".utils.async_api",
+    "to_fastq_list_row_async": ".utils.async_api",
+    "create_unarchiving_job_async": ".utils.async_api",
+    "get_unarchiving_job_list_for_fastq_async": ".utils.async_api",
+    "list_workflow_runs_async": ".utils.async_api",
+    "get_workflow_run_async": ".utils.async_api",
+}
+
+# Every lazily imported attribute is exported
+__all__: List[str] = list(_LAZY_IMPORTS.keys())
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    # Cache on the module, so __getattr__ is only called once per attribute
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return list(globals().keys()) + list(_LAZY_IMPORTS.keys())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio variants of the orcabus api calls used by the fastq sync service
+
+The orcabus api calls are blocking (orcabus_api_tools owns the http client, hostnames and auth),
+so each async call runs the instrumented blocking call (see instrumented_api.py) on a shared thread pool.
+Every call in the event loop waits on one shared semaphore before it takes a thread,
+so one lambda can keep up to FASTQ_SYNC_ASYNC_MAX_CONCURRENCY (default 256) requests in flight
+without starting more threads than that. The thread pool is kept across warm invocations.
+There is no async http client (or http connection pool of our own), every call in flight holds a thread,
+so the default is sized for a few hundred calls in flight. Threads are only started as the calls need them.
+
+Async helpers sit beside their sync counterparts (i.e. get_fastq_list_async in fastq_helpers.py),
+use run_async to call them from sync code (i.e. a lambda handler).
+Don't call run_async from inside an async api call, a blocking call waiting on the thread pool it runs on
+can deadlock the pool.
+"""
+
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import environ
+from threading import Lock
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Tuple, TypeVar
+from weakref import WeakKeyDictionary
+import asyncio
+import logging
+import time
+
+# Local imports
+from .fastq_error_cache import get_fastq_jobs_with_error_cache, get_fastq_with_error_cache
+from .instrumented_api import (
+    get_fastq,
+    get_fastq_jobs,
+    run_qc_stats,
+    run_file_compression_stats,
+    run_ntsm,
+    run_read_count_stats,
+    to_fastq_list_row,
+    create_unarchiving_job,
+    get_unarchiving_job_list_for_fastq,
+    list_workflow_runs,
+    get_workflow_run,
+)
+
+# Globals
+ASYNC_MAX_CONCURRENCY_ENV_VAR = "FASTQ_SYNC_ASYNC_MAX_CONCURRENCY"
+DEFAULT_ASYNC_MAX_CONCURRENCY = 256
+
+T = TypeVar("T")
+
+# The shared thread pool, created on first use
+_ASYNC_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_ASYNC_EXECUTOR_LOCK = Lock()
+
+# asyncio semaphores belong to an event loop, and each run_async call runs a new event loop
+_ASYNC_SEMAPHORES: 'WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = WeakKeyDictionary()
+
+logger = logging.getLogger(__name__)
+
+
+def get_async_max_concurrency() -> int:
+    """
+    Get the maximum number of api calls an event loop keeps in flight.
+    Read from the FASTQ_SYNC_ASYNC_MAX_CONCURRENCY environment variable, falls back to the default
+    if the variable is not set or is not a positive integer.
+    """
+    max_concurrency_str = environ.get(ASYNC_MAX_CONCURRENCY_ENV_VAR, "")
+
+    if not max_concurrency_str:
+        return DEFAULT_ASYNC_MAX_CONCURRENCY
+
+    try:
+        max_concurrency = int(max_concurrency_str)
+    except ValueError:
+        logger.warning(
+            f"Could not parse {ASYNC_MAX_CONCURRENCY_ENV_VAR}='{max_concurrency_str}' as an integer, "
+            f"using the default of {DEFAULT_ASYNC_MAX_CONCURRENCY}"
+        )
+        return DEFAULT_ASYNC_MAX_CONCURRENCY
+
+    if max_concurrency < 1:
+        logger.warning(
+            f"{ASYNC_MAX_CONCURRENCY_ENV_VAR} must be a positive integer, "
+            f"using the default of {DEFAULT_ASYNC_MAX_CONCURRENCY}"
+        )
+        return DEFAULT_ASYNC_MAX_CONCURRENCY
+
+    return max_concurrency
+
+
+def get_async_executor() -> ThreadPoolExecutor:
+    global _ASYNC_EXECUTOR
+
+    with _ASYNC_EXECUTOR_LOCK:
+        if _ASYNC_EXECUTOR is None:
+            _ASYNC_EXECUTOR = ThreadPoolExecutor(
+                max_workers=get_async_max_concurrency(),
+                thread_name_prefix="fastq-sync-async",
+            )
+        return _ASYNC_EXECUTOR
+
+
+def get_async_semaphore() -> asyncio.Semaphore:
+    """
+    Get the semaphore shared by every api call in the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _ASYNC_SEMAPHORES.get(loop, None)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_async_max_concurrency())
+        _ASYNC_SEMAPHORES[loop] = semaphore
+    return semaphore
+
+
+async def run_api_call_async(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking api call on the shared thread pool, once the shared semaphore lets us
+    """
+    async with get_async_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(
+            get_async_executor(),
+            partial(func, *args, **kwargs)
+        )
+
+
+def run_async(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from sync code.
+    If this thread is already running an event loop, the coroutine is run on a new event loop in another thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+async def any_async(
+        named_checks: List[Tuple[str, Callable[[], Awaitable[bool]]]],
+) -> bool:
+    """
+    Run a list of (source name, async check) pairs concurrently.
+
+    Returns True as soon as any check returns True, the outstanding checks are cancelled
+    (a check already running on the thread pool finishes, but its result is ignored).
+    Returns False if every check returns False.
+    """
+    if len(named_checks) == 0:
+        return False
+
+    timings: Dict[str, List[float]] = {}
+
+    async def _run_check(source_name: str, check: Callable[[], Awaitable[bool]]) -> bool:
+        start_time = time.perf_counter()
+        try:
+            return await check()
+        finally:
+            timings.setdefault(source_name, []).append(time.perf_counter() - start_time)
+
+    tasks = [
+        asyncio.ensure_future(_run_check(source_name, check))
+        for source_name, check in named_checks
+    ]
+    try:
+        for next_task_iter_ in asyncio.as_completed(tasks):
+            if await next_task_iter_:
+                return True
+        return False
+    finally:
+        for task_iter_ in tasks:
+            task_iter_.cancel()
+        for source_name, durations in timings.items():
+            logger.info(
+                f"Source '{source_name}': {len(durations)} checks, "
+                f"total {sum(durations):.3f}s, max {max(durations):.3f}s"
+            )
+
+
+def _to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    async def _async_func(*args, **kwargs) -> T:
+        return await run_api_call_async(func, *args, **kwargs)
+
+    _async_func.__name__ = f"{func.__name__}_async"
+    _async_func.__doc__ = f"Asyncio variant of {func.__name__}, see run_api_call_async"
+    return _async_func
+
+
+# Fastq manager
+get_fastq_async = _to_async(get_fastq)
+get_fastq_jobs_async = _to_async(get_fastq_jobs)
+get_fastq_with_error_cache_async = _to_async(get_fastq_with_error_cache)
+get_fastq_jobs_with_error_cache_async = _to_async(get_fastq_jobs_with_error_cache)
+run_qc_stats_async = _to_async(run_qc_stats)
+run_file_compression_stats_async = _to_async(run_file_compression_stats)
+run_ntsm_async = _to_async(run_ntsm)
+run_read_count_stats_async = _to_async(run_read_count_stats)
+to_fastq_list_row_async = _to_async(to_fastq_list_row)
+
+# Fastq unarchiving
+create_unarchiving_job_async = _to_async(create_unarchiving_job)
+get_unarchiving_job_list_for_fastq_async = _to_async(get_unarchiving_job_list_for_fastq)
+
+# Workflow manager
+list_workflow_runs_async = _to_async(list_workflow_runs)
+get_workflow_run_async = _to_async(get_workflow_run)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+In-memory caches for the fastq sync service
+
+Caches are created at module level so that they survive warm lambda invocations.
+"""
+
+# Standard library imports
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional, Tuple
+import time
+
+
+class TtlLruCache:
+    """
+    A bounded, thread-safe, least-recently-used cache where each entry expires after a time-to-live.
+
+    Negative (falsy) values can be given a shorter time-to-live than positive values,
+    so that a 'not found' answer is re-checked sooner than a 'found' answer.
+    A time-to-live can also be given per entry when it is set.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl_seconds: float,
+            negative_ttl_seconds: Optional[float] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be a positive integer")
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = (
+            negative_ttl_seconds if negative_ttl_seconds is not None else ttl_seconds
+        )
+
+        # Key -> (expires_at, value)
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a value from the cache, returns None if the key is missing or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Set a value in the cache, evicting the least recently used entry if the cache is full
+        """
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds if value else self.negative_ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""
+Release durable execution callbacks
+
+handleMessages waits on a durable execution callback for each initialise execution,
+the callback is released (sent a success) once the execution no longer needs its queue slot.
+
+When many executions finish together, their callbacks can be released in one call,
+concurrently over the shared lambda client.
+"""
+
+# Standard library imports
+from typing import List, Literal, Optional, TypedDict
+import logging
+import typing
+
+# Local imports
+from .clients import get_lambda_client
+from .concurrency import run_concurrently
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_lambda.client import LambdaClient
+
+# Globals
+CALLBACK_RESULT_STATUS = Literal[
+    # The callback was released by this call
+    'RELEASED',
+    # The callback has already been released, or its durable execution no longer exists
+    'NOT_FOUND',
+    # The callback timed out before it could be released
+    'TIMED_OUT',
+    # Not a valid callback id
+    'INVALID',
+    # Any other error, i.e. we were throttled
+    'FAILED',
+]
+
+CALLBACK_SUCCESS_RESULT = "SUCCESS"
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackResult(TypedDict):
+    callbackId: str
+    status: CALLBACK_RESULT_STATUS
+    error: Optional[str]
+
+
+def release_callback_id(
+        callback_id: str,
+        client: Optional['LambdaClient'] = None,
+) -> CallbackResult:
+    """
+    Release a single callback id, errors are returned in the result rather than raised
+    """
+    if client is None:
+        client = get_lambda_client()
+
+    try:
+        client.send_durable_execution_callback_success(
+            CallbackId=callback_id,
+            Result=CALLBACK_SUCCESS_RESULT
+        )
+    except client.exceptions.ResourceNotFoundException as e:
+        return {"callbackId": callback_id, "status": 'NOT_FOUND', "error": str(e)}
+    except client.exceptions.CallbackTimeoutException as e:
+        return {"callbackId": callback_id, "status": 'TIMED_OUT', "error": str(e)}
+    except client.exceptions.InvalidParameterValueException as e:
+        return {"callbackId": callback_id, "status": 'INVALID', "error": str(e)}
+    except Exception as e:
+        logger.warning(f"Could not release callback id '{callback_id}': {e}")
+        return {"callbackId": callback_id, "status": 'FAILED', "error": str(e)}
+
+    return {"callbackId": callback_id, "status": 'RELEASED', "error": None}
+
+
+def release_callback_id_list(
+        callback_id_list: List[str],
+        client: Optional['LambdaClient'] = None,
+) -> List[CallbackResult]:
+    """
+    Release a list of callback ids concurrently, over one shared client.
+    Returns one result per unique callback id, in the order they were given.
+    """
+    if client is None:
+        client = get_lambda_client()
+
+    return run_concurrently(
+        lambda callback_id_iter_: release_callback_id(callback_id_iter_, client=client),
+        dict.fromkeys(callback_id_list)
+    )
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+Shared boto3 clients for the fastq sync service
+
+Creating a boto3 client is slow (it loads the service model and builds a connection pool),
+so we create one client per service per lambda container and reuse it across warm invocations.
+Clients are created with keep-alive connections and a connection pool large enough for the
+concurrent fan out in concurrency.py.
+
+boto3 is only imported when the first client is requested.
+
+There are no shared http sessions here, the orcabus api calls go through orcabus_api_tools,
+which owns the http client (and its sessions) and does not take a session from the caller.
+"""
+
+# Standard library imports
+from threading import Lock
+from typing import Any, Dict
+import typing
+
+# Local imports
+from .concurrency import get_max_concurrency
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+    from mypy_boto3_lambda.client import LambdaClient
+    from mypy_boto3_stepfunctions.client import SFNClient
+
+# Globals
+# botocore's default pool size is 10, we want at least one connection per concurrent api call
+MIN_MAX_POOL_CONNECTIONS = 10
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 5
+DEFAULT_READ_TIMEOUT_SECONDS = 60
+
+# Service name -> client
+_CLIENT_REGISTRY: Dict[str, Any] = {}
+_CLIENT_REGISTRY_LOCK = Lock()
+
+
+def _create_boto3_client(service_name: str) -> Any:
+    # Deferred, boto3 and botocore account for much of the import time of a lambda
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        service_name,
+        config=Config(
+            max_pool_connections=max(get_max_concurrency(), MIN_MAX_POOL_CONNECTIONS),
+            tcp_keepalive=True,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=DEFAULT_READ_TIMEOUT_SECONDS,
+            retries={
+                "mode": "standard",
+            },
+        ),
+    )
+
+
+def get_boto3_client(service_name: str) -> Any:
+    """
+    Get the shared boto3 client for a service, creating it on first use.
+    boto3 clients are thread-safe, so the same client is shared between threads.
+    """
+    client = _CLIENT_REGISTRY.get(service_name, None)
+    if client is not None:
+        return client
+
+    with _CLIENT_REGISTRY_LOCK:
+        # Another thread may have created the client while we were waiting on the lock
+        if service_name not in _CLIENT_REGISTRY:
+            _CLIENT_REGISTRY[service_name] = _create_boto3_client(service_name)
+        return _CLIENT_REGISTRY[service_name]
+
+
+def clear_boto3_clients() -> None:
+    """
+    Drop all shared clients, the next request for each service creates a new client.
+    Mostly useful in tests, i.e. after changing the region or the endpoint environment variables.
+    """
+    with _CLIENT_REGISTRY_LOCK:
+        _CLIENT_REGISTRY.clear()
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    return get_boto3_client('dynamodb')
+
+
+def get_lambda_client() -> 'LambdaClient':
+    return get_boto3_client('lambda')
+
+
+def get_sfn_client() -> 'SFNClient':
+    return get_boto3_client('stepfunctions')
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Concurrency helpers for the fastq sync service
+
+Most of the time spent in our lambdas is waiting on the fastq manager, unarchiving and workflow APIs,
+so we fan out these calls over a bounded thread pool.
+"""
+
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from typing import Callable, Iterable, List, Optional, TypeVar
+import logging
+
+# Globals
+MAX_CONCURRENCY_ENV_VAR = "FASTQ_SYNC_MAX_CONCURRENCY"
+DEFAULT_MAX_CONCURRENCY = 10
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_concurrency() -> int:
+    """
+    Get the maximum number of concurrent outbound api calls a lambda should make.
+    Read from the FASTQ_SYNC_MAX_CONCURRENCY environment variable, falls back to the default
+    if the variable is not set or is not a positive integer.
+    """
+    max_concurrency_str = environ.get(MAX_CONCURRENCY_ENV_VAR, "")
+
+    if not max_concurrency_str:
+        return DEFAULT_MAX_CONCURRENCY
+
+    try:
+        max_concurrency = int(max_concurrency_str)
+    except ValueError:
+        logger.warning(
+            f"Could not parse {MAX_CONCURRENCY_ENV_VAR}='{max_concurrency_str}' as an integer, "
+            f"using the default of {DEFAULT_MAX_CONCURRENCY}"
+        )
+        return DEFAULT_MAX_CONCURRENCY
+
+    if max_concurrency < 1:
+        logger.warning(
+            f"{MAX_CONCURRENCY_ENV_VAR} must be a positive integer, "
+            f"using the default of {DEFAULT_MAX_CONCURRENCY}"
+        )
+        return DEFAULT_MAX_CONCURRENCY
+
+    return max_concurrency
+
+
+def run_concurrently(
+        func: Callable[[T], R],
+        items: Iterable[T],
+        max_concurrency: Optional[int] = None,
+) -> List[R]:
+    """
+    Run func over each item using a bounded thread pool.
+    The output list is in the same order as the input items.
+    Any exception raised by func is re-raised in the calling thread.
+    """
+    items = list(items)
+
+    if len(items) == 0:
+        return []
+
+    if max_concurrency is None:
+        max_concurrency = get_max_concurrency()
+
+    # No point spinning up a pool for a single item
+    if len(items) == 1 or max_concurrency == 1:
+        return list(map(func, items))
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+        return list(executor.map(func, items))
+
@@ -16,3 +16,7 @@ class ContextNotEligibleError(Exception):
             f"(bucket={bucket}, prefix={prefix}) and the context "
             f"is not eligible for automatic resolution."
         )
+
+
+class TaskTokenStoreError(Exception):
+    """Raised when the task token table cannot be updated, i.e. unprocessed items remain after all retries."""
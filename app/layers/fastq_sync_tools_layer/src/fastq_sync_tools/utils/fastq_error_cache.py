@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Negative cache for the fastq ids the fastq manager could not return
+
+Fastqs that have been deleted or replaced fail every get_fastq / get_fastq_jobs call,
+and the heartbeat would otherwise make the same failing calls on every run.
+The http status of a failed call is cached against the fastq id, for a time that depends on the status:
+  * 404 and 410 (the fastq does not exist) for an hour, a deleted fastq is not coming back
+  * 5xx (the fastq manager is unavailable) for 30 seconds, so we back off without hiding a recovery for long
+Any other error is not cached.
+
+While an error is cached, calls for the fastq id raise an HTTPError straight away.
+Fastq ids cached as not found are reported with get_not_found_fastq_id_list,
+so the task tokens waiting on them can be failed rather than heartbeated until they time out.
+"""
+
+# Standard library imports
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+import logging
+
+# Layer imports
+from requests import HTTPError
+from orcabus_api_tools.fastq.models import Fastq, Job
+
+# Local imports
+from .cache import TtlLruCache
+from .instrumented_api import get_fastq, get_fastq_jobs
+
+# Globals
+FASTQ_ERROR_CACHE_MAX_SIZE = 4096
+
+NOT_FOUND_STATUS_CODES = [404, 410]
+NOT_FOUND_TTL_SECONDS = 60 * 60
+SERVER_ERROR_TTL_SECONDS = 30
+
+# Fastq id -> (http status code, error message)
+FASTQ_ERROR_CACHE = TtlLruCache(
+    max_size=FASTQ_ERROR_CACHE_MAX_SIZE,
+    ttl_seconds=NOT_FOUND_TTL_SECONDS,
+)
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def get_http_status_code(error: HTTPError) -> Optional[int]:
+    if error.response is None:
+        return None
+    return error.response.status_code
+
+
+def get_fastq_error_ttl_seconds(status_code: Optional[int]) -> Optional[int]:
+    """
+    Get how long an error with this http status is cached for, None if it is not cached
+    """
+    if status_code in NOT_FOUND_STATUS_CODES:
+        return NOT_FOUND_TTL_SECONDS
+    if status_code is not None and 500 <= status_code < 600:
+        return SERVER_ERROR_TTL_SECONDS
+    return None
+
+
+def call_with_fastq_error_cache(fastq_id: str, func: Callable[[], T]) -> T:
+    """
+    Call func (an api call for this fastq id), unless an error for the fastq id is cached,
+    in which case an HTTPError is raised without making the call.
+    """
+    cached_error: Optional[Tuple[int, str]] = FASTQ_ERROR_CACHE.get(fastq_id)
+    if cached_error is not None:
+        raise HTTPError(f"{cached_error[1]} (cached http {cached_error[0]} for fastq {fastq_id})")
+
+    try:
+        return func()
+    except HTTPError as e:
+        status_code = get_http_status_code(e)
+        ttl_seconds = get_fastq_error_ttl_seconds(status_code)
+        if ttl_seconds is not None:
+            FASTQ_ERROR_CACHE.set(fastq_id, (status_code, str(e)), ttl_seconds=ttl_seconds)
+        raise
+
+
+def get_fastq_with_error_cache(fastq_id: str, **kwargs) -> Fastq:
+    return call_with_fastq_error_cache(fastq_id, lambda: get_fastq(fastq_id, **kwargs))
+
+
+def get_fastq_jobs_with_error_cache(fastq_id: str, **kwargs) -> List[Job]:
+    return call_with_fastq_error_cache(fastq_id, lambda: get_fastq_jobs(fastq_id=fastq_id, **kwargs))
+
+
+def get_not_found_fastq_id_list(fastq_id_list: List[str]) -> List[str]:
+    """
+    Get the fastq ids the fastq manager has told us (recently) do not exist, in the order given
+    """
+    return list(filter(
+        lambda fastq_id_iter_: (
+            (FASTQ_ERROR_CACHE.get(fastq_id_iter_) or (None, None))[0] in NOT_FOUND_STATUS_CODES
+        ),
+        dict.fromkeys(fastq_id_list)
+    ))
+
+
+def get_fastq_error_cache_stats() -> Dict[str, int]:
+    """
+    Get the hit / miss counters for the fastq error cache
+    """
+    return FASTQ_ERROR_CACHE.get_stats()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+"""
+Bulk fastq helpers for the fastq sync service
+"""
+
+# Standard library imports
+from datetime import datetime, timezone
+from os import environ
+from typing import Dict, List, Literal, Optional, Tuple, TypedDict, Union
+import asyncio
+import logging
+from requests import HTTPError
+
+# Layer imports
+from orcabus_api_tools.fastq.models import Fastq
+
+# Local imports
+from .async_api import get_fastq_with_error_cache_async
+from .fastq_error_cache import get_fastq_with_error_cache
+from .globals import REQUIREMENT
+from .concurrency import run_concurrently
+from .requirement_checks import (
+    has_active_readset,
+    has_qc,
+    has_fingerprint,
+    has_compression_metadata,
+    has_read_count_metadata,
+)
+
+# Fastqs taken from event payloads older than this are re-fetched from the fastq manager
+EVENT_FASTQ_MAX_AGE_SECONDS_ENV_VAR = "FASTQ_SYNC_EVENT_FASTQ_MAX_AGE_SECONDS"
+DEFAULT_EVENT_FASTQ_MAX_AGE_SECONDS = 300
+
+# The fastq fields the requirement evaluators read
+REQUIRED_EVENT_FASTQ_KEYS = ['id', 'readSet', 'qc', 'ntsm', 'readCount', 'baseCountEst']
+REQUIRED_EVENT_READSET_KEYS = ['r1', 'r2', 'compressionFormat']
+REQUIRED_EVENT_READ_KEYS = ['storageClass', 'gzipCompressionSizeInBytes', 'rawMd5sum']
+
+# Projection modes for fastq objects returned to the state machines
+FASTQ_PROJECTION_MODE = Literal["SLIM", "FULL"]
+DEFAULT_FASTQ_PROJECTION_MODE: FASTQ_PROJECTION_MODE = "SLIM"
+
+
+class ReadSetProjection(TypedDict):
+    compressionFormat: Optional[str]
+    storageClasses: List[str]
+
+
+class FastqProjection(TypedDict):
+    id: str
+    readSet: Optional[ReadSetProjection]
+    readCount: Optional[int]
+    baseCountEst: Optional[int]
+    requirementFlags: Dict[REQUIREMENT, bool]
+
+logger = logging.getLogger(__name__)
+
+
+def get_fastq_list(
+        fastq_id_list: List[str],
+        include_s3_details: bool = True,
+        max_concurrency: Optional[int] = None,
+) -> Tuple[List[Fastq], List[str]]:
+    """
+    Get a list of fastq objects from the fastq manager, fetching them concurrently.
+
+    Returns a tuple of (fastq_obj_list, failed_fastq_id_list).
+    Both lists preserve the order of the input fastq id list.
+    A fastq id is placed in the failed list if the fastq manager responds with an HTTPError,
+    or has recently responded with one (see fastq_error_cache.py).
+    """
+
+    def _get_fastq(fastq_id: str) -> Tuple[str, Optional[Fastq]]:
+        try:
+            return fastq_id, get_fastq_with_error_cache(fastq_id, includeS3Details=include_s3_details)
+        except HTTPError as e:
+            logger.warning(f"Could not get fastq {fastq_id}: {e}")
+            return fastq_id, None
+
+    fastq_obj_list: List[Fastq] = []
+    failed_fastq_id_list: List[str] = []
+
+    for fastq_id, fastq_obj in run_concurrently(_get_fastq, fastq_id_list, max_concurrency=max_concurrency):
+        if fastq_obj is None:
+            failed_fastq_id_list.append(fastq_id)
+            continue
+        fastq_obj_list.append(fastq_obj)
+
+    return fastq_obj_list, failed_fastq_id_list
+
+
+async def get_fastq_list_async(
+        fastq_id_list: List[str],
+        include_s3_details: bool = True,
+) -> Tuple[List[Fastq], List[str]]:
+    """
+    Asyncio variant of get_fastq_list, every fastq is requested at once and the number of requests in flight
+    is bounded by the shared async semaphore (see async_api.py).
+    """
+
+    async def _get_fastq(fastq_id: str) -> Tuple[str, Optional[Fastq]]:
+        try:
+            return fastq_id, await get_fastq_with_error_cache_async(fastq_id, includeS3Details=include_s3_details)
+        except HTTPError as e:
+            logger.warning(f"Could not get fastq {fastq_id}: {e}")
+            return fastq_id, None
+
+    fastq_obj_list: List[Fastq] = []
+    failed_fastq_id_list: List[str] = []
+
+    for fastq_id, fastq_obj in await asyncio.gather(*map(_get_fastq, fastq_id_list)):
+        if fastq_obj is None:
+            failed_fastq_id_list.append(fastq_id)
+            continue
+        fastq_obj_list.append(fastq_obj)
+
+    return fastq_obj_list, failed_fastq_id_list
+
+
+def get_event_fastq_max_age_seconds() -> int:
+    """
+    Get the maximum age of an event fastq before we re-fetch it from the fastq manager.
+    Read from the FASTQ_SYNC_EVENT_FASTQ_MAX_AGE_SECONDS environment variable, falls back to the default
+    if the variable is not set or is not a non-negative integer.
+    """
+    max_age_seconds_str = environ.get(EVENT_FASTQ_MAX_AGE_SECONDS_ENV_VAR, "")
+
+    try:
+        max_age_seconds = int(max_age_seconds_str) if max_age_seconds_str else DEFAULT_EVENT_FASTQ_MAX_AGE_SECONDS
+    except ValueError:
+        logger.warning(
+            f"Could not parse {EVENT_FASTQ_MAX_AGE_SECONDS_ENV_VAR}='{max_age_seconds_str}' as an integer, "
+            f"using the default of {DEFAULT_EVENT_FASTQ_MAX_AGE_SECONDS}"
+        )
+        return DEFAULT_EVENT_FASTQ_MAX_AGE_SECONDS
+
+    if max_age_seconds < 0:
+        return DEFAULT_EVENT_FASTQ_MAX_AGE_SECONDS
+
+    return max_age_seconds
+
+
+def parse_event_time(event_time: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an event time (an ISO 8601 timestamp, UTC if no timezone is given), None if it is missing or invalid
+    """
+    if not event_time:
+        return None
+    try:
+        event_datetime = datetime.fromisoformat(event_time.replace("Z", "+00:00"))
+    except ValueError:
+        logger.warning(f"Could not parse event time '{event_time}'")
+        return None
+    if event_datetime.tzinfo is None:
+        event_datetime = event_datetime.replace(tzinfo=timezone.utc)
+    return event_datetime
+
+
+def is_event_fastq_usable(
+        event_fastq_obj: Dict,
+        event_time: Optional[str],
+        max_age_seconds: Optional[int] = None,
+        last_event_at: Optional[int] = None,
+) -> bool:
+    """
+    Check whether a fastq taken from an event detail can be used in place of a get_fastq call.
+
+    The event must be fresh (event_time, an ISO 8601 timestamp, within max_age_seconds of now),
+    since a later update to the fastq may have been made since.
+    The event must not be older than the latest event already seen for the fastq (last_event_at, epoch seconds),
+    since events can be delivered out of order.
+    The fastq must have every field the requirement evaluators read.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = get_event_fastq_max_age_seconds()
+
+    # Freshness check
+    event_datetime = parse_event_time(event_time)
+    if event_datetime is None:
+        return False
+    if (datetime.now(timezone.utc) - event_datetime).total_seconds() > max_age_seconds:
+        return False
+
+    # Ordering check
+    if last_event_at is not None and event_datetime.timestamp() < last_event_at:
+        return False
+
+    # Completeness check
+    if not all(key_iter_ in event_fastq_obj for key_iter_ in REQUIRED_EVENT_FASTQ_KEYS):
+        return False
+
+    if event_fastq_obj['readSet'] is not None:
+        if not all(key_iter_ in event_fastq_obj['readSet'] for key_iter_ in REQUIRED_EVENT_READSET_KEYS):
+            return False
+        for readset_iter_ in [event_fastq_obj['readSet']['r1'], event_fastq_obj['readSet']['r2']]:
+            if readset_iter_ is None:
+                continue
+            if not all(key_iter_ in readset_iter_ for key_iter_ in REQUIRED_EVENT_READ_KEYS):
+                return False
+            if readset_iter_['storageClass'] is None:
+                return False
+
+    return True
+
+
+def get_fastq_list_with_event_fastqs(
+        fastq_id_list: List[str],
+        event_fastq_obj_list: Optional[List[Dict]] = None,
+        event_time: Optional[str] = None,
+        include_s3_details: bool = True,
+        max_concurrency: Optional[int] = None,
+        last_event_at_by_fastq_id: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Fastq], List[str]]:
+    """
+    As get_fastq_list, but fastqs supplied in an event payload (i.e. the detail of a FastqStateChange event)
+    are used as is, provided they are fresh, in order and complete (see is_event_fastq_usable).
+    last_event_at_by_fastq_id is the time of the latest event already seen for each fastq id.
+    We only fall back to the fastq manager for the remaining fastq ids.
+    """
+    usable_event_fastq_obj_by_id: Dict[str, Fastq] = {}
+    for event_fastq_obj_iter_ in (event_fastq_obj_list or []):
+        if not isinstance(event_fastq_obj_iter_, dict) or 'id' not in event_fastq_obj_iter_:
+            continue
+        if is_event_fastq_usable(
+                event_fastq_obj_iter_, event_time,
+                last_event_at=(last_event_at_by_fastq_id or {}).get(event_fastq_obj_iter_['id'], None),
+        ):
+            usable_event_fastq_obj_by_id[event_fastq_obj_iter_['id']] = event_fastq_obj_iter_
+
+    fetched_fastq_obj_list, failed_fastq_id_list = get_fastq_list(
+        list(filter(
+            lambda fastq_id_iter_: fastq_id_iter_ not in usable_event_fastq_obj_by_id,
+            fastq_id_list
+        )),
+        include_s3_details=include_s3_details,
+        max_concurrency=max_concurrency,
+    )
+
+    if len(event_fastq_obj_list or []) > 0:
+        logger.info(
+            f"Using {len(usable_event_fastq_obj_by_id)} fastqs from the event payload, "
+            f"fetched {len(fetched_fastq_obj_list) + len(failed_fastq_id_list)} fastqs from the fastq manager"
+        )
+
+    # Preserve the order of the input list
+    fastq_obj_by_id: Dict[str, Fastq] = {
+        **dict(map(
+            lambda fastq_obj_iter_: (fastq_obj_iter_['id'], fastq_obj_iter_),
+            fetched_fastq_obj_list
+        )),
+        **usable_event_fastq_obj_by_id,
+    }
+
+    return (
+        list(map(
+            lambda fastq_id_iter_: fastq_obj_by_id[fastq_id_iter_],
+            filter(
+                lambda fastq_id_iter_: fastq_id_iter_ in fastq_obj_by_id,
+                fastq_id_list
+            )
+        )),
+        failed_fastq_id_list
+    )
+
+
+def get_fastq_projection(fastq_obj: Fastq) -> FastqProjection:
+    """
+    Project a fastq down to the fields the state machines branch on.
+
+    The full fastq object (particularly with S3 details) can get close to the step functions payload limit,
+    whereas the projection is a fixed handful of fields:
+      * id
+      * readSet: null if the fastq has no readset, otherwise the compression format and the storage classes
+      * readCount / baseCountEst: kept as is, since the state machines check these exist
+      * requirementFlags: the (context-free) result of each requirement check
+    """
+    if fastq_obj['readSet'] is None:
+        read_set_projection = None
+    else:
+        read_set_projection: ReadSetProjection = {
+            "compressionFormat": fastq_obj['readSet'].get('compressionFormat', None),
+            "storageClasses": list(map(
+                lambda readset_iter_: readset_iter_['storageClass'],
+                filter(
+                    lambda readset_iter_: readset_iter_ is not None,
+                    [fastq_obj['readSet']['r1'], fastq_obj['readSet']['r2']]
+                )
+            )),
+        }
+
+    return {
+        "id": fastq_obj['id'],
+        "readSet": read_set_projection,
+        "readCount": fastq_obj.get('readCount', None),
+        "baseCountEst": fastq_obj.get('baseCountEst', None),
+        "requirementFlags": {
+            "hasActiveReadSet": has_active_readset(fastq_obj),
+            "hasQc": has_qc(fastq_obj),
+            "hasFingerprint": has_fingerprint(fastq_obj),
+            "hasFileCompressionInformation": has_compression_metadata(fastq_obj),
+            "hasReadCountInformation": has_read_count_metadata(fastq_obj),
+        },
+    }
+
+
+def project_fastq(
+        fastq_obj: Fastq,
+        projection_mode: FASTQ_PROJECTION_MODE = DEFAULT_FASTQ_PROJECTION_MODE,
+) -> Union[Fastq, FastqProjection]:
+    """
+    Return the fastq in the requested projection mode, SLIM (see get_fastq_projection) or FULL (unchanged)
+    """
+    if projection_mode == "FULL":
+        return fastq_obj
+    if projection_mode == "SLIM":
+        return get_fastq_projection(fastq_obj)
+    raise ValueError(f"Unknown fastq projection mode: {projection_mode}")
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from typing import Literal, List
+from typing import Literal, List, Dict
 
 ACTIVE_STORAGE_CLASSES_TYPE = Literal[
     "Standard",
@@ -20,3 +20,15 @@ REQUIREMENT = Literal[
     "hasFileCompressionInformation",
     "hasReadCountInformation",
 ]
+
+# Requirements matrix
+# Maps each fastq id to the result of each requirement evaluated against that fastq
+REQUIREMENTS_MATRIX = Dict[str, Dict[REQUIREMENT, bool]]
+
+# Requirements that are satisfied by running a fastq manager job
+REQUIREMENT_TO_JOB_TYPE_MAP: Dict[REQUIREMENT, str] = {
+    "hasQc": "QC",
+    "hasFingerprint": "NTSM",
+    "hasFileCompressionInformation": "FILE_COMPRESSION",
+    "hasReadCountInformation": "READ_COUNT",
+}
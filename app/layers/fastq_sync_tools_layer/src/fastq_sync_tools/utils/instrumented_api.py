@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+The orcabus api calls used by the fastq sync service, with api metrics (see metrics.py)
+
+Import api calls from here rather than from orcabus_api_tools, so that every call is counted and timed.
+Endpoints are named after the orcabus_api_tools module and function.
+"""
+
+# Layer imports
+from orcabus_api_tools.fastq import (
+    get_fastq as _get_fastq,
+    get_fastq_jobs as _get_fastq_jobs,
+    run_qc_stats as _run_qc_stats,
+    run_file_compression_stats as _run_file_compression_stats,
+    run_ntsm as _run_ntsm,
+    run_read_count_stats as _run_read_count_stats,
+    to_fastq_list_row as _to_fastq_list_row,
+)
+from orcabus_api_tools.fastq_unarchiving import (
+    create_job as _create_unarchiving_job,
+    get_job_list_for_fastq as _get_unarchiving_job_list_for_fastq,
+)
+from orcabus_api_tools.workflow import (
+    list_workflow_runs as _list_workflow_runs,
+    get_workflow_run as _get_workflow_run,
+)
+
+# Local imports
+from .metrics import record_api_call
+
+# Fastq manager
+get_fastq = record_api_call("fastq.get_fastq", _get_fastq)
+get_fastq_jobs = record_api_call("fastq.get_fastq_jobs", _get_fastq_jobs)
+run_qc_stats = record_api_call("fastq.run_qc_stats", _run_qc_stats)
+run_file_compression_stats = record_api_call("fastq.run_file_compression_stats", _run_file_compression_stats)
+run_ntsm = record_api_call("fastq.run_ntsm", _run_ntsm)
+run_read_count_stats = record_api_call("fastq.run_read_count_stats", _run_read_count_stats)
+to_fastq_list_row = record_api_call("fastq.to_fastq_list_row", _to_fastq_list_row)
+
+# Fastq unarchiving
+create_unarchiving_job = record_api_call("fastq_unarchiving.create_job", _create_unarchiving_job)
+get_unarchiving_job_list_for_fastq = record_api_call(
+    "fastq_unarchiving.get_job_list_for_fastq", _get_unarchiving_job_list_for_fastq
+)
+
+# Workflow manager
+list_workflow_runs = record_api_call("workflow.list_workflow_runs", _list_workflow_runs)
+get_workflow_run = record_api_call("workflow.get_workflow_run", _get_workflow_run)
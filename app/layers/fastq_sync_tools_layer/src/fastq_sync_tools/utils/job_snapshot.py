@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Point-in-time snapshot of the fastq manager jobs for a fastq
+
+Fetches the jobs list once so that checking for (and launching) multiple job types
+only costs a single get_fastq_jobs call
+"""
+
+# Standard library imports
+from typing import Dict, List, Optional
+
+# Layer imports
+from orcabus_api_tools.fastq.models import Job, JobType
+
+# Local imports
+from .instrumented_api import get_fastq_jobs
+
+# Globals
+ACTIVE_JOB_STATUS_LIST = ['PENDING', 'RUNNING']
+
+
+class FastqJobSnapshot:
+    """
+    The active (PENDING / RUNNING) fastq manager jobs for a fastq, indexed by job type
+    """
+
+    def __init__(self, fastq_id: str, job_list: Optional[List[Job]] = None):
+        self.fastq_id = fastq_id
+
+        # Only query the fastq manager if we haven't been given the jobs list
+        if job_list is None:
+            job_list = get_fastq_jobs(fastq_id)
+
+        self.active_jobs_by_type: Dict[JobType, List[Job]] = {}
+        for job_iter_ in job_list:
+            self.add_job(job_iter_)
+
+    def add_job(self, job: Job) -> None:
+        """
+        Add a job to the snapshot (i.e. one we have just launched), ignored if the job is not active
+        """
+        if job['status'] not in ACTIVE_JOB_STATUS_LIST:
+            return
+        self.active_jobs_by_type.setdefault(job['jobType'], []).append(job)
+
+    def has_active_job(self, job_type: JobType) -> bool:
+        return len(self.active_jobs_by_type.get(job_type, [])) > 0
+
+    def get_active_jobs(self, job_type: JobType) -> List[Job]:
+        return self.active_jobs_by_type.get(job_type, [])
+
+    def has_any_active_job(self) -> bool:
+        return any(
+            len(job_list_iter_) > 0
+            for job_list_iter_ in self.active_jobs_by_type.values()
+        )
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+"""
+Batch requirement launching for the fastq sync service
+
+Given a list of fastq ids and a set of requirements, work out which requirements each fastq is missing
+and launch the jobs required to satisfy them, in a single bounded-concurrency pass.
+"""
+
+# Standard library imports
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+from requests import HTTPError
+
+# Layer imports
+from orcabus_api_tools.fastq.models import Fastq
+
+# Local imports
+from .globals import REQUIREMENT, REQUIREMENT_TO_JOB_TYPE_MAP
+from .exceptions import ContextNotEligibleError
+from .async_api import run_api_call_async, run_async
+from .concurrency import get_max_concurrency
+from .fastq_helpers import get_fastq_list_async
+from .job_snapshot import FastqJobSnapshot
+from .unarchiving_helpers import run_grouped_unarchiving_jobs
+from .requirement_plan import compile_requirement_plan
+from .requirement_checks import has_read_count_metadata
+from .utils import (
+    check_fastq_against_requirements_list,
+    run_fastq_job,
+)
+
+# Jobs that need the read count information to be available before they can be launched
+READ_COUNT_DEPENDENT_REQUIREMENTS: List[REQUIREMENT] = [
+    "hasQc",
+    "hasFileCompressionInformation",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def get_requirements_to_launch(
+        fastq_obj: Fastq,
+        unsatisfied_requirements: List[REQUIREMENT],
+) -> List[REQUIREMENT]:
+    """
+    Given a fastq and its unsatisfied requirements, return the requirements we can launch jobs for right now.
+
+    * If the fastq has no readset, there is nothing we can launch.
+    * If the readset is not active, we can only launch the unarchiving job.
+    * QC and file compression jobs are only launched once the read count information is available
+      (and we are not also launching the read count job).
+    """
+    if fastq_obj['readSet'] is None:
+        return []
+
+    if "hasActiveReadSet" in unsatisfied_requirements:
+        return ["hasActiveReadSet"]
+
+    requirements_to_launch: List[REQUIREMENT] = []
+    for requirement_iter_ in unsatisfied_requirements:
+        if requirement_iter_ not in REQUIREMENT_TO_JOB_TYPE_MAP:
+            continue
+
+        if requirement_iter_ in READ_COUNT_DEPENDENT_REQUIREMENTS and (
+                not has_read_count_metadata(fastq_obj) or
+                "hasReadCountInformation" in unsatisfied_requirements
+        ):
+            continue
+
+        requirements_to_launch.append(requirement_iter_)
+
+    return requirements_to_launch
+
+
+def launch_requirements_for_fastq_id_list(
+        fastq_id_list: List[str],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        max_concurrency: Optional[int] = None,
+        unarchiving_job_group_size: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Sync wrapper of launch_requirements_for_fastq_id_list_async, for the lambda handlers
+    """
+    return run_async(launch_requirements_for_fastq_id_list_async(
+        fastq_id_list,
+        requirements,
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+        max_concurrency=max_concurrency,
+        unarchiving_job_group_size=unarchiving_job_group_size,
+    ))
+
+
+async def launch_requirements_for_fastq_id_list_async(
+        fastq_id_list: List[str],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        max_concurrency: Optional[int] = None,
+        unarchiving_job_group_size: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Launch the jobs required for each fastq in the list to satisfy the requirements.
+
+    Archived fastqs are grouped into unarchiving jobs of at most unarchiving_job_group_size fastqs
+    (see run_grouped_unarchiving_jobs), fastqs with an active unarchiving job are skipped.
+
+    Returns one summary per fastq id (in input order) with the following keys:
+      * fastqId
+      * satisfiedRequirements
+      * unsatisfiedRequirements
+      * launchedRequirements: the requirements we launched a job for
+      * error: set if the fastq could not be retrieved or evaluated, otherwise None
+
+    The fastqs are fetched and launched on the shared async thread pool (see async_api.py),
+    at most max_concurrency fastqs are launched at a time.
+    """
+    # Get fastqs (concurrently)
+    fastq_obj_list, failed_fastq_id_list = await get_fastq_list_async(
+        fastq_id_list,
+        include_s3_details=True,
+    )
+
+    # Initialise the summaries
+    summary_by_fastq_id: Dict[str, Dict[str, Any]] = dict(map(
+        lambda fastq_id_iter_: (
+            fastq_id_iter_,
+            {
+                "fastqId": fastq_id_iter_,
+                "satisfiedRequirements": [],
+                "unsatisfiedRequirements": [],
+                "launchedRequirements": [],
+                "error": None,
+            }
+        ),
+        fastq_id_list
+    ))
+
+    for fastq_id_iter_ in failed_fastq_id_list:
+        summary_by_fastq_id[fastq_id_iter_]['error'] = "Could not retrieve fastq from the fastq manager"
+
+    # Work out what each fastq needs (no api calls required unless we are context-aware)
+    requirements_to_launch_by_fastq_id: Dict[str, List[REQUIREMENT]] = {}
+    requirement_plan = compile_requirement_plan(
+        requirements,
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+    )
+
+    async def _check_fastq_against_requirements_list(fastq_obj_: Fastq) -> Tuple[List[REQUIREMENT], List[REQUIREMENT]]:
+        # Context-aware requirements list the context bucket, so are run on the shared async thread pool
+        if requirement_plan.is_network_backed():
+            return await run_api_call_async(
+                check_fastq_against_requirements_list,
+                fastq_obj=fastq_obj_,
+                requirements=requirements,
+                requirement_plan=requirement_plan,
+            )
+        return check_fastq_against_requirements_list(
+            fastq_obj=fastq_obj_,
+            requirements=requirements,
+            requirement_plan=requirement_plan,
+        )
+
+    split_requirements_list = await asyncio.gather(
+        *map(_check_fastq_against_requirements_list, fastq_obj_list),
+        return_exceptions=True,
+    )
+    for fastq_obj, split_requirements in zip(fastq_obj_list, split_requirements_list):
+        if isinstance(split_requirements, (ContextNotEligibleError, ValueError)):
+            logger.warning(f"Could not evaluate requirements for fastq {fastq_obj['id']}: {split_requirements}")
+            summary_by_fastq_id[fastq_obj['id']]['error'] = str(split_requirements)
+            continue
+        if isinstance(split_requirements, BaseException):
+            raise split_requirements
+        satisfied_requirements, unsatisfied_requirements = split_requirements
+
+        summary_by_fastq_id[fastq_obj['id']]['satisfiedRequirements'] = satisfied_requirements
+        summary_by_fastq_id[fastq_obj['id']]['unsatisfiedRequirements'] = unsatisfied_requirements
+        requirements_to_launch_by_fastq_id[fastq_obj['id']] = get_requirements_to_launch(
+            fastq_obj, unsatisfied_requirements
+        )
+
+    # Launch the unarchiving jobs as groups
+    # Fastqs that already have an active unarchiving job are skipped
+    fastq_id_list_to_unarchive = list(filter(
+        lambda fastq_id_iter_: "hasActiveReadSet" in requirements_to_launch_by_fastq_id[fastq_id_iter_],
+        requirements_to_launch_by_fastq_id.keys()
+    ))
+    if len(fastq_id_list_to_unarchive) > 0:
+        try:
+            for unarchiving_job_iter_ in await run_api_call_async(
+                    run_grouped_unarchiving_jobs,
+                    fastq_id_list_to_unarchive,
+                    group_size=unarchiving_job_group_size,
+            ):
+                for fastq_id_iter_ in unarchiving_job_iter_['fastqIds']:
+                    if fastq_id_iter_ not in summary_by_fastq_id:
+                        continue
+                    summary_by_fastq_id[fastq_id_iter_]['launchedRequirements'] = ["hasActiveReadSet"]
+        except HTTPError as e:
+            logger.warning(f"Could not launch unarchiving jobs: {e}")
+            for fastq_id_iter_ in fastq_id_list_to_unarchive:
+                summary_by_fastq_id[fastq_id_iter_]['error'] = str(e)
+
+    def _launch_fastq_requirements(fastq_obj_: Fastq) -> List[REQUIREMENT]:
+        requirements_to_launch = requirements_to_launch_by_fastq_id.get(fastq_obj_['id'], [])
+        launched_requirements: List[REQUIREMENT] = []
+
+        if len(requirements_to_launch) == 0:
+            return launched_requirements
+
+        # Unarchiving jobs have already been launched as groups
+        if "hasActiveReadSet" in requirements_to_launch:
+            return launched_requirements
+
+        # Run internal jobs, one jobs lookup per fastq
+        job_snapshot = FastqJobSnapshot(fastq_obj_['id'])
+        for requirement_iter_ in requirements_to_launch:
+            if run_fastq_job(
+                    fastq_obj_,
+                    REQUIREMENT_TO_JOB_TYPE_MAP[requirement_iter_],
+                    job_snapshot=job_snapshot
+            ) is not None:
+                launched_requirements.append(requirement_iter_)
+
+        return launched_requirements
+
+    def _launch_fastq_requirements_safe(fastq_obj_: Fastq) -> None:
+        try:
+            summary_by_fastq_id[fastq_obj_['id']]['launchedRequirements'] = _launch_fastq_requirements(fastq_obj_)
+        except HTTPError as e:
+            logger.warning(f"Could not launch requirements for fastq {fastq_obj_['id']}: {e}")
+            summary_by_fastq_id[fastq_obj_['id']]['error'] = str(e)
+
+    launch_semaphore = asyncio.Semaphore(
+        max_concurrency if max_concurrency is not None else get_max_concurrency()
+    )
+
+    async def _launch_fastq_requirements_async(fastq_obj_: Fastq) -> None:
+        async with launch_semaphore:
+            await run_api_call_async(_launch_fastq_requirements_safe, fastq_obj_)
+
+    # Launch all other jobs in one bounded-concurrency pass
+    await asyncio.gather(*map(
+        _launch_fastq_requirements_async,
+        filter(
+            lambda fastq_obj_iter_: (
+                fastq_obj_iter_['id'] in requirements_to_launch_by_fastq_id and
+                "hasActiveReadSet" not in requirements_to_launch_by_fastq_id[fastq_obj_iter_['id']]
+            ),
+            fastq_obj_list
+        )
+    ))
+
+    return list(summary_by_fastq_id.values())
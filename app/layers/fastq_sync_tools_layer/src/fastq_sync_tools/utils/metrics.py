@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+Api call metrics for the fastq sync service
+
+Outbound api calls (see instrumented_api.py) record a call count, an error count and a latency histogram
+per endpoint. The metrics are written to stdout as CloudWatch embedded metric format (EMF) log lines
+when the handler returns (see with_api_metrics), one line per endpoint.
+
+Metrics are switched off with FASTQ_SYNC_API_METRICS_ENABLED=false.
+FASTQ_SYNC_API_METRICS_SAMPLE_RATE (0 to 1) sets the fraction of invocations that emit their metrics,
+the sample rate is included in each log line so counts can be scaled back up.
+"""
+
+# Standard library imports
+from bisect import bisect_left
+from functools import wraps
+from os import environ
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+import json
+import logging
+import random
+import time
+
+# Globals
+API_METRICS_ENABLED_ENV_VAR = "FASTQ_SYNC_API_METRICS_ENABLED"
+API_METRICS_SAMPLE_RATE_ENV_VAR = "FASTQ_SYNC_API_METRICS_SAMPLE_RATE"
+API_METRICS_NAMESPACE_ENV_VAR = "FASTQ_SYNC_API_METRICS_NAMESPACE"
+
+DEFAULT_API_METRICS_SAMPLE_RATE = 1.0
+DEFAULT_API_METRICS_NAMESPACE = "OrcaBus/FastqSyncManager"
+
+# Latencies are recorded against the upper bound of their bucket,
+# anything slower than the last bound is recorded against the last bound
+LATENCY_BUCKET_BOUNDS_MS = [
+    1, 2, 5, 10, 20, 50, 100, 200, 500,
+    1000, 2000, 5000, 10000, 30000, 60000,
+]
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def is_api_metrics_enabled() -> bool:
+    return environ.get(API_METRICS_ENABLED_ENV_VAR, "true").lower() not in ["false", "0", "no", "off"]
+
+
+def get_api_metrics_sample_rate() -> float:
+    """
+    Get the fraction of invocations that emit their api metrics.
+    Read from the FASTQ_SYNC_API_METRICS_SAMPLE_RATE environment variable, falls back to the default
+    if the variable is not set or is not a number between 0 and 1.
+    """
+    sample_rate_str = environ.get(API_METRICS_SAMPLE_RATE_ENV_VAR, "")
+
+    if not sample_rate_str:
+        return DEFAULT_API_METRICS_SAMPLE_RATE
+
+    try:
+        sample_rate = float(sample_rate_str)
+    except ValueError:
+        logger.warning(
+            f"Could not parse {API_METRICS_SAMPLE_RATE_ENV_VAR}='{sample_rate_str}' as a number, "
+            f"using the default of {DEFAULT_API_METRICS_SAMPLE_RATE}"
+        )
+        return DEFAULT_API_METRICS_SAMPLE_RATE
+
+    if not 0 <= sample_rate <= 1:
+        logger.warning(
+            f"{API_METRICS_SAMPLE_RATE_ENV_VAR} must be between 0 and 1, "
+            f"using the default of {DEFAULT_API_METRICS_SAMPLE_RATE}"
+        )
+        return DEFAULT_API_METRICS_SAMPLE_RATE
+
+    return sample_rate
+
+
+def get_latency_bucket_ms(latency_ms: float) -> int:
+    bucket_index = bisect_left(LATENCY_BUCKET_BOUNDS_MS, latency_ms)
+    return LATENCY_BUCKET_BOUNDS_MS[min(bucket_index, len(LATENCY_BUCKET_BOUNDS_MS) - 1)]
+
+
+class ApiMetrics:
+    """
+    Thread-safe per endpoint call counts, error counts and latency histograms, since the last flush
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        # Endpoint -> latency bucket (ms) -> count
+        self._latency_histograms: Dict[str, Dict[int, int]] = {}
+        self._lock = Lock()
+
+    def record(self, endpoint: str, latency_ms: float, is_error: bool = False) -> None:
+        latency_bucket_ms = get_latency_bucket_ms(latency_ms)
+        with self._lock:
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+            if is_error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            latency_histogram = self._latency_histograms.setdefault(endpoint, {})
+            latency_histogram[latency_bucket_ms] = latency_histogram.get(latency_bucket_ms, 0) + 1
+
+    def get_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the metrics recorded so far, by endpoint
+        """
+        with self._lock:
+            return dict(map(
+                lambda endpoint_iter_: (
+                    endpoint_iter_,
+                    {
+                        "calls": self._calls[endpoint_iter_],
+                        "errors": self._errors.get(endpoint_iter_, 0),
+                        "latencyHistogramMs": dict(sorted(self._latency_histograms[endpoint_iter_].items())),
+                    }
+                ),
+                sorted(self._calls.keys())
+            ))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._errors.clear()
+            self._latency_histograms.clear()
+
+
+# Lives for the lifetime of the lambda container, flushed at the end of each invocation
+API_METRICS = ApiMetrics()
+
+
+def record_api_call(endpoint: str, func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap an api call so that each call records its latency (and whether it raised) against the endpoint
+    """
+    @wraps(func)
+    def _record_api_call(*args, **kwargs) -> T:
+        if not is_api_metrics_enabled():
+            return func(*args, **kwargs)
+
+        start_time = time.perf_counter()
+        is_error = True
+        try:
+            result = func(*args, **kwargs)
+            is_error = False
+            return result
+        finally:
+            API_METRICS.record(endpoint, (time.perf_counter() - start_time) * 1000, is_error=is_error)
+
+    return _record_api_call
+
+
+def get_api_metrics_emf_log_lines(
+        snapshot: Dict[str, Dict[str, Any]],
+        sample_rate: float,
+        function_name: Optional[str] = None,
+) -> List[str]:
+    """
+    Build one EMF log line per endpoint from a metrics snapshot
+    """
+    if function_name is None:
+        function_name = environ.get("AWS_LAMBDA_FUNCTION_NAME", "unknown")
+
+    timestamp_ms = int(time.time() * 1000)
+    log_lines: List[str] = []
+    for endpoint_iter_, endpoint_metrics_iter_ in snapshot.items():
+        latency_histogram = endpoint_metrics_iter_['latencyHistogramMs']
+        log_lines.append(json.dumps({
+            "_aws": {
+                "Timestamp": timestamp_ms,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": environ.get(API_METRICS_NAMESPACE_ENV_VAR, DEFAULT_API_METRICS_NAMESPACE),
+                        "Dimensions": [["FunctionName", "Endpoint"], ["Endpoint"]],
+                        "Metrics": [
+                            {"Name": "ApiCalls", "Unit": "Count"},
+                            {"Name": "ApiErrors", "Unit": "Count"},
+                            {"Name": "ApiErrorRate", "Unit": "Percent"},
+                            {"Name": "ApiLatency", "Unit": "Milliseconds"},
+                        ],
+                    }
+                ],
+            },
+            "FunctionName": function_name,
+            "Endpoint": endpoint_iter_,
+            "SampleRate": sample_rate,
+            "ApiCalls": endpoint_metrics_iter_['calls'],
+            "ApiErrors": endpoint_metrics_iter_['errors'],
+            "ApiErrorRate": 100 * endpoint_metrics_iter_['errors'] / endpoint_metrics_iter_['calls'],
+            # EMF histogram, each latency bucket with the number of calls that fell in it
+            "ApiLatency": {
+                "Values": list(latency_histogram.keys()),
+                "Counts": list(latency_histogram.values()),
+            },
+        }))
+
+    return log_lines
+
+
+def flush_api_metrics() -> None:
+    """
+    Write the api metrics recorded since the last flush as EMF log lines (if this invocation is sampled),
+    then reset them
+    """
+    snapshot = API_METRICS.get_snapshot()
+    API_METRICS.reset()
+
+    if not is_api_metrics_enabled() or len(snapshot) == 0:
+        return
+
+    sample_rate = get_api_metrics_sample_rate()
+    if random.random() >= sample_rate:
+        return
+
+    # EMF log lines must be written as-is, so we print rather than log (the lambda log handler adds a prefix)
+    for log_line_iter_ in get_api_metrics_emf_log_lines(snapshot, sample_rate):
+        print(log_line_iter_, flush=True)
+
+
+def with_api_metrics(handler: Callable[[Any, Any], T]) -> Callable[[Any, Any], T]:
+    """
+    Decorate a lambda handler to flush the api metrics when the handler returns (or raises)
+    """
+    @wraps(handler)
+    def _with_api_metrics(event: Any, context: Any) -> T:
+        try:
+            return handler(event, context)
+        finally:
+            try:
+                flush_api_metrics()
+            except Exception as e:
+                # Metrics must never fail the invocation
+                logger.warning(f"Could not flush api metrics: {e}")
+
+    return _with_api_metrics
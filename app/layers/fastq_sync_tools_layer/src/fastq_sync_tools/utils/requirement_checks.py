@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""
+Requirement checks for the fastq sync service
+
+The checks each requirement makes against a fastq object, and the hasActiveReadSet evaluator.
+The built-in requirement evaluators are registered against these in requirement_plan.py.
+"""
+
+# Standard library imports
+from os import environ
+from typing import Dict, Tuple
+import logging
+import typing
+
+# Layer imports
+from requests import HTTPError
+from orcabus_api_tools.fastq.models import Fastq
+
+# Local imports
+from .cache import TtlLruCache
+from .exceptions import ContextNotEligibleError
+from .globals import ACTIVE_STORAGE_CLASSES
+from .instrumented_api import to_fastq_list_row
+
+if typing.TYPE_CHECKING:
+    from .requirement_plan import RequirementEvaluationContext
+
+# Import test data
+TEST_DATA_BUCKET_ENV_VAR = "TEST_DATA_BUCKET"
+TEST_DATA_PREFIX_ENV_VAR = "TEST_DATA_PREFIX"
+
+# Context-aware readset resolution cache
+# Keyed on (fastq id, bucket, prefix), lives for the lifetime of the (warm) lambda container
+# Negative results expire faster since a readset may be copied into the context at any time
+CONTEXT_READSET_CACHE_MAX_SIZE = 4096
+CONTEXT_READSET_CACHE_TTL_SECONDS = 600
+CONTEXT_READSET_CACHE_NEGATIVE_TTL_SECONDS = 60
+
+CONTEXT_READSET_CACHE = TtlLruCache(
+    max_size=CONTEXT_READSET_CACHE_MAX_SIZE,
+    ttl_seconds=CONTEXT_READSET_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=CONTEXT_READSET_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def has_active_readset(fastq_obj: Fastq) -> bool:
+    if fastq_obj['readSet'] is None:
+        return False
+
+    readset_objects = list(filter(
+        lambda readset_iter_: readset_iter_ is not None,
+        [fastq_obj['readSet']['r1'], fastq_obj['readSet']['r2']]
+    ))
+
+    for readset_object in readset_objects:
+        # If the storage class is not in the active storage classes or
+        if readset_object['storageClass'] not in ACTIVE_STORAGE_CLASSES:
+            return False
+
+    return True
+
+
+def has_active_readset_in_context(fastq_obj: Fastq, bucket: str, prefix: str) -> bool:
+    """
+    Check whether the FASTQ readset is resolvable in the provided (bucket, prefix) context.
+
+    This implementation delegates the validation to `orcabus_api_tools.fastq.to_fastq_list_row(...)`:
+    it returns True if that call succeeds, and False if it raises an HTTPError.
+    """
+    if fastq_obj['readSet'] is None:
+        return False
+
+    # Try running to_fastq_list_row with the test data bucket
+    # If this passes, we're exempt because this is accessible from all projects
+    if is_fastq_resolvable_in_context(
+            fastq_id=fastq_obj['id'],
+            bucket=environ[TEST_DATA_BUCKET_ENV_VAR],
+            prefix=environ[TEST_DATA_PREFIX_ENV_VAR],
+    ):
+        return True
+
+    # Try running to_fastq_list_row with the bucket and prefix context
+    return is_fastq_resolvable_in_context(
+        fastq_id=fastq_obj['id'],
+        bucket=bucket,
+        prefix=prefix,
+    )
+
+
+def is_fastq_resolvable_in_context(fastq_id: str, bucket: str, prefix: str) -> bool:
+    """
+    Check whether to_fastq_list_row resolves the fastq in the (bucket, prefix) context.
+    Results are cached in CONTEXT_READSET_CACHE across warm invocations.
+    """
+    cache_key = (fastq_id, bucket, prefix)
+
+    is_resolvable = CONTEXT_READSET_CACHE.get(cache_key)
+    if is_resolvable is not None:
+        return is_resolvable
+
+    try:
+        to_fastq_list_row(
+            fastq_id=fastq_id,
+            bucket=bucket,
+            key_prefix=prefix,
+        )
+        is_resolvable = True
+    except HTTPError:
+        is_resolvable = False
+
+    CONTEXT_READSET_CACHE.set(cache_key, is_resolvable)
+    return is_resolvable
+
+
+def get_context_readset_cache_stats() -> Dict[str, int]:
+    """
+    Get the hit / miss counters for the context-aware readset resolution cache
+    """
+    return CONTEXT_READSET_CACHE.get_stats()
+
+
+def has_qc(fastq_obj: Fastq) -> bool:
+    return fastq_obj['qc'] is not None
+
+
+def has_fingerprint(fastq_obj: Fastq) -> bool:
+    return fastq_obj['ntsm'] is not None
+
+
+def has_compression_metadata(fastq_obj: Fastq) -> bool:
+    # Check active readset
+    if not has_active_readset(fastq_obj):
+        return False
+
+    # Can assert we have an active readset and that the readset is not None
+
+    # Let's check if the compression format is ORA, if not, we can assume that the compression metadata
+    # Condition is satisfied
+    if fastq_obj['readSet']['compressionFormat'] != 'ORA':
+        return True
+
+    # If the compression format is ORA, then we need to check if the compression metadata is present
+    readset_objects = list(filter(
+        lambda readset_iter_: readset_iter_ is not None,
+        [fastq_obj['readSet']['r1'], fastq_obj['readSet']['r2']]
+    ))
+
+    for readset_object in readset_objects:
+        if readset_object['gzipCompressionSizeInBytes'] is None or readset_object['rawMd5sum'] is None:
+            return False
+
+    # If we got to here then the compression metadata is present in all readsets for this fastq list row
+    return True
+
+
+def has_read_count_metadata(fastq_obj: Fastq) -> bool:
+    if fastq_obj['readCount'] is None or fastq_obj['baseCountEst'] is None:
+        return False
+    return True
+
+
+def get_pipeline_cache_config() -> Tuple[str, str]:
+    """
+    Read and validate PIPELINE_CACHE_BUCKET and PIPELINE_CACHE_PREFIX from environment.
+    Returns (pipeline_cache_bucket, byob_environment).
+    Raises RuntimeError if either is missing or empty.
+    """
+    pipeline_cache_bucket = environ.get("PIPELINE_CACHE_BUCKET", "")
+    byob_environment = environ.get("PIPELINE_CACHE_PREFIX", "")
+
+    if not pipeline_cache_bucket:
+        raise RuntimeError("Missing required environment variable: PIPELINE_CACHE_BUCKET")
+    if not byob_environment:
+        raise RuntimeError("Missing required environment variable: PIPELINE_CACHE_PREFIX")
+
+    return pipeline_cache_bucket, byob_environment
+
+
+def is_allowed_context(bucket: str, prefix: str) -> bool:
+    """
+    Check if the given bucket and prefix match the allowed pipeline-cache context.
+
+    Returns True if bucket equals PIPELINE_CACHE_BUCKET env var AND
+    prefix starts with '{PIPELINE_CACHE_PREFIX}'.
+
+    Uses get_pipeline_cache_config() internally to read environment variables.
+    """
+    pipeline_cache_bucket, pipeline_cache_prefix = get_pipeline_cache_config()
+
+    return (
+        bucket == pipeline_cache_bucket
+        and prefix.startswith(pipeline_cache_prefix)
+    )
+
+
+def evaluate_has_active_readset_requirement(
+        fastq_obj: Fastq,
+        context: 'RequirementEvaluationContext'
+) -> bool:
+    """
+    Evaluate the hasActiveReadSet requirement.
+
+    When the context has_active_readset_context is provided (dict with 'bucket' and 'prefix'), the requirement
+    is evaluated context-aware: the readset must exist in the specified bucket/prefix.
+    If not in context and the context is not allowed, raises ContextNotEligibleError.
+
+    If the readset is not active and unarchiving is not allowed, raises a ValueError since we cannot run any jobs.
+    Otherwise an inactive readset is reported as unsatisfied (downstream handles unarchiving).
+    """
+    if context.has_active_readset_context is not None:
+        # Context-aware evaluation
+        bucket = context.has_active_readset_context['bucket']
+        prefix = context.has_active_readset_context['prefix']
+        if has_active_readset_in_context(fastq_obj, bucket, prefix):
+            return True
+
+        # Not in context — check if context is allowed
+        if not is_allowed_context(bucket, prefix):
+            raise ContextNotEligibleError(bucket, prefix)
+
+        # If allowed context but not in context, this is an archived/unavailable scenario
+        if not context.is_unarchiving_allowed and fastq_obj['readSet'] is not None:
+            raise ValueError(
+                f"Fastq readset is not available in requested context "
+                f"(bucket={bucket}, prefix={prefix}) and unarchiving is not allowed"
+            )
+        return False
+
+    # Original context-free evaluation
+    if has_active_readset(fastq_obj):
+        return True
+
+    # If data is archived and unarchiving is not allowed, we cannot run any jobs
+    if not context.is_unarchiving_allowed and fastq_obj['readSet'] is not None:
+        raise ValueError("Fastq object is archived but unarchiving is not specified in the fastq sync service")
+    return False
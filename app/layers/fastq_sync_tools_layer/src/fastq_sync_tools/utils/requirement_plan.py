@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+"""
+Requirement evaluation plans for the fastq sync service
+
+Each requirement is evaluated by a RequirementEvaluator, registered against its REQUIREMENT name.
+A list of requirements is compiled once into a RequirementPlan, which orders the evaluators so that
+preconditions run first, then the cheap checks against the fastq object, and any network-backed checks run last.
+The same plan is then reused for every fastq in a list.
+
+When we only need to know whether a fastq satisfies every requirement, the plan stops at the first
+requirement the fastq does not satisfy, so the network-backed checks are skipped for fastqs that already fail.
+
+The built-in evaluators (see requirement_checks.py) are registered at the bottom of this module,
+new requirements plug in with register_requirement_evaluator.
+"""
+
+# Standard library imports
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import logging
+
+# Layer imports
+from orcabus_api_tools.fastq.models import Fastq
+
+# Local imports
+from .globals import REQUIREMENT
+from .requirement_checks import (
+    evaluate_has_active_readset_requirement,
+    has_compression_metadata,
+    has_fingerprint,
+    has_qc,
+    has_read_count_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequirementEvaluationContext:
+    """
+    The request-level options that affect how requirements are evaluated
+    """
+
+    def __init__(
+            self,
+            is_unarchiving_allowed: bool = False,
+            has_active_readset_context: Optional[Dict[str, str]] = None,
+    ):
+        self.is_unarchiving_allowed = is_unarchiving_allowed
+        self.has_active_readset_context = has_active_readset_context
+
+
+REQUIREMENT_EVALUATOR_FUNC = Callable[[Fastq, RequirementEvaluationContext], bool]
+
+
+class RequirementEvaluator:
+    """
+    Evaluates a single requirement against a fastq.
+
+    is_network_backed is either a bool or a function of the evaluation context,
+    since some requirements only need an api call in some contexts
+    (i.e. hasActiveReadSet only calls out to the fastq manager if a readset context is given).
+
+    A precondition always runs first and is never skipped
+    (i.e. hasActiveReadSet raises if the fastq is archived and unarchiving is not allowed).
+    """
+
+    def __init__(
+            self,
+            requirement: REQUIREMENT,
+            evaluate_func: REQUIREMENT_EVALUATOR_FUNC,
+            is_network_backed: Union[bool, Callable[[RequirementEvaluationContext], bool]] = False,
+            is_precondition: bool = False,
+    ):
+        self.requirement = requirement
+        self.evaluate_func = evaluate_func
+        self.is_network_backed = is_network_backed
+        self.is_precondition = is_precondition
+
+    def is_network_backed_in_context(self, context: RequirementEvaluationContext) -> bool:
+        if callable(self.is_network_backed):
+            return self.is_network_backed(context)
+        return self.is_network_backed
+
+    def evaluate(self, fastq_obj: Fastq, context: RequirementEvaluationContext) -> bool:
+        return self.evaluate_func(fastq_obj, context)
+
+
+# Registry of requirement evaluators, in registration order
+REQUIREMENT_EVALUATOR_REGISTRY: Dict[REQUIREMENT, RequirementEvaluator] = {}
+
+
+def register_requirement_evaluator(
+        requirement: REQUIREMENT,
+        evaluate_func: REQUIREMENT_EVALUATOR_FUNC,
+        is_network_backed: Union[bool, Callable[[RequirementEvaluationContext], bool]] = False,
+        is_precondition: bool = False,
+) -> RequirementEvaluator:
+    """
+    Register (or replace) the evaluator for a requirement.
+    Among evaluators with the same cost, plans run them in registration order.
+    """
+    evaluator = RequirementEvaluator(
+        requirement=requirement,
+        evaluate_func=evaluate_func,
+        is_network_backed=is_network_backed,
+        is_precondition=is_precondition,
+    )
+    REQUIREMENT_EVALUATOR_REGISTRY[requirement] = evaluator
+    return evaluator
+
+
+def get_requirement_evaluator(requirement: REQUIREMENT) -> Optional[RequirementEvaluator]:
+    return REQUIREMENT_EVALUATOR_REGISTRY.get(requirement, None)
+
+
+class RequirementPlan:
+    """
+    An ordered list of requirement evaluators, compiled from a list of requirements.
+    Use compile_requirement_plan to create one.
+    """
+
+    def __init__(
+            self,
+            requirements: List[REQUIREMENT],
+            evaluators: List[RequirementEvaluator],
+            context: RequirementEvaluationContext,
+    ):
+        # The requirements in the order the caller gave them
+        self.requirements = requirements
+        # The evaluators in the order they are run
+        self.evaluators = evaluators
+        self.context = context
+
+    def evaluate(self, fastq_obj: Fastq, stop_on_first_unsatisfied: bool = False) -> Dict[REQUIREMENT, bool]:
+        """
+        Evaluate the fastq against each requirement in the plan, returns a map of requirement to result
+
+        If stop_on_first_unsatisfied is set, we stop once the fastq has failed a requirement
+        (after the preconditions, which always run), the requirements we did not evaluate are not in the map.
+        """
+        results: Dict[REQUIREMENT, bool] = {}
+
+        for evaluator_iter_ in self.evaluators:
+            if (
+                    stop_on_first_unsatisfied and
+                    not evaluator_iter_.is_precondition and
+                    False in results.values()
+            ):
+                break
+            results[evaluator_iter_.requirement] = evaluator_iter_.evaluate(fastq_obj, self.context)
+
+        return results
+
+    def has_all_requirements(self, fastq_obj: Fastq) -> bool:
+        """
+        Check whether the fastq satisfies every requirement in the plan, stopping at the first it does not
+        """
+        return all(self.evaluate(fastq_obj, stop_on_first_unsatisfied=True).values())
+
+    def split(
+            self,
+            fastq_obj: Fastq,
+            stop_on_first_unsatisfied: bool = False
+    ) -> Tuple[List[REQUIREMENT], List[REQUIREMENT]]:
+        """
+        Split the requirements into those the fastq satisfies and those it doesn't,
+        each in the order the requirements were given to the plan
+
+        If stop_on_first_unsatisfied is set, the requirements we did not evaluate are in neither list
+        """
+        results = self.evaluate(fastq_obj, stop_on_first_unsatisfied=stop_on_first_unsatisfied)
+
+        satisfied_requirements = list(filter(
+            lambda requirement_iter_: results.get(requirement_iter_, None) is True,
+            self.requirements
+        ))
+        unsatisfied_requirements = list(filter(
+            lambda requirement_iter_: results.get(requirement_iter_, None) is False,
+            self.requirements
+        ))
+
+        return satisfied_requirements, unsatisfied_requirements
+
+    def is_network_backed(self) -> bool:
+        """
+        Check whether evaluating a fastq against the plan makes any api calls
+        """
+        return any(map(
+            lambda evaluator_iter_: evaluator_iter_.is_network_backed_in_context(self.context),
+            self.evaluators
+        ))
+
+
+def compile_requirement_plan(
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+) -> RequirementPlan:
+    """
+    Compile a list of requirements into a plan, preconditions first, then local checks, network-backed checks last.
+    Requirements without a registered evaluator are skipped (and so are in neither the satisfied nor
+    the unsatisfied output of RequirementPlan.split).
+    """
+    context = RequirementEvaluationContext(
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+    )
+
+    # Drop duplicates but keep the caller's order
+    requirements = list(dict.fromkeys(requirements))
+
+    evaluators: List[RequirementEvaluator] = []
+    for requirement_iter_ in requirements:
+        evaluator = get_requirement_evaluator(requirement_iter_)
+        if evaluator is None:
+            logger.warning(f"No evaluator registered for requirement '{requirement_iter_}', skipping")
+            continue
+        evaluators.append(evaluator)
+
+    # Sort is stable, so evaluators with the same cost stay in registration order
+    registration_order = list(REQUIREMENT_EVALUATOR_REGISTRY.keys())
+    evaluators.sort(
+        key=lambda evaluator_iter_: (
+            not evaluator_iter_.is_precondition,
+            evaluator_iter_.is_network_backed_in_context(context),
+            registration_order.index(evaluator_iter_.requirement),
+        )
+    )
+
+    return RequirementPlan(
+        requirements=requirements,
+        evaluators=evaluators,
+        context=context,
+    )
+
+
+# Register the built-in requirement evaluators
+# hasActiveReadSet is a precondition, so it runs first, and raises before we check anything else
+register_requirement_evaluator(
+    'hasActiveReadSet',
+    evaluate_has_active_readset_requirement,
+    is_network_backed=lambda context_: context_.has_active_readset_context is not None,
+    is_precondition=True,
+)
+register_requirement_evaluator('hasQc', lambda fastq_obj_, context_: has_qc(fastq_obj_))
+register_requirement_evaluator('hasFingerprint', lambda fastq_obj_, context_: has_fingerprint(fastq_obj_))
+register_requirement_evaluator(
+    'hasFileCompressionInformation',
+    lambda fastq_obj_, context_: has_compression_metadata(fastq_obj_)
+)
+register_requirement_evaluator(
+    'hasReadCountInformation',
+    lambda fastq_obj_, context_: has_read_count_metadata(fastq_obj_)
+)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+"""
+Requirement states for the fastq sync service
+
+Most requirements are monotonic, once a fastq has its qc, fingerprint, read count or compression metadata,
+it keeps them. Each time a fastq is checked (including the fastqs of a FastqStateChange event)
+we record the requirements it satisfies in a REQUIREMENT_STATE row of the task token table (see token_store.py),
+so the next check of a fastq that is already known to satisfy every requested requirement
+skips the fastq manager altogether.
+
+hasActiveReadSet is the only requirement that can revert, the readset storage class changes when it is archived.
+It is overwritten on every check of the fastq, and only trusted for FASTQ_SYNC_ACTIVE_READSET_STATE_TTL_SECONDS
+after that check. hasFileCompressionInformation is only satisfied while the readset is active,
+so it is only trusted alongside hasActiveReadSet.
+Context-aware hasActiveReadSet requirements are always evaluated against the fastq.
+
+The time of the latest event a fastq was evaluated from is recorded too,
+so a fastq from an older event (events can be delivered out of order) is fetched from the fastq manager instead.
+
+The requirement state is switched off with FASTQ_SYNC_REQUIREMENT_STATE_ENABLED=false,
+and is only used when the lambda has the task token table (FASTQ_SYNC_TASK_TOKEN_TABLE_NAME) set.
+"""
+
+# Standard library imports
+from os import environ
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import time
+
+# Layer imports
+from orcabus_api_tools.fastq.models import Fastq
+
+# Local imports
+from .globals import REQUIREMENT, REQUIREMENTS_MATRIX
+from .fastq_helpers import get_fastq_list_with_event_fastqs, parse_event_time
+from .token_store import (
+    TASK_TOKEN_TABLE_NAME_ENV_VAR,
+    RequirementStateItem,
+    get_requirement_state_item_list,
+    update_requirement_state_item_list,
+)
+from .utils import get_requirements_matrix
+from .requirement_checks import (
+    has_active_readset,
+    has_compression_metadata,
+    has_fingerprint,
+    has_qc,
+    has_read_count_metadata,
+)
+
+# Globals
+REQUIREMENT_STATE_ENABLED_ENV_VAR = "FASTQ_SYNC_REQUIREMENT_STATE_ENABLED"
+ACTIVE_READSET_STATE_TTL_SECONDS_ENV_VAR = "FASTQ_SYNC_ACTIVE_READSET_STATE_TTL_SECONDS"
+
+DEFAULT_ACTIVE_READSET_STATE_TTL_SECONDS = 60 * 60
+
+# Requirements that stay satisfied once satisfied, and how to check them against a fastq
+MONOTONIC_REQUIREMENT_CHECKS: Dict[REQUIREMENT, Callable[[Fastq], bool]] = {
+    'hasQc': has_qc,
+    'hasFingerprint': has_fingerprint,
+    'hasFileCompressionInformation': has_compression_metadata,
+    'hasReadCountInformation': has_read_count_metadata,
+}
+
+# Requirements that are only known to hold while the readset is known to be active
+ACTIVE_READSET_REQUIREMENTS: List[REQUIREMENT] = ['hasActiveReadSet', 'hasFileCompressionInformation']
+
+logger = logging.getLogger(__name__)
+
+
+def is_requirement_state_enabled() -> bool:
+    if not environ.get(TASK_TOKEN_TABLE_NAME_ENV_VAR, ""):
+        return False
+    return environ.get(REQUIREMENT_STATE_ENABLED_ENV_VAR, "true").lower() not in ["false", "0", "no", "off"]
+
+
+def get_active_readset_state_ttl_seconds() -> int:
+    """
+    Get how long a recorded active readset is trusted for.
+    Read from the FASTQ_SYNC_ACTIVE_READSET_STATE_TTL_SECONDS environment variable, falls back to the default
+    if the variable is not set or is not a non-negative integer.
+    """
+    ttl_seconds_str = environ.get(ACTIVE_READSET_STATE_TTL_SECONDS_ENV_VAR, "")
+
+    try:
+        ttl_seconds = int(ttl_seconds_str) if ttl_seconds_str else DEFAULT_ACTIVE_READSET_STATE_TTL_SECONDS
+    except ValueError:
+        logger.warning(
+            f"Could not parse {ACTIVE_READSET_STATE_TTL_SECONDS_ENV_VAR}='{ttl_seconds_str}' as an integer, "
+            f"using the default of {DEFAULT_ACTIVE_READSET_STATE_TTL_SECONDS}"
+        )
+        return DEFAULT_ACTIVE_READSET_STATE_TTL_SECONDS
+
+    if ttl_seconds < 0:
+        return DEFAULT_ACTIVE_READSET_STATE_TTL_SECONDS
+
+    return ttl_seconds
+
+
+def get_requirement_state_from_fastq(
+        fastq_obj: Fastq,
+        checked_at: int,
+        last_event_at: int = 0,
+) -> RequirementStateItem:
+    """
+    Get the requirement state of a fastq, independent of the requirements requested
+    """
+    return {
+        "fastqId": fastq_obj['id'],
+        "satisfiedRequirementsList": list(filter(
+            lambda requirement_iter_: MONOTONIC_REQUIREMENT_CHECKS[requirement_iter_](fastq_obj),
+            MONOTONIC_REQUIREMENT_CHECKS.keys()
+        )),
+        "hasActiveReadSet": has_active_readset(fastq_obj),
+        "activeReadSetCheckedAt": checked_at,
+        "lastEventAt": last_event_at,
+    }
+
+
+def get_known_satisfied_requirements(
+        requirement_state_item: RequirementStateItem,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        now: Optional[int] = None,
+) -> List[REQUIREMENT]:
+    """
+    Get the requirements a fastq is known to satisfy from its recorded requirement state
+    """
+    if now is None:
+        now = int(time.time())
+
+    is_active_readset_known = (
+        requirement_state_item['hasActiveReadSet'] and
+        now - requirement_state_item['activeReadSetCheckedAt'] <= get_active_readset_state_ttl_seconds()
+    )
+
+    known_satisfied_requirements: List[REQUIREMENT] = list(filter(
+        lambda requirement_iter_: (
+            requirement_iter_ in MONOTONIC_REQUIREMENT_CHECKS and
+            (requirement_iter_ not in ACTIVE_READSET_REQUIREMENTS or is_active_readset_known)
+        ),
+        requirement_state_item['satisfiedRequirementsList']
+    ))
+
+    # Whether the readset is available in a given context is not recorded
+    if is_active_readset_known and has_active_readset_context is None:
+        known_satisfied_requirements.insert(0, 'hasActiveReadSet')
+
+    return known_satisfied_requirements
+
+
+def is_requirement_state_changed(
+        recorded_requirement_state_item: Optional[RequirementStateItem],
+        requirement_state_item: RequirementStateItem,
+) -> bool:
+    """
+    Check whether a requirement state needs to be written, so we don't write on every check of an unchanged fastq
+    """
+    if recorded_requirement_state_item is None:
+        return True
+
+    # A newly satisfied requirement
+    if not set(requirement_state_item['satisfiedRequirementsList']).issubset(
+            recorded_requirement_state_item['satisfiedRequirementsList']
+    ):
+        return True
+
+    # A newer event
+    if requirement_state_item['lastEventAt'] > recorded_requirement_state_item['lastEventAt']:
+        return True
+
+    # The readset has been archived or restored
+    if requirement_state_item['hasActiveReadSet'] != recorded_requirement_state_item['hasActiveReadSet']:
+        return True
+
+    # The recorded active readset is no longer trusted, so refresh it
+    return (
+        requirement_state_item['hasActiveReadSet'] and
+        requirement_state_item['activeReadSetCheckedAt'] - recorded_requirement_state_item['activeReadSetCheckedAt']
+        > get_active_readset_state_ttl_seconds() // 2
+    )
+
+
+def get_requirements_matrix_with_requirement_state(
+        fastq_id_list: List[str],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        event_fastq_obj_list: Optional[List[Dict]] = None,
+        event_time: Optional[str] = None,
+        include_s3_details: bool = True,
+        stop_on_first_unsatisfied: bool = False,
+) -> Tuple[REQUIREMENTS_MATRIX, List[str]]:
+    """
+    Get the fastqs (see get_fastq_list_with_event_fastqs) and their requirements matrix (see get_requirements_matrix),
+    without fetching the fastqs already known to satisfy every requirement.
+
+    Fastqs in the event payload are always evaluated, since they are the latest state of the fastq.
+    The requirement state of every fastq we do evaluate is recorded for the next check.
+    Reading or writing the requirement state is best effort, if it fails we evaluate every fastq as before.
+    stop_on_first_unsatisfied is passed through to get_requirements_matrix.
+
+    Returns a tuple of (requirements_matrix, failed_fastq_id_list).
+    """
+    # Fastq ids in the event payload are not skipped
+    event_fastq_id_set = set(map(
+        lambda event_fastq_obj_iter_: event_fastq_obj_iter_['id'],
+        filter(
+            lambda event_fastq_obj_iter_: isinstance(event_fastq_obj_iter_, dict) and 'id' in event_fastq_obj_iter_,
+            event_fastq_obj_list or []
+        )
+    ))
+
+    recorded_requirement_state_item_by_fastq_id: Dict[str, RequirementStateItem] = {}
+    if is_requirement_state_enabled():
+        try:
+            recorded_requirement_state_item_by_fastq_id = get_requirement_state_item_list(fastq_id_list)
+        except Exception as e:
+            logger.warning(f"Could not get the requirement states, evaluating every fastq: {e}")
+
+    now = int(time.time())
+    known_fastq_id_set = set(filter(
+        lambda fastq_id_iter_: (
+            len(requirements) > 0 and
+            fastq_id_iter_ not in event_fastq_id_set and
+            set(requirements).issubset(get_known_satisfied_requirements(
+                recorded_requirement_state_item_by_fastq_id[fastq_id_iter_],
+                has_active_readset_context=has_active_readset_context,
+                now=now,
+            ))
+        ),
+        recorded_requirement_state_item_by_fastq_id.keys()
+    ))
+
+    if len(known_fastq_id_set) > 0:
+        logger.info(f"{len(known_fastq_id_set)} fastqs are known to satisfy every requirement, not fetching them")
+
+    fastq_obj_list, failed_fastq_id_list = get_fastq_list_with_event_fastqs(
+        list(filter(
+            lambda fastq_id_iter_: fastq_id_iter_ not in known_fastq_id_set,
+            fastq_id_list
+        )),
+        event_fastq_obj_list=event_fastq_obj_list,
+        event_time=event_time,
+        include_s3_details=include_s3_details,
+        last_event_at_by_fastq_id=dict(map(
+            lambda requirement_state_item_iter_: (
+                requirement_state_item_iter_['fastqId'], requirement_state_item_iter_['lastEventAt']
+            ),
+            recorded_requirement_state_item_by_fastq_id.values()
+        )),
+    )
+
+    # Evaluate first, so a ContextNotEligibleError propagates before we record anything
+    evaluated_requirements_matrix = get_requirements_matrix(
+        fastq_list=fastq_obj_list,
+        requirements=requirements,
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+        stop_on_first_unsatisfied=stop_on_first_unsatisfied,
+    )
+
+    if is_requirement_state_enabled():
+        # The fastqs in the event payload have been seen as of the event, whether or not the event fastq was used
+        event_datetime = parse_event_time(event_time)
+        last_event_at = int(event_datetime.timestamp()) if event_datetime is not None else 0
+        changed_requirement_state_item_list = list(filter(
+            lambda requirement_state_item_iter_: is_requirement_state_changed(
+                recorded_requirement_state_item_by_fastq_id.get(requirement_state_item_iter_['fastqId'], None),
+                requirement_state_item_iter_,
+            ),
+            map(
+                lambda fastq_obj_iter_: get_requirement_state_from_fastq(
+                    fastq_obj_iter_,
+                    checked_at=now,
+                    last_event_at=last_event_at if fastq_obj_iter_['id'] in event_fastq_id_set else 0,
+                ),
+                fastq_obj_list
+            )
+        ))
+        try:
+            update_requirement_state_item_list(changed_requirement_state_item_list)
+        except Exception as e:
+            logger.warning(f"Could not record the requirement states: {e}")
+
+    # Preserve the order of the input list
+    requirements_matrix: REQUIREMENTS_MATRIX = {}
+    for fastq_id_iter_ in fastq_id_list:
+        if fastq_id_iter_ in known_fastq_id_set:
+            requirements_matrix[fastq_id_iter_] = dict(map(
+                lambda requirement_iter_: (requirement_iter_, True),
+                requirements
+            ))
+        elif fastq_id_iter_ in evaluated_requirements_matrix:
+            requirements_matrix[fastq_id_iter_] = evaluated_requirements_matrix[fastq_id_iter_]
+
+    return requirements_matrix, failed_fastq_id_list
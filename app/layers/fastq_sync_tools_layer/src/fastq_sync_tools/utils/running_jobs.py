@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Running job checks for the fastq sync service
+
+A fastq id has jobs running if the fastq manager or the fastq unarchiver has an active job for it,
+or its library is in an active bclconvert / bssh-to-aws-s3 workflow run.
+
+All checks (for each fastq id and each job source) are run concurrently on the shared async thread pool
+(see async_api.py), the first positive result cancels any outstanding checks.
+Every fastq is still looked up in the fastq manager before we return, so every fastq id the fastq manager
+reports does not exist is in the fastq error cache (see get_not_found_fastq_id_list),
+not only the fastq ids checked before the first positive result.
+"""
+
+# Standard library imports
+from functools import partial
+from threading import Lock
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Tuple
+import asyncio
+import time
+
+# Layer imports
+from requests import HTTPError
+
+# Local imports
+from .async_api import any_async, run_api_call_async, run_async
+from .fastq_error_cache import get_fastq_jobs_with_error_cache, get_fastq_with_error_cache
+from .instrumented_api import get_workflow_run, list_workflow_runs
+from .unarchiving_helpers import get_fastq_id_list_with_active_unarchiving_jobs
+
+# Globals
+ACTIVE_JOB_STATUS_LIST_TYPE = Literal['PENDING', 'RUNNING']
+ACTIVE_JOB_STATUS_LIST: List[ACTIVE_JOB_STATUS_LIST_TYPE] = ['PENDING', 'RUNNING']
+
+BCLCONVERT_WORKFLOW_NAME = 'bclconvert'
+BSSH_TO_AWS_S3_WORKFLOW_NAME = 'bssh-to-aws-s3'
+ACTIVE_WORKFLOW_STATUS_LIST = [
+    'DRAFT',
+    'READY',
+    'STARTING',
+    'RUNNING',
+]
+
+# Library id to active workflow run index
+# Kept at module level so that it is reused across warm invocations for a short time
+LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_TTL_SECONDS = 60
+LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX: Optional[Dict[str, str]] = None
+LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_EXPIRES_AT: float = 0.0
+LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_LOCK = Lock()
+
+# Job sources (used for logging)
+FASTQ_MANAGER_JOBS_SOURCE = 'fastqManagerJobs'
+UNARCHIVING_JOBS_SOURCE = 'unarchivingJobs'
+WORKFLOW_RUNS_SOURCE = 'workflowRuns'
+
+
+def build_library_id_to_active_workflow_run_index() -> Dict[str, str]:
+    """
+    Map each library id to the orcabus id of an active bclconvert / bssh-to-aws-s3 workflow run.
+    Each active workflow run is only fetched once, regardless of the number of fastqs we are checking.
+    :return:
+    """
+    library_id_to_workflow_run_index: Dict[str, str] = {}
+    seen_workflow_run_orcabus_id_set = set()
+
+    for workflow_status_iter in ACTIVE_WORKFLOW_STATUS_LIST:
+        for workflow_name_iter in [BCLCONVERT_WORKFLOW_NAME, BSSH_TO_AWS_S3_WORKFLOW_NAME]:
+            for workflow_run in list_workflow_runs(
+                    workflow_name=workflow_name_iter,
+                    current_status=workflow_status_iter,
+            ):
+                # Workflow runs may change status between list calls
+                if workflow_run['orcabusId'] in seen_workflow_run_orcabus_id_set:
+                    continue
+                seen_workflow_run_orcabus_id_set.add(workflow_run['orcabusId'])
+
+                # Add each library in the workflow run to the index
+                for library_iter_ in get_workflow_run(workflow_run['orcabusId'])['libraries']:
+                    library_id_to_workflow_run_index[library_iter_['libraryId']] = workflow_run['orcabusId']
+
+    return library_id_to_workflow_run_index
+
+
+def get_library_id_to_active_workflow_run_index() -> Dict[str, str]:
+    """
+    Get the library id to active workflow run index, rebuilding it if it has expired
+    :return:
+    """
+    global LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX
+    global LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_EXPIRES_AT
+
+    # Checks run concurrently, make sure only one thread builds the index
+    with LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_LOCK:
+        if (
+                LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX is None or
+                LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_EXPIRES_AT <= time.monotonic()
+        ):
+            LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX = build_library_id_to_active_workflow_run_index()
+            LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_EXPIRES_AT = (
+                time.monotonic() + LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX_TTL_SECONDS
+            )
+
+        return LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX
+
+
+def has_fastq_manager_jobs_running(fastq_id: str) -> bool:
+    """
+    Check the fastq manager for any active jobs for this fastq
+    :param fastq_id:
+    :return:
+    """
+    try:
+        return len(
+            list(filter(
+                lambda job: job['status'] in ACTIVE_JOB_STATUS_LIST,
+                get_fastq_jobs_with_error_cache(fastq_id=fastq_id)
+            ))
+        ) > 0
+    except HTTPError:
+        # If we get an error, assume no jobs (fastqs may no longer exist)
+        return False
+
+
+def has_unarchiving_jobs_running(fastq_id_list: List[str]) -> bool:
+    """
+    Check the fastq unarchiver for any active jobs for any of the fastqs in the list
+    Queries each fastq id and active status concurrently, see get_fastq_id_list_with_active_unarchiving_jobs
+    :param fastq_id_list:
+    :return:
+    """
+    return len(get_fastq_id_list_with_active_unarchiving_jobs(fastq_id_list)) > 0
+
+
+def get_library_id_for_fastq_id(fastq_id: str) -> Optional[str]:
+    """
+    Get the library id of the fastq, None if the fastq manager could not return the fastq
+    :param fastq_id:
+    :return:
+    """
+    try:
+        return get_fastq_with_error_cache(fastq_id)['library']['libraryId']
+    except HTTPError:
+        # If we get an error, assume fastq may no longer exist
+        return None
+
+
+def has_library_workflow_runs_running(library_id: Optional[str]) -> bool:
+    """
+    Check for active bclconvert + bssh-to-aws-s3 workflow runs associated with this library
+    :param library_id:
+    :return:
+    """
+    if library_id is None:
+        return False
+
+    # The index is only built once we need it, and is then shared across all fastqs
+    return library_id in get_library_id_to_active_workflow_run_index()
+
+
+def has_workflow_runs_running(fastq_id: str) -> bool:
+    """
+    Check for active bclconvert + bssh-to-aws-s3 workflow runs associated with the library of this fastq
+    :param fastq_id:
+    :return:
+    """
+    return has_library_workflow_runs_running(get_library_id_for_fastq_id(fastq_id))
+
+
+async def has_workflow_runs_running_async(library_id_future: Awaitable[Optional[str]]) -> bool:
+    """
+    As has_workflow_runs_running, once the library id lookup for the fastq has finished
+    :param library_id_future:
+    :return:
+    """
+    # Shielded, cancelling this check must not cancel the fastq lookup
+    library_id = await asyncio.shield(library_id_future)
+    return await run_api_call_async(has_library_workflow_runs_running, library_id)
+
+
+async def check_running_jobs_for_fastq_id_list_async(fastq_id_list: List[str]) -> bool:
+    """
+    Check whether any of the fastq ids have jobs running, returns True as soon as we know
+    :param fastq_id_list:
+    :return:
+    """
+    # Look up every fastq, these lookups are not cancelled when we have our answer
+    library_id_future_by_fastq_id = {
+        fastq_id: asyncio.ensure_future(run_api_call_async(get_library_id_for_fastq_id, fastq_id))
+        for fastq_id in dict.fromkeys(fastq_id_list)
+    }
+
+    # Collect the checks for each fastq id and each job source
+    # Check fastq unarchiver jobs (for the whole list at once)
+    named_checks: List[Tuple[str, Callable[[], Awaitable[bool]]]] = [
+        (
+            UNARCHIVING_JOBS_SOURCE,
+            partial(run_api_call_async, has_unarchiving_jobs_running, fastq_id_list)
+        )
+    ]
+    for fastq_id in fastq_id_list:
+        # Check fastq manager jobs
+        named_checks.append((
+            FASTQ_MANAGER_JOBS_SOURCE,
+            partial(run_api_call_async, has_fastq_manager_jobs_running, fastq_id)
+        ))
+
+        # Check workflow runs for bclconvert + bssh-to-aws-s3 associated with this library
+        named_checks.append((
+            WORKFLOW_RUNS_SOURCE,
+            partial(has_workflow_runs_running_async, library_id_future_by_fastq_id[fastq_id])
+        ))
+
+    # If any of them have jobs running, return true as soon as we know
+    try:
+        return await any_async(named_checks)
+    finally:
+        # Wait for the remaining fastq lookups, so any fastq not found is in the fastq error cache
+        await asyncio.gather(*library_id_future_by_fastq_id.values(), return_exceptions=True)
+
+
+def check_running_jobs_for_fastq_id_list(fastq_id_list: List[str]) -> bool:
+    """
+    Sync wrapper of check_running_jobs_for_fastq_id_list_async
+    :param fastq_id_list:
+    :return:
+    """
+    return run_async(check_running_jobs_for_fastq_id_list_async(fastq_id_list))
@@ -0,0 +1,905 @@
+#!/usr/bin/env python3
+
+"""
+Task token store for the fastq sync service
+
+The FastqSyncTaskTokenTable holds three kinds of rows keyed on (id, id_type):
+  * TASK_TOKEN rows, with the requirements set for the token and the fastq id bookkeeping:
+    * fastq_id_set: the fastq ids still missing requirements
+    * satisfied_fastq_id_set: the fastq ids that have since been satisfied
+    * remaining_count: the size of fastq_id_set, decremented atomically as each fastq id is satisfied
+  * FASTQ_ID rows, with the set of task tokens waiting on the fastq id
+  * REQUIREMENT_STATE rows, with the requirements last seen to hold for the fastq id (see requirement_state.py)
+  * a single MIGRATION row, with the version of the task token rows (see migrate_task_token_table)
+
+Task token rows also carry the task_token_status attribute, which is the partition key of the
+sparse ActiveTaskTokenIndex, so listing the active task tokens only reads the task token rows.
+The index name, partition key name and partition key value are set by CDK in the lambda environment,
+alongside the table name.
+
+Task token rows are marked dirty (dirty_count is incremented) whenever one of their fastqs is updated.
+The heartbeat monitor records the dirty count it last evaluated against (evaluated_dirty_count),
+so only tokens with a fastq update since their last evaluation need a full re-evaluation.
+
+Registering or unregistering a task token touches one fastq id row per fastq id, so these are written
+in chunked transactions (see register_task_token_list and unregister_task_token) rather than
+one request per fastq id.
+"""
+
+# Standard library imports
+from os import environ
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypedDict
+import logging
+import random
+import time
+import typing
+
+# Local imports
+from .clients import get_dynamodb_client
+from .concurrency import run_concurrently
+from .exceptions import TaskTokenStoreError
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+
+# Globals
+TASK_TOKEN_TABLE_NAME_ENV_VAR = "FASTQ_SYNC_TASK_TOKEN_TABLE_NAME"
+ACTIVE_TASK_TOKEN_INDEX_NAME_ENV_VAR = "FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_NAME"
+ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME_ENV_VAR = "FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME"
+ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE_ENV_VAR = "FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE"
+
+TASK_TOKEN_ID_TYPE = "TASK_TOKEN"
+FASTQ_ID_ID_TYPE = "FASTQ_ID"
+REQUIREMENT_STATE_ID_TYPE = "REQUIREMENT_STATE"
+MIGRATION_ID_TYPE = "MIGRATION"
+
+TASK_TOKEN_TABLE_MIGRATION_ID = "TASK_TOKEN_TABLE"
+
+DEFAULT_PAGE_SIZE = 100
+
+# DynamoDB limits
+BATCH_GET_ITEM_MAX_KEYS = 100
+TRANSACT_WRITE_ITEMS_MAX_ITEMS = 100
+
+# Unprocessed keys and cancelled transactions are retried with capped, jittered exponential backoff
+MAX_BATCH_ATTEMPTS = 8
+BATCH_RETRY_BASE_SECONDS = 0.05
+BATCH_RETRY_MAX_SECONDS = 2.0
+
+# Task tokens are removed from the table after a week
+DEFAULT_TASK_TOKEN_TTL_SECONDS = 60 * 60 * 24 * 7
+
+# Requirement states are refreshed whenever the fastq is checked, and removed after a month without a check
+DEFAULT_REQUIREMENT_STATE_TTL_SECONDS = 60 * 60 * 24 * 30
+
+
+logger = logging.getLogger(__name__)
+
+
+class TaskTokenItem(TypedDict):
+    taskToken: str
+    fastqIdList: List[str]
+    requirementsList: List[str]
+    satisfiedFastqIdList: List[str]
+    remainingCount: Optional[int]
+    dirtyCount: int
+    evaluatedDirtyCount: int
+    lastEvaluatedAt: int
+    lastJobsRunning: bool
+
+
+class RequirementStateItem(TypedDict):
+    fastqId: str
+    # The requirements that, once satisfied, stay satisfied
+    satisfiedRequirementsList: List[str]
+    # Whether the readset was active when last checked, and when (epoch seconds) that was
+    hasActiveReadSet: bool
+    activeReadSetCheckedAt: int
+    # The time (epoch seconds) of the latest event the fastq was evaluated from, 0 if none
+    lastEventAt: int
+
+
+def get_task_token_table_name() -> str:
+    return environ[TASK_TOKEN_TABLE_NAME_ENV_VAR]
+
+
+def get_active_task_token_index_name() -> str:
+    return environ[ACTIVE_TASK_TOKEN_INDEX_NAME_ENV_VAR]
+
+
+def get_active_task_token_index_partition_key_name() -> str:
+    return environ[ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME_ENV_VAR]
+
+
+def get_active_task_token_index_partition_key_value() -> str:
+    return environ[ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE_ENV_VAR]
+
+
+def _get_fastq_id_key(fastq_id: str) -> Dict:
+    return {
+        "id": {"S": fastq_id},
+        "id_type": {"S": FASTQ_ID_ID_TYPE},
+    }
+
+
+def _get_requirement_state_key(fastq_id: str) -> Dict:
+    return {
+        "id": {"S": fastq_id},
+        "id_type": {"S": REQUIREMENT_STATE_ID_TYPE},
+    }
+
+
+def _get_chunks(item_list: List, chunk_size: int) -> Iterator[List]:
+    for start_index_iter_ in range(0, len(item_list), chunk_size):
+        yield item_list[start_index_iter_:start_index_iter_ + chunk_size]
+
+
+def _sleep_before_retry(attempt: int) -> None:
+    time.sleep(random.uniform(0, min(BATCH_RETRY_MAX_SECONDS, BATCH_RETRY_BASE_SECONDS * 2 ** attempt)))
+
+
+def _item_to_task_token_item(item: Dict) -> TaskTokenItem:
+    return {
+        "taskToken": item['id']['S'],
+        "fastqIdList": item.get('fastq_id_set', {}).get('SS', []),
+        "requirementsList": item.get('requirements_set', {}).get('SS', []),
+        "satisfiedFastqIdList": item.get('satisfied_fastq_id_set', {}).get('SS', []),
+        # Task tokens registered before the remaining count was introduced don't have one
+        "remainingCount": (
+            int(item['remaining_count']['N'])
+            if 'remaining_count' in item
+            else None
+        ),
+        "dirtyCount": int(item.get('dirty_count', {}).get('N', 0)),
+        # Tokens that have never been evaluated are always dirty
+        "evaluatedDirtyCount": int(item.get('evaluated_dirty_count', {}).get('N', -1)),
+        "lastEvaluatedAt": int(item.get('last_evaluated_at', {}).get('N', 0)),
+        "lastJobsRunning": item.get('last_jobs_running', {}).get('BOOL', False),
+    }
+
+
+def is_task_token_dirty(task_token_item: TaskTokenItem) -> bool:
+    """
+    A task token is dirty if one of its fastqs has been updated since it was last evaluated
+    """
+    return task_token_item['dirtyCount'] != task_token_item['evaluatedDirtyCount']
+
+
+def list_active_task_tokens(
+        page_size: int = DEFAULT_PAGE_SIZE,
+        client: Optional['DynamoDBClient'] = None,
+) -> Iterator[TaskTokenItem]:
+    """
+    Iterate over all active task tokens, querying the sparse active task token index a page at a time
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    exclusive_start_key: Optional[Dict] = None
+    while True:
+        query_kwargs = {
+            "TableName": get_task_token_table_name(),
+            "IndexName": get_active_task_token_index_name(),
+            "KeyConditionExpression": "#name = :value",
+            "ExpressionAttributeNames": {
+                "#name": get_active_task_token_index_partition_key_name(),
+            },
+            "ExpressionAttributeValues": {
+                ":value": {
+                    "S": get_active_task_token_index_partition_key_value(),
+                },
+            },
+            "Limit": page_size,
+        }
+        if exclusive_start_key is not None:
+            query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+
+        response = client.query(**query_kwargs)
+
+        for item_iter_ in response.get('Items', []):
+            yield _item_to_task_token_item(item_iter_)
+
+        exclusive_start_key = response.get('LastEvaluatedKey', None)
+        if exclusive_start_key is None:
+            return
+
+
+def get_task_token_item(
+        task_token: str,
+        client: Optional['DynamoDBClient'] = None,
+) -> Optional[TaskTokenItem]:
+    """
+    Get a single task token row, returns None if the task token is not in the table
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    response = client.get_item(
+        TableName=get_task_token_table_name(),
+        Key={
+            "id": {"S": task_token},
+            "id_type": {"S": TASK_TOKEN_ID_TYPE},
+        },
+    )
+
+    if 'Item' not in response:
+        return None
+
+    return _item_to_task_token_item(response['Item'])
+
+
+def register_task_token(
+        task_token: str,
+        fastq_id_list_with_missing_requirements: List[str],
+        requirements: List[str],
+        ttl_seconds: int = DEFAULT_TASK_TOKEN_TTL_SECONDS,
+        client: Optional['DynamoDBClient'] = None,
+) -> None:
+    """
+    Register a task token row, waiting on the fastq ids that are still missing requirements.
+    Mirrors the 'Register Fastq Sync Event (token)' step of the initialise task token state machine.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    client.put_item(
+        TableName=get_task_token_table_name(),
+        Item=_get_task_token_row(
+            task_token,
+            fastq_id_list_with_missing_requirements,
+            requirements,
+            int(time.time()) + ttl_seconds,
+        ),
+    )
+
+
+def _get_task_token_row(
+        task_token: str,
+        fastq_id_list_with_missing_requirements: List[str],
+        requirements: List[str],
+        expires_at: int,
+) -> Dict:
+    # Sets are unordered and cannot contain duplicates
+    fastq_id_list_with_missing_requirements = list(dict.fromkeys(fastq_id_list_with_missing_requirements))
+
+    if len(fastq_id_list_with_missing_requirements) == 0:
+        raise ValueError("Cannot register a task token with no fastq ids missing requirements")
+
+    if len(requirements) == 0:
+        raise ValueError("Cannot register a task token with no requirements")
+
+    return {
+        "id": {"S": task_token},
+        "id_type": {"S": TASK_TOKEN_ID_TYPE},
+        get_active_task_token_index_partition_key_name(): {"S": get_active_task_token_index_partition_key_value()},
+        "fastq_id_set": {"SS": fastq_id_list_with_missing_requirements},
+        "remaining_count": {"N": str(len(fastq_id_list_with_missing_requirements))},
+        "requirements_set": {"SS": list(dict.fromkeys(requirements))},
+        "expiresAt": {"N": str(expires_at)},
+    }
+
+
+def _batch_get_rows(
+        key_list: List[Dict],
+        projection_expression: str,
+        consistent_read: bool,
+        client: 'DynamoDBClient',
+) -> Dict[str, Dict]:
+    """
+    Get a list of rows by key, 100 keys per BatchGetItem request.
+    Unprocessed keys are retried with backoff. Returns the rows by id, keys without a row are left out.
+    """
+    table_name = get_task_token_table_name()
+    row_by_id: Dict[str, Dict] = {}
+
+    for key_chunk_iter_ in _get_chunks(key_list, BATCH_GET_ITEM_MAX_KEYS):
+        request_items = {
+            table_name: {
+                "Keys": key_chunk_iter_,
+                "ProjectionExpression": projection_expression,
+                "ConsistentRead": consistent_read,
+            }
+        }
+        for attempt_iter_ in range(MAX_BATCH_ATTEMPTS):
+            response = client.batch_get_item(RequestItems=request_items)
+            for item_iter_ in response.get('Responses', {}).get(table_name, []):
+                row_by_id[item_iter_['id']['S']] = item_iter_
+
+            request_items = response.get('UnprocessedKeys', {})
+            if len(request_items) == 0:
+                break
+            _sleep_before_retry(attempt_iter_)
+        else:
+            raise TaskTokenStoreError(
+                f"Could not get {len(request_items[table_name]['Keys'])} rows "
+                f"after {MAX_BATCH_ATTEMPTS} attempts"
+            )
+
+    return row_by_id
+
+
+def _batch_get_fastq_id_rows(
+        fastq_id_list: List[str],
+        client: 'DynamoDBClient',
+) -> Dict[str, Dict]:
+    """
+    Get the fastq id rows for a list of fastq ids, fastq ids without a row are left out of the returned dict.
+    """
+    return _batch_get_rows(
+        list(map(_get_fastq_id_key, fastq_id_list)),
+        projection_expression="id, task_token_set",
+        # The rows are about to be conditionally rewritten, so a stale read would only cost us a retry,
+        # but a consistent read means that retry is rarely needed
+        consistent_read=True,
+        client=client,
+    )
+
+
+def _transact_write_items(
+        transact_item_list: List[Dict],
+        client: 'DynamoDBClient',
+) -> bool:
+    """
+    Write a single transaction (at most 100 items).
+    Returns False if the transaction was cancelled (i.e. a condition failed or another request
+    was writing one of the same items), True otherwise.
+    """
+    try:
+        client.transact_write_items(TransactItems=transact_item_list)
+    except client.exceptions.TransactionCanceledException as e:
+        logger.info(
+            "Transaction cancelled: %s",
+            ", ".join(map(
+                lambda reason_iter_: reason_iter_.get('Code', 'None'),
+                e.response.get('CancellationReasons', [])
+            ))
+        )
+        return False
+
+    return True
+
+
+def register_task_token_list(
+        task_token_list: List[str],
+        fastq_id_list_with_missing_requirements: List[str],
+        requirements: List[str],
+        ttl_seconds: int = DEFAULT_TASK_TOKEN_TTL_SECONDS,
+        client: Optional['DynamoDBClient'] = None,
+) -> None:
+    """
+    Register a list of task tokens (i.e. requests coalesced by handleMessages), waiting on the same fastq ids.
+    Each task token gets its own task token row, and every task token is added to each fastq id row
+    (the fastq id row is created if it does not exist yet).
+
+    Writes are made in transactions of up to 100 rows, cancelled transactions are retried with backoff.
+    Every write is idempotent, so if we fail part way through, the whole registration can be retried.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    task_token_list = list(dict.fromkeys(task_token_list))
+    fastq_id_list_with_missing_requirements = list(dict.fromkeys(fastq_id_list_with_missing_requirements))
+
+    if len(task_token_list) == 0:
+        raise ValueError("Cannot register an empty task token list")
+
+    table_name = get_task_token_table_name()
+    expires_at = int(time.time()) + ttl_seconds
+
+    transact_item_list: List[Dict] = list(map(
+        lambda task_token_iter_: {
+            "Put": {
+                "TableName": table_name,
+                "Item": _get_task_token_row(
+                    task_token_iter_,
+                    fastq_id_list_with_missing_requirements,
+                    requirements,
+                    expires_at,
+                ),
+            }
+        },
+        task_token_list
+    )) + list(map(
+        lambda fastq_id_iter_: {
+            # ADD creates the fastq id row if it does not exist, and leaves any other task tokens on it alone
+            "Update": {
+                "TableName": table_name,
+                "Key": _get_fastq_id_key(fastq_id_iter_),
+                "UpdateExpression": "ADD task_token_set :task_token_set SET expiresAt = :expires_at",
+                "ExpressionAttributeValues": {
+                    ":task_token_set": {"SS": task_token_list},
+                    ":expires_at": {"N": str(expires_at)},
+                },
+            }
+        },
+        fastq_id_list_with_missing_requirements
+    ))
+
+    for transact_item_chunk_iter_ in _get_chunks(transact_item_list, TRANSACT_WRITE_ITEMS_MAX_ITEMS):
+        for attempt_iter_ in range(MAX_BATCH_ATTEMPTS):
+            if _transact_write_items(transact_item_chunk_iter_, client):
+                break
+            _sleep_before_retry(attempt_iter_)
+        else:
+            raise TaskTokenStoreError(
+                f"Could not register {len(task_token_list)} task tokens after {MAX_BATCH_ATTEMPTS} attempts"
+            )
+
+
+def _get_unregister_fastq_id_transact_item(
+        task_token: str,
+        fastq_id_row: Dict,
+        table_name: str,
+) -> Optional[Dict]:
+    task_token_set = fastq_id_row.get('task_token_set', {}).get('SS', [])
+
+    # Already removed from this fastq id
+    if task_token not in task_token_set:
+        return None
+
+    # The conditions guard against another task token being added to or removed from the row
+    # since we read it, in which case the transaction is cancelled and we re-read the row
+    if len(task_token_set) == 1:
+        return {
+            "Delete": {
+                "TableName": table_name,
+                "Key": _get_fastq_id_key(fastq_id_row['id']['S']),
+                "ConditionExpression": "size(task_token_set) = :one AND contains(task_token_set, :task_token)",
+                "ExpressionAttributeValues": {
+                    ":one": {"N": "1"},
+                    ":task_token": {"S": task_token},
+                },
+            }
+        }
+
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": _get_fastq_id_key(fastq_id_row['id']['S']),
+            "UpdateExpression": "DELETE task_token_set :task_token_set",
+            "ConditionExpression": "size(task_token_set) > :one AND contains(task_token_set, :task_token)",
+            "ExpressionAttributeValues": {
+                ":task_token_set": {"SS": [task_token]},
+                ":one": {"N": "1"},
+                ":task_token": {"S": task_token},
+            },
+        }
+    }
+
+
+def unregister_task_token(
+        task_token: str,
+        fastq_id_list: List[str],
+        client: Optional['DynamoDBClient'] = None,
+) -> None:
+    """
+    Remove a task token from the table, the task token row and the task token from each of its fastq id rows.
+    Fastq id rows left without any task tokens are deleted.
+
+    The fastq id rows are read in batches, then rewritten in conditional transactions of up to 100 rows.
+    The fastq id rows of a cancelled transaction are re-read and retried with backoff.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    table_name = get_task_token_table_name()
+
+    client.delete_item(
+        TableName=table_name,
+        Key={
+            "id": {"S": task_token},
+            "id_type": {"S": TASK_TOKEN_ID_TYPE},
+        },
+    )
+
+    pending_fastq_id_list = list(dict.fromkeys(fastq_id_list))
+    for attempt_iter_ in range(MAX_BATCH_ATTEMPTS):
+        fastq_id_row_by_fastq_id = _batch_get_fastq_id_rows(pending_fastq_id_list, client)
+
+        # Fastq id and its transact item, for the fastq ids that still hold the task token
+        fastq_id_transact_item_list: List[Tuple[str, Dict]] = list(filter(
+            lambda fastq_id_transact_item_iter_: fastq_id_transact_item_iter_[1] is not None,
+            map(
+                lambda fastq_id_iter_: (
+                    fastq_id_iter_,
+                    _get_unregister_fastq_id_transact_item(
+                        task_token, fastq_id_row_by_fastq_id[fastq_id_iter_], table_name
+                    )
+                ),
+                filter(
+                    lambda fastq_id_iter_: fastq_id_iter_ in fastq_id_row_by_fastq_id,
+                    pending_fastq_id_list
+                )
+            )
+        ))
+
+        pending_fastq_id_list = []
+        for fastq_id_transact_item_chunk_iter_ in _get_chunks(
+                fastq_id_transact_item_list, TRANSACT_WRITE_ITEMS_MAX_ITEMS
+        ):
+            if not _transact_write_items(
+                    list(map(lambda item_iter_: item_iter_[1], fastq_id_transact_item_chunk_iter_)),
+                    client
+            ):
+                pending_fastq_id_list.extend(map(lambda item_iter_: item_iter_[0], fastq_id_transact_item_chunk_iter_))
+
+        if len(pending_fastq_id_list) == 0:
+            return
+        _sleep_before_retry(attempt_iter_)
+
+    raise TaskTokenStoreError(
+        f"Could not remove the task token from {len(pending_fastq_id_list)} fastq id rows "
+        f"after {MAX_BATCH_ATTEMPTS} attempts"
+    )
+
+
+def _item_to_requirement_state_item(item: Dict) -> RequirementStateItem:
+    return {
+        "fastqId": item['id']['S'],
+        "satisfiedRequirementsList": item.get('satisfied_requirement_set', {}).get('SS', []),
+        "hasActiveReadSet": item.get('has_active_readset', {}).get('BOOL', False),
+        "activeReadSetCheckedAt": int(item.get('active_readset_checked_at', {}).get('N', 0)),
+        "lastEventAt": int(item.get('last_event_at', {}).get('N', 0)),
+    }
+
+
+def get_requirement_state_item_list(
+        fastq_id_list: List[str],
+        client: Optional['DynamoDBClient'] = None,
+) -> Dict[str, RequirementStateItem]:
+    """
+    Get the requirement state rows for a list of fastq ids, in BatchGetItem requests of up to 100 keys.
+    Fastq ids without a requirement state row are left out of the returned dict.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    return dict(map(
+        lambda row_iter_: (row_iter_[0], _item_to_requirement_state_item(row_iter_[1])),
+        _batch_get_rows(
+            list(map(_get_requirement_state_key, dict.fromkeys(fastq_id_list))),
+            projection_expression=(
+                "id, satisfied_requirement_set, has_active_readset, active_readset_checked_at, last_event_at"
+            ),
+            # A stale read only costs us a fastq manager call
+            consistent_read=False,
+            client=client,
+        ).items()
+    ))
+
+
+def update_requirement_state_item_list(
+        requirement_state_item_list: List[RequirementStateItem],
+        ttl_seconds: int = DEFAULT_REQUIREMENT_STATE_TTL_SECONDS,
+        client: Optional['DynamoDBClient'] = None,
+) -> None:
+    """
+    Write a list of requirement states, one UpdateItem request per fastq id, made concurrently.
+
+    The satisfied requirements are ADDed to the row, so a requirement is never removed from the row,
+    even by a concurrent writer that read the fastq before the requirement was satisfied.
+    The active readset flag and the time it was checked are overwritten.
+    The latest event time is only written when the state came from an event (lastEventAt > 0).
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    table_name = get_task_token_table_name()
+    expires_at = int(time.time()) + ttl_seconds
+
+    def _update_requirement_state_item(requirement_state_item: RequirementStateItem) -> None:
+        update_expression = (
+            "SET has_active_readset = :has_active_readset, "
+            "active_readset_checked_at = :active_readset_checked_at, "
+            "expiresAt = :expires_at"
+        )
+        expression_attribute_values = {
+            ":has_active_readset": {"BOOL": requirement_state_item['hasActiveReadSet']},
+            ":active_readset_checked_at": {"N": str(requirement_state_item['activeReadSetCheckedAt'])},
+            ":expires_at": {"N": str(expires_at)},
+        }
+
+        if requirement_state_item['lastEventAt'] > 0:
+            update_expression = f"{update_expression}, last_event_at = :last_event_at"
+            expression_attribute_values[":last_event_at"] = {"N": str(requirement_state_item['lastEventAt'])}
+
+        # Sets cannot be empty, so only ADD when there is something to add
+        if len(requirement_state_item['satisfiedRequirementsList']) > 0:
+            update_expression = f"ADD satisfied_requirement_set :satisfied_requirement_set {update_expression}"
+            expression_attribute_values[":satisfied_requirement_set"] = {
+                "SS": list(dict.fromkeys(requirement_state_item['satisfiedRequirementsList']))
+            }
+
+        client.update_item(
+            TableName=table_name,
+            Key=_get_requirement_state_key(requirement_state_item['fastqId']),
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues=expression_attribute_values,
+        )
+
+    run_concurrently(_update_requirement_state_item, requirement_state_item_list)
+
+
+def mark_fastq_id_satisfied(
+        task_token: str,
+        fastq_id: str,
+        client: Optional['DynamoDBClient'] = None,
+) -> Optional[int]:
+    """
+    Atomically move a fastq id from the task token's fastq_id_set to its satisfied_fastq_id_set
+    and decrement the remaining count.
+
+    Returns the remaining count after the update.
+    Only the caller that takes the remaining count to zero sees zero, so only that caller should send
+    the task success.
+
+    Returns None if the fastq id has already been satisfied for this task token (i.e. a repeat event)
+    or the task token is no longer in the table.
+
+    Task token rows written before the remaining count existed (and not yet migrated,
+    see backfill_task_token_remaining_count) fall back to the size of the fastq_id_set after the update.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    try:
+        response = client.update_item(
+            TableName=get_task_token_table_name(),
+            Key={
+                "id": {"S": task_token},
+                "id_type": {"S": TASK_TOKEN_ID_TYPE},
+            },
+            UpdateExpression=(
+                "DELETE fastq_id_set :fastq_id_set "
+                "ADD satisfied_fastq_id_set :fastq_id_set, remaining_count :minus_one"
+            ),
+            # Without the remaining count, ADD would start the count at -1 and it would never reach zero
+            ConditionExpression="contains(fastq_id_set, :fastq_id) AND attribute_exists(remaining_count)",
+            ExpressionAttributeValues={
+                ":fastq_id_set": {"SS": [fastq_id]},
+                ":fastq_id": {"S": fastq_id},
+                ":minus_one": {"N": "-1"},
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return _mark_fastq_id_satisfied_legacy(task_token, fastq_id, client=client)
+
+    return int(response['Attributes']['remaining_count']['N'])
+
+
+def _mark_fastq_id_satisfied_legacy(
+        task_token: str,
+        fastq_id: str,
+        client: 'DynamoDBClient',
+) -> Optional[int]:
+    """
+    As mark_fastq_id_satisfied, for task token rows without a remaining count.
+    Removing the last fastq id removes the fastq_id_set attribute, so only that update sees zero.
+    """
+    try:
+        response = client.update_item(
+            TableName=get_task_token_table_name(),
+            Key={
+                "id": {"S": task_token},
+                "id_type": {"S": TASK_TOKEN_ID_TYPE},
+            },
+            UpdateExpression=(
+                "DELETE fastq_id_set :fastq_id_set "
+                "ADD satisfied_fastq_id_set :fastq_id_set"
+            ),
+            ConditionExpression="contains(fastq_id_set, :fastq_id) AND attribute_not_exists(remaining_count)",
+            ExpressionAttributeValues={
+                ":fastq_id_set": {"SS": [fastq_id]},
+                ":fastq_id": {"S": fastq_id},
+            },
+            ReturnValues="ALL_NEW",
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return None
+
+    return len(response['Attributes'].get('fastq_id_set', {}).get('SS', []))
+
+
+def mark_task_token_dirty(
+        task_token: str,
+        client: Optional['DynamoDBClient'] = None,
+) -> bool:
+    """
+    Mark a task token as needing a full re-evaluation on the next heartbeat.
+    Returns False if the task token is no longer in the table.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    try:
+        client.update_item(
+            TableName=get_task_token_table_name(),
+            Key={
+                "id": {"S": task_token},
+                "id_type": {"S": TASK_TOKEN_ID_TYPE},
+            },
+            UpdateExpression="ADD dirty_count :one",
+            ConditionExpression="attribute_exists(id)",
+            ExpressionAttributeValues={
+                ":one": {"N": "1"},
+            },
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+    return True
+
+
+def backfill_active_task_token_index(
+        client: Optional['DynamoDBClient'] = None,
+) -> int:
+    """
+    Migration for task token rows written before the active task token index existed (see migrate_task_token_table).
+    Scans the table for task token rows without the index partition key and sets it.
+    Returns the number of rows updated.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    table_name = get_task_token_table_name()
+    updated_count = 0
+
+    paginator = client.get_paginator('scan')
+    for page_iter_ in paginator.paginate(
+        TableName=table_name,
+        FilterExpression="#id_type = :task_token_id_type AND attribute_not_exists(#status)",
+        ExpressionAttributeNames={
+            "#id_type": "id_type",
+            "#status": get_active_task_token_index_partition_key_name(),
+        },
+        ExpressionAttributeValues={
+            ":task_token_id_type": {"S": TASK_TOKEN_ID_TYPE},
+        },
+        ProjectionExpression="id, id_type",
+    ):
+        for item_iter_ in page_iter_.get('Items', []):
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={
+                        "id": item_iter_['id'],
+                        "id_type": item_iter_['id_type'],
+                    },
+                    UpdateExpression="SET #status = :status",
+                    # Don't resurrect a row that was deleted since the scan
+                    ConditionExpression="attribute_exists(id)",
+                    ExpressionAttributeNames={
+                        "#status": get_active_task_token_index_partition_key_name(),
+                    },
+                    ExpressionAttributeValues={
+                        ":status": {"S": get_active_task_token_index_partition_key_value()},
+                    },
+                )
+            except client.exceptions.ConditionalCheckFailedException:
+                continue
+            updated_count += 1
+
+    return updated_count
+
+
+def backfill_task_token_remaining_count(
+        client: Optional['DynamoDBClient'] = None,
+) -> int:
+    """
+    Migration for task token rows written before the remaining count existed (see migrate_task_token_table).
+    Scans the table for task token rows without a remaining count and sets it to the size of the fastq_id_set.
+    Returns the number of rows updated.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    table_name = get_task_token_table_name()
+    updated_count = 0
+
+    paginator = client.get_paginator('scan')
+    for page_iter_ in paginator.paginate(
+        TableName=table_name,
+        FilterExpression="#id_type = :task_token_id_type AND attribute_not_exists(remaining_count)",
+        ExpressionAttributeNames={
+            "#id_type": "id_type",
+        },
+        ExpressionAttributeValues={
+            ":task_token_id_type": {"S": TASK_TOKEN_ID_TYPE},
+        },
+        ProjectionExpression="id, id_type, fastq_id_set",
+    ):
+        for item_iter_ in page_iter_.get('Items', []):
+            # Every fastq id has been satisfied, the task token is about to be released
+            if 'fastq_id_set' not in item_iter_:
+                continue
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={
+                        "id": item_iter_['id'],
+                        "id_type": item_iter_['id_type'],
+                    },
+                    UpdateExpression="SET remaining_count = :remaining_count",
+                    # Skip the row if a fastq id was satisfied since the scan, it is still released
+                    # through the legacy path of mark_fastq_id_satisfied
+                    ConditionExpression="fastq_id_set = :fastq_id_set AND attribute_not_exists(remaining_count)",
+                    ExpressionAttributeValues={
+                        ":fastq_id_set": item_iter_['fastq_id_set'],
+                        ":remaining_count": {"N": str(len(item_iter_['fastq_id_set']['SS']))},
+                    },
+                )
+            except client.exceptions.ConditionalCheckFailedException:
+                continue
+            updated_count += 1
+
+    return updated_count
+
+
+# Migrations of the task token rows, in order, the table version is the number of migrations applied
+TASK_TOKEN_TABLE_MIGRATION_LIST: List[Callable[[Optional['DynamoDBClient']], int]] = [
+    backfill_active_task_token_index,
+    backfill_task_token_remaining_count,
+]
+
+
+def get_task_token_table_version(
+        client: Optional['DynamoDBClient'] = None,
+) -> int:
+    """
+    Get the number of task token table migrations applied, 0 if the table has never been migrated
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    item = client.get_item(
+        TableName=get_task_token_table_name(),
+        Key={
+            "id": {"S": TASK_TOKEN_TABLE_MIGRATION_ID},
+            "id_type": {"S": MIGRATION_ID_TYPE},
+        },
+        ConsistentRead=True,
+    ).get('Item', None)
+
+    if item is None:
+        return 0
+
+    return int(item['version']['N'])
+
+
+def migrate_task_token_table(
+        client: Optional['DynamoDBClient'] = None,
+) -> int:
+    """
+    Apply any task token table migrations that have not yet been applied, then record the table version.
+
+    The heartbeat monitor runs this before it lists the active task tokens, so task tokens registered
+    before a deployment are migrated by the first heartbeat after it.
+    Once the table is up to date, this is a single get item call.
+    Each migration is idempotent, so concurrent or repeated runs are safe.
+
+    Returns the number of rows updated.
+    """
+    if client is None:
+        client = get_dynamodb_client()
+
+    table_version = get_task_token_table_version(client=client)
+    if table_version >= len(TASK_TOKEN_TABLE_MIGRATION_LIST):
+        return 0
+
+    updated_count = 0
+    for migration_iter_ in TASK_TOKEN_TABLE_MIGRATION_LIST[table_version:]:
+        migration_updated_count = migration_iter_(client)
+        logger.info(f"Task token table migration {migration_iter_.__name__} updated {migration_updated_count} rows")
+        updated_count += migration_updated_count
+
+    client.put_item(
+        TableName=get_task_token_table_name(),
+        Item={
+            "id": {"S": TASK_TOKEN_TABLE_MIGRATION_ID},
+            "id_type": {"S": MIGRATION_ID_TYPE},
+            "version": {"N": str(len(TASK_TOKEN_TABLE_MIGRATION_LIST))},
+        },
+    )
+
+    return updated_count
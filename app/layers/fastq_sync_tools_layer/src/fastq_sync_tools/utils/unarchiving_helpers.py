@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Fastq unarchiving helpers for the fastq sync service
+
+The active unarchiving jobs for a list of fastqs are queried together, with the fastq id filter
+of the unarchiving api (get_job_list_for_fastq), one query per fastq id and active status.
+The queries are run concurrently (see concurrency.py) and collected into an index from fastq id to job.
+We don't list every active job in the account and filter it ourselves, the unfiltered job list
+grows with the activity of every other service using the unarchiver.
+"""
+
+# Standard library imports
+from os import environ
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+import logging
+
+# Layer imports
+from orcabus_api_tools.fastq_unarchiving.models import (
+    Job as UnarchivingJob,
+)
+
+# Local imports
+from .concurrency import run_concurrently
+from .instrumented_api import (
+    create_unarchiving_job,
+    get_unarchiving_job_list_for_fastq,
+)
+
+# Globals
+ACTIVE_UNARCHIVING_JOB_STATUS_LIST = ['PENDING', 'RUNNING']
+
+# Maximum number of fastqs to place in a single unarchiving job
+UNARCHIVING_JOB_GROUP_SIZE_ENV_VAR = "FASTQ_SYNC_UNARCHIVING_JOB_GROUP_SIZE"
+DEFAULT_UNARCHIVING_JOB_GROUP_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
+
+def get_active_unarchiving_jobs_for_fastq_id_list(
+        fastq_id_list: List[str]
+) -> Dict[str, List[UnarchivingJob]]:
+    """
+    Get the active (PENDING / RUNNING) unarchiving jobs for each fastq id in the list.
+
+    Makes one query per unique fastq id and active status, filtered to that fastq id, run concurrently.
+    Every fastq id in the input list is present in the output, with an empty list if it has no active jobs.
+    """
+    fastq_id_to_active_jobs_index: Dict[str, List[UnarchivingJob]] = dict(map(
+        lambda fastq_id_iter_: (fastq_id_iter_, []),
+        fastq_id_list
+    ))
+
+    fastq_id_and_job_status_list: List[Tuple[str, str]] = list(product(
+        fastq_id_to_active_jobs_index.keys(),
+        ACTIVE_UNARCHIVING_JOB_STATUS_LIST
+    ))
+
+    job_list_by_query = run_concurrently(
+        lambda fastq_id_and_job_status_iter_: get_unarchiving_job_list_for_fastq(*fastq_id_and_job_status_iter_),
+        fastq_id_and_job_status_list
+    )
+
+    for (fastq_id_iter_, _), job_list_iter_ in zip(fastq_id_and_job_status_list, job_list_by_query):
+        fastq_id_to_active_jobs_index[fastq_id_iter_].extend(job_list_iter_)
+
+    return fastq_id_to_active_jobs_index
+
+
+def get_fastq_id_list_with_active_unarchiving_jobs(fastq_id_list: List[str]) -> List[str]:
+    """
+    Get the subset of fastq ids (in input order) that have at least one active unarchiving job
+    """
+    fastq_id_to_active_jobs_index = get_active_unarchiving_jobs_for_fastq_id_list(fastq_id_list)
+
+    return list(filter(
+        lambda fastq_id_iter_: len(fastq_id_to_active_jobs_index[fastq_id_iter_]) > 0,
+        fastq_id_to_active_jobs_index.keys()
+    ))
+
+
+def get_unarchiving_job_group_size() -> int:
+    """
+    Get the maximum number of fastqs to group into a single unarchiving job.
+    Read from the FASTQ_SYNC_UNARCHIVING_JOB_GROUP_SIZE environment variable, falls back to the default
+    if the variable is not set or is not a positive integer.
+    """
+    group_size_str = environ.get(UNARCHIVING_JOB_GROUP_SIZE_ENV_VAR, "")
+
+    try:
+        group_size = int(group_size_str) if group_size_str else DEFAULT_UNARCHIVING_JOB_GROUP_SIZE
+    except ValueError:
+        logger.warning(
+            f"Could not parse {UNARCHIVING_JOB_GROUP_SIZE_ENV_VAR}='{group_size_str}' as an integer, "
+            f"using the default of {DEFAULT_UNARCHIVING_JOB_GROUP_SIZE}"
+        )
+        return DEFAULT_UNARCHIVING_JOB_GROUP_SIZE
+
+    if group_size < 1:
+        return DEFAULT_UNARCHIVING_JOB_GROUP_SIZE
+
+    return group_size
+
+
+def run_grouped_unarchiving_jobs(
+        fastq_id_list: List[str],
+        group_size: Optional[int] = None,
+) -> List[UnarchivingJob]:
+    """
+    Unarchive a list of fastqs using as few unarchiving jobs as possible.
+
+    Fastqs that already have an active unarchiving job are skipped,
+    the remaining fastqs are chunked into groups of at most group_size fastqs, with one job per group.
+    Use a group size of 1 to create one unarchiving job per fastq.
+    """
+    if group_size is None:
+        group_size = get_unarchiving_job_group_size()
+
+    # Skip fastqs that already have an active unarchiving job
+    fastq_id_set_with_active_unarchiving_jobs = set(
+        get_fastq_id_list_with_active_unarchiving_jobs(fastq_id_list)
+    )
+    fastq_id_list_to_unarchive = list(dict.fromkeys(filter(
+        lambda fastq_id_iter_: fastq_id_iter_ not in fastq_id_set_with_active_unarchiving_jobs,
+        fastq_id_list
+    )))
+
+    unarchiving_job_list: List[UnarchivingJob] = []
+    for group_index in range(0, len(fastq_id_list_to_unarchive), group_size):
+        unarchiving_job_list.append(
+            create_unarchiving_job(
+                fastq_ids=fastq_id_list_to_unarchive[group_index:group_index + group_size],
+                job_type='S3_UNARCHIVING'
+            )
+        )
+
+    return unarchiving_job_list
@@ -5,160 +5,60 @@ Bunch of useful helper functions for lambdas in the fastq sync service
 """
 
 # Standard library imports
-import os
 from typing import Dict, Optional, List, Tuple, Union
+import asyncio
 import logging
-from requests import HTTPError
-from os import environ
 
 # Layer imports
-from orcabus_api_tools.fastq import (
-    get_fastq_jobs,
-    run_qc_stats,
-    run_file_compression_stats,
-    run_ntsm, run_read_count_stats,
-    to_fastq_list_row
-)
 from orcabus_api_tools.fastq.models import (
     Job, JobType,
     Fastq
 )
-from orcabus_api_tools.fastq_unarchiving import (
-    create_job as create_unarchiving_job,
-    get_job_list_for_fastq
-)
 from orcabus_api_tools.fastq_unarchiving.models import (
     Job as UnarchivingJob,
 )
 
 # Local imports
+from .instrumented_api import (
+    run_qc_stats,
+    run_file_compression_stats,
+    run_ntsm, run_read_count_stats,
+    create_unarchiving_job,
+)
 from .globals import (
     REQUIREMENT,
-    ACTIVE_STORAGE_CLASSES
+    REQUIREMENTS_MATRIX,
 )
 
-# Import test data
-TEST_DATA_BUCKET_ENV_VAR = "TEST_DATA_BUCKET"
-TEST_DATA_PREFIX_ENV_VAR = "TEST_DATA_PREFIX"
-
-from .exceptions import ContextNotEligibleError
+from .async_api import run_api_call_async
+from .job_snapshot import FastqJobSnapshot
+from .unarchiving_helpers import get_active_unarchiving_jobs_for_fastq_id_list
+from .requirement_checks import get_context_readset_cache_stats, has_active_readset
+from .requirement_plan import (
+    RequirementPlan,
+    compile_requirement_plan,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def has_active_readset(fastq_obj: Fastq) -> bool:
-    if fastq_obj['readSet'] is None:
-        return False
-
-    readset_objects = list(filter(
-        lambda readset_iter_: readset_iter_ is not None,
-        [fastq_obj['readSet']['r1'], fastq_obj['readSet']['r2']]
-    ))
-
-    for readset_object in readset_objects:
-        # If the storage class is not in the active storage classes or
-        if readset_object['storageClass'] not in ACTIVE_STORAGE_CLASSES:
-            return False
-
-    return True
-
-
-def has_active_readset_in_context(fastq_obj: Fastq, bucket: str, prefix: str) -> bool:
-    """
-    Check whether the FASTQ readset is resolvable in the provided (bucket, prefix) context.
-
-    This implementation delegates the validation to `orcabus_api_tools.fastq.to_fastq_list_row(...)`:
-    it returns True if that call succeeds, and False if it raises an HTTPError.
-    """
-    if fastq_obj['readSet'] is None:
-        return False
-
-    # Try running to_fastq_list_row with the test data bucket
-    # If this passes, we're exempt because this is accessible from all projects
-    try:
-        to_fastq_list_row(
-            fastq_id=fastq_obj['id'],
-            bucket=environ[TEST_DATA_BUCKET_ENV_VAR],
-            key_prefix=environ[TEST_DATA_PREFIX_ENV_VAR],
-        )
-        return True
-    except HTTPError:
-        pass
-
-    # Try running to_fastq_list_row with the bucket and prefix context
-    try:
-        to_fastq_list_row(
-            fastq_id=fastq_obj['id'],
-            bucket=bucket,
-            key_prefix=prefix,
-        )
-    except HTTPError:
-        return False
-    return True
-
-
-def has_qc(fastq_obj: Fastq) -> bool:
-    return fastq_obj['qc'] is not None
-
-
-def has_fingerprint(fastq_obj: Fastq) -> bool:
-    return fastq_obj['ntsm'] is not None
-
-
-def has_compression_metadata(fastq_obj: Fastq) -> bool:
-    # Check active readset
-    if not has_active_readset(fastq_obj):
-        return False
-
-    # Can assert we have an active readset and that the readset is not None
-
-    # Let's check if the compression format is ORA, if not, we can assume that the compression metadata
-    # Condition is satisfied
-    if fastq_obj['readSet']['compressionFormat'] != 'ORA':
-        return True
-
-    # If the compression format is ORA, then we need to check if the compression metadata is present
-    readset_objects = list(filter(
-        lambda readset_iter_: readset_iter_ is not None,
-        [fastq_obj['readSet']['r1'], fastq_obj['readSet']['r2']]
-    ))
-
-    for readset_object in readset_objects:
-        if readset_object['gzipCompressionSizeInBytes'] is None or readset_object['rawMd5sum'] is None:
-            return False
-
-    # If we got to here then the compression metadata is present in all readsets for this fastq list row
-    return True
-
-
-def has_read_count_metadata(fastq_obj: Fastq) -> bool:
-    if fastq_obj['readCount'] is None or fastq_obj['baseCountEst'] is None:
-        return False
-    return True
-
-
-def check_fastq_job(fastq_id: str, job_type: JobType) -> bool:
+def check_fastq_job(
+        fastq_id: str,
+        job_type: JobType,
+        job_snapshot: Optional[FastqJobSnapshot] = None
+) -> bool:
     """
     Check the fastq doesn't already have jobs running for this particular type
+    If a job snapshot is provided, we answer from the snapshot rather than querying the fastq manager
     :param fastq_id:
     :param job_type:
+    :param job_snapshot:
     :return:
     """
-    return (
-            len(
-                list(filter(
-                    lambda job_iter_: (
-                            (
-                                    job_iter_['jobType'] == job_type
-                            ) and
-                            (
-                                    job_iter_['status'] in ['PENDING', 'RUNNING']
-                            )
-                    ),
-                    get_fastq_jobs(fastq_id)
-                ))
-            ) == 0
-    )
+    if job_snapshot is None:
+        job_snapshot = FastqJobSnapshot(fastq_id)
+
+    return not job_snapshot.has_active_job(job_type)
 
 
 def check_fastq_unarchiving_job(fastq_id: str) -> bool:
@@ -169,21 +69,20 @@ def check_fastq_unarchiving_job(fastq_id: str) -> bool:
     :param fastq_id:
     :return:
     """
-    return (
-            (
-                    len(get_job_list_for_fastq(fastq_id, 'PENDING')) == 0
-            ) and
-            (
-                    len(get_job_list_for_fastq(fastq_id, 'RUNNING')) == 0
-            )
-    )
+    return len(get_active_unarchiving_jobs_for_fastq_id_list([fastq_id])[fastq_id]) == 0
 
 
-def run_fastq_job(fastq: Fastq, job_type: JobType) -> Optional[Job]:
+def run_fastq_job(
+        fastq: Fastq,
+        job_type: JobType,
+        job_snapshot: Optional[FastqJobSnapshot] = None
+) -> Optional[Job]:
     """
     Run a job for a fastq
+    If a job snapshot is provided, it is used to check for existing jobs and is updated with the launched job
     :param fastq:
     :param job_type:
+    :param job_snapshot:
     :return:
     """
     # Check that the fastq list row has an active read set
@@ -191,24 +90,30 @@ def run_fastq_job(fastq: Fastq, job_type: JobType) -> Optional[Job]:
         logger.warning("No active read set for fastq %s" % fastq)
         return None
 
+    if job_snapshot is None:
+        job_snapshot = FastqJobSnapshot(fastq['id'])
+
     # Check if the job is already running
-    if not check_fastq_job(fastq['id'], job_type):
+    if not check_fastq_job(fastq['id'], job_type, job_snapshot=job_snapshot):
         return None
 
     # Create the job
     if job_type == 'QC':
-        return run_qc_stats(fastq_id=fastq['id'])
-
-    if job_type == 'NTSM':
-        return run_ntsm(fastq_id=fastq['id'])
-
-    if job_type == 'FILE_COMPRESSION':
-        return run_file_compression_stats(fastq_id=fastq['id'])
+        job = run_qc_stats(fastq_id=fastq['id'])
+    elif job_type == 'NTSM':
+        job = run_ntsm(fastq_id=fastq['id'])
+    elif job_type == 'FILE_COMPRESSION':
+        job = run_file_compression_stats(fastq_id=fastq['id'])
+    elif job_type == 'READ_COUNT':
+        job = run_read_count_stats(fastq_id=fastq['id'])
+    else:
+        raise ValueError(f"Unknown job type: {job_type}")
 
-    if job_type == 'READ_COUNT':
-        return run_read_count_stats(fastq_id=fastq['id'])
+    # Keep the snapshot up to date so we don't launch the same job twice
+    if job is not None:
+        job_snapshot.add_job(job)
 
-    raise ValueError(f"Unknown job type: {job_type}")
+    return job
 
 
 def run_fastq_unarchiving_job(fastq: Fastq) -> Optional[UnarchivingJob]:
@@ -224,98 +129,113 @@ def check_fastq_against_requirements_list(
         fastq_obj: Fastq,
         requirements: List[REQUIREMENT],
         is_unarchiving_allowed: bool = False,
-        has_active_readset_context: Optional[Dict[str, str]] = None
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        requirement_plan: Optional[RequirementPlan] = None,
+        stop_on_first_unsatisfied: bool = False,
 ) -> Tuple[List[REQUIREMENT], List[REQUIREMENT]]:
     """
     Given a fastq list row and the requirements, split requirements into two lists, one that is satisfied and one that is not.
 
-    When has_active_readset_context is provided (dict with 'bucket' and 'prefix'), the hasActiveReadSet
-    requirement is evaluated context-aware: the readset must exist in the specified bucket/prefix.
-    If not in context and the context is not allowed, raises ContextNotEligibleError.
-    If not in context and the context IS allowed, reports as unsatisfied (downstream handles unarchiving).
+    See evaluate_has_active_readset_requirement for how has_active_readset_context and is_unarchiving_allowed
+    affect the hasActiveReadSet requirement.
+
+    When checking many fastqs against the same requirements, compile the requirement plan once
+    with compile_requirement_plan and pass it through as requirement_plan.
+
+    If stop_on_first_unsatisfied is set, we stop once the fastq has failed a requirement,
+    the requirements we did not evaluate are in neither list.
+    """
+    if requirement_plan is None:
+        requirement_plan = compile_requirement_plan(
+            requirements,
+            is_unarchiving_allowed=is_unarchiving_allowed,
+            has_active_readset_context=has_active_readset_context,
+        )
+
+    return requirement_plan.split(fastq_obj, stop_on_first_unsatisfied=stop_on_first_unsatisfied)
+
+
+def get_requirements_matrix(
+        fastq_list: List[Fastq],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+        stop_on_first_unsatisfied: bool = False,
+) -> REQUIREMENTS_MATRIX:
+    """
+    Evaluate every (fastq, requirement) pair exactly once.
+
+    Returns a matrix keyed by fastq id, where each value maps the requirement to whether
+    the fastq satisfies it. Use get_requirements_from_requirements_matrix and
+    get_fastq_id_list_with_missing_requirements_from_requirements_matrix to derive the aggregate
+    results without any further api calls.
+
+    If stop_on_first_unsatisfied is set, each fastq is only evaluated until it fails a requirement,
+    the requirements we did not evaluate are missing from its row.
+    Use this when we only need to know which fastqs are missing requirements,
+    since get_requirements_from_requirements_matrix treats a missing requirement as unsatisfied.
     """
+    requirements_matrix: REQUIREMENTS_MATRIX = {}
+
+    # Compile the requirements once for the whole fastq list
+    requirement_plan = compile_requirement_plan(
+        requirements,
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+    )
 
+    for fastq_obj in fastq_list:
+        satisfied_requirements_iter_, unsatisfied_requirements_iter_ = check_fastq_against_requirements_list(
+            fastq_obj,
+            requirements,
+            requirement_plan=requirement_plan,
+            stop_on_first_unsatisfied=stop_on_first_unsatisfied,
+        )
+
+        requirements_matrix[fastq_obj['id']] = {
+            **dict(map(lambda requirement_iter_: (requirement_iter_, True), satisfied_requirements_iter_)),
+            **dict(map(lambda requirement_iter_: (requirement_iter_, False), unsatisfied_requirements_iter_)),
+        }
+
+    if has_active_readset_context is not None:
+        logger.info(f"Context readset cache stats: {get_context_readset_cache_stats()}")
+
+    return requirements_matrix
+
+
+def get_requirements_from_requirements_matrix(
+        requirements_matrix: REQUIREMENTS_MATRIX,
+        requirements: List[REQUIREMENT],
+) -> Tuple[List[REQUIREMENT], List[REQUIREMENT]]:
+    """
+    Given a requirements matrix, split the requirements into two lists,
+    one that is satisfied (for all fastqs) and one that is not (for at least one fastq)
+    """
     satisfied_requirements = []
     unsatisfied_requirements = []
 
-    # First check we can even run any of the jobs
-    # If data is archived and unarchiving is not allowed, we cannot run any jobs
-    if (
-            not is_unarchiving_allowed
-            and 'hasActiveReadSet' in requirements
-            and fastq_obj['readSet'] is not None
-    ):
-        if has_active_readset_context is not None:
-            # Context-aware archived check
-            bucket = has_active_readset_context['bucket']
-            prefix = has_active_readset_context['prefix']
-            if not has_active_readset_in_context(fastq_obj, bucket, prefix):
-                if not is_allowed_context(bucket, prefix):
-                    raise ContextNotEligibleError(bucket, prefix)
-                # If allowed context but not in context, this is an archived/unavailable scenario
-                # but unarchiving is not allowed — raise the same ValueError as before
-                raise ValueError(
-                    f"Fastq readset is not available in requested context "
-                    f"(bucket={bucket}, prefix={prefix}) and unarchiving is not allowed"
-                )
+    for requirement_iter_ in requirements:
+        if all(
+                fastq_requirements_iter_.get(requirement_iter_, False)
+                for fastq_requirements_iter_ in requirements_matrix.values()
+        ):
+            satisfied_requirements.append(requirement_iter_)
         else:
-            # Original behavior: context-free check
-            if not has_active_readset(fastq_obj):
-                raise ValueError("Fastq object is archived but unarchiving is not specified in the fastq sync service")
+            unsatisfied_requirements.append(requirement_iter_)
 
-    # Just a large if else block to check the requirements
-    for requirement_iter_ in requirements:
-        # Check read set
-        if requirement_iter_ == 'hasActiveReadSet':
-            if has_active_readset_context is not None:
-                # Context-aware evaluation
-                bucket = has_active_readset_context['bucket']
-                prefix = has_active_readset_context['prefix']
-                if has_active_readset_in_context(fastq_obj, bucket, prefix):
-                    satisfied_requirements.append(requirement_iter_)
-                else:
-                    # Not in context — check if context is allowed
-                    if not is_allowed_context(bucket, prefix):
-                        raise ContextNotEligibleError(bucket, prefix)
-                    # Allowed context but not in context: report as unsatisfied
-                    unsatisfied_requirements.append(requirement_iter_)
-            else:
-                # Original context-free evaluation
-                if has_active_readset(fastq_obj):
-                    satisfied_requirements.append(requirement_iter_)
-                else:
-                    unsatisfied_requirements.append(requirement_iter_)
-
-        # Check qc
-        if requirement_iter_ == 'hasQc':
-            if has_qc(fastq_obj):
-                satisfied_requirements.append(requirement_iter_)
-            else:
-                unsatisfied_requirements.append(requirement_iter_)
-
-        # Check fingerprint
-        if requirement_iter_ == 'hasFingerprint':
-            if has_fingerprint(fastq_obj):
-                satisfied_requirements.append(requirement_iter_)
-            else:
-                unsatisfied_requirements.append(requirement_iter_)
-
-        # Check compression metadata
-        if requirement_iter_ == 'hasFileCompressionInformation':
-            if has_compression_metadata(fastq_obj):
-                satisfied_requirements.append(requirement_iter_)
-            else:
-                unsatisfied_requirements.append(requirement_iter_)
-
-        # Check read-count metadata
-        if requirement_iter_ == 'hasReadCountInformation':
-            if has_read_count_metadata(fastq_obj):
-                satisfied_requirements.append(requirement_iter_)
-            else:
-                unsatisfied_requirements.append(requirement_iter_)
+    return satisfied_requirements, unsatisfied_requirements
 
 
-    return satisfied_requirements, unsatisfied_requirements
+def get_fastq_id_list_with_missing_requirements_from_requirements_matrix(
+        requirements_matrix: REQUIREMENTS_MATRIX,
+) -> List[str]:
+    """
+    Given a requirements matrix, return the list of fastq ids that fail at least one requirement
+    """
+    return list(filter(
+        lambda fastq_id_iter_: not all(requirements_matrix[fastq_id_iter_].values()),
+        requirements_matrix.keys()
+    ))
 
 
 def check_fastq_list_against_requirements_list(
@@ -329,54 +249,85 @@ def check_fastq_list_against_requirements_list(
     split the fastq list into two lists,
     one that is satisfied (for all fastqs) and one that is not (for at least one fastq)
     """
+    return get_requirements_from_requirements_matrix(
+        get_requirements_matrix(
+            fastq_list=fastq_list,
+            requirements=requirements,
+            is_unarchiving_allowed=is_unarchiving_allowed,
+            has_active_readset_context=has_active_readset_context,
+        ),
+        requirements,
+    )
 
-    # Start with all requirements satisfied
-    satisfied_requirements = set(requirements)
 
-    # For each fastq object in the list, check against the requirements
-    for fastq_obj in fastq_list:
-        # Check if the fastq object has the requirements satisfied
-        satisfied_requirements_iter_, unsatisfied_requirements_iter_ = check_fastq_against_requirements_list(
-            fastq_obj,
-            requirements,
-            is_unarchiving_allowed,
-            has_active_readset_context=has_active_readset_context
+async def get_requirements_matrix_async(
+        fastq_list: List[Fastq],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+) -> REQUIREMENTS_MATRIX:
+    """
+    Asyncio variant of get_requirements_matrix.
+    If the plan has network-backed requirements (i.e. a context-aware hasActiveReadSet),
+    each fastq is evaluated on the shared async thread pool, otherwise the fastqs are evaluated in place.
+    """
+    requirement_plan = compile_requirement_plan(
+        requirements,
+        is_unarchiving_allowed=is_unarchiving_allowed,
+        has_active_readset_context=has_active_readset_context,
+    )
+
+    if not requirement_plan.is_network_backed():
+        return get_requirements_matrix(
+            fastq_list=fastq_list,
+            requirements=requirements,
+            is_unarchiving_allowed=is_unarchiving_allowed,
+            has_active_readset_context=has_active_readset_context,
         )
 
-        # If there are no unsatisfied requirements, continue to the next fastq object
-        if len(unsatisfied_requirements_iter_) == 0:
-            continue
+    split_requirements_list = await asyncio.gather(*map(
+        lambda fastq_obj_iter_: run_api_call_async(
+            check_fastq_against_requirements_list,
+            fastq_obj_iter_,
+            requirements,
+            requirement_plan=requirement_plan,
+        ),
+        fastq_list
+    ))
 
-        # Remove any unsatisfied requirements from
-        # the satisfied requirements from the set
-        # Since all fastq objects must satisfy the requirements
-        for unsatisfied_requirement_iter_ in unsatisfied_requirements_iter_:
-            if unsatisfied_requirement_iter_ in satisfied_requirements:
-                # Remove the requirement from the satisfied requirements
-                satisfied_requirements.remove(unsatisfied_requirement_iter_)
+    requirements_matrix: REQUIREMENTS_MATRIX = {}
+    for fastq_obj, (satisfied_requirements_iter_, unsatisfied_requirements_iter_) in zip(
+            fastq_list, split_requirements_list
+    ):
+        requirements_matrix[fastq_obj['id']] = {
+            **dict(map(lambda requirement_iter_: (requirement_iter_, True), satisfied_requirements_iter_)),
+            **dict(map(lambda requirement_iter_: (requirement_iter_, False), unsatisfied_requirements_iter_)),
+        }
 
-    # The list of unsatisfied requirements is the difference
-    # between the original requirements and the satisfied requirements
-    unsatisfied_requirements = list(set(requirements) - satisfied_requirements)
+    if has_active_readset_context is not None:
+        logger.info(f"Context readset cache stats: {get_context_readset_cache_stats()}")
 
-    return list(satisfied_requirements), unsatisfied_requirements
+    return requirements_matrix
 
 
-def get_pipeline_cache_config() -> Tuple[str, str]:
+async def check_fastq_list_against_requirements_list_async(
+        fastq_list: List[Fastq],
+        requirements: List[REQUIREMENT],
+        is_unarchiving_allowed: bool = False,
+        has_active_readset_context: Optional[Dict[str, str]] = None,
+) -> Tuple[List[REQUIREMENT], List[REQUIREMENT]]:
     """
-    Read and validate PIPELINE_CACHE_BUCKET and PIPELINE_CACHE_PREFIX from environment.
-    Returns (pipeline_cache_bucket, byob_environment).
-    Raises RuntimeError if either is missing or empty.
+    Asyncio variant of check_fastq_list_against_requirements_list
     """
-    pipeline_cache_bucket = os.environ.get("PIPELINE_CACHE_BUCKET", "")
-    byob_environment = os.environ.get("PIPELINE_CACHE_PREFIX", "")
-
-    if not pipeline_cache_bucket:
-        raise RuntimeError("Missing required environment variable: PIPELINE_CACHE_BUCKET")
-    if not byob_environment:
-        raise RuntimeError("Missing required environment variable: PIPELINE_CACHE_PREFIX")
-
-    return pipeline_cache_bucket, byob_environment
+    return get_requirements_from_requirements_matrix(
+        await get_requirements_matrix_async(
+            fastq_list=fastq_list,
+            requirements=requirements,
+            is_unarchiving_allowed=is_unarchiving_allowed,
+            has_active_readset_context=has_active_readset_context,
+        ),
+        requirements,
+    )
 
 
 def validate_has_active_readset_input(
@@ -466,20 +417,3 @@ def validate_has_active_readset_input(
         f"hasActiveReadSet must be a boolean or an object with 'bucket' and 'prefix', "
         f"got {type(has_active_readset_value).__name__}"
     )
-
-
-def is_allowed_context(bucket: str, prefix: str) -> bool:
-    """
-    Check if the given bucket and prefix match the allowed pipeline-cache context.
-
-    Returns True if bucket equals PIPELINE_CACHE_BUCKET env var AND
-    prefix starts with '{PIPELINE_CACHE_PREFIX}'.
-
-    Uses get_pipeline_cache_config() internally to read environment variables.
-    """
-    pipeline_cache_bucket, pipeline_cache_prefix = get_pipeline_cache_config()
-
-    return (
-        bucket == pipeline_cache_bucket
-        and prefix.startswith(pipeline_cache_prefix)
-    )
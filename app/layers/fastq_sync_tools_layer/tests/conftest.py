@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Shared fixtures for the fastq sync tools layer tests
+"""
+
+# Standard library imports
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List
+import sys
+import time
+
+import pytest
+import requests
+
+# The orcabus api tools are only available as a lambda layer,
+# use the fake modules the benchmarks install (the api calls are patched in each test)
+try:
+    import orcabus_api_tools  # noqa: F401
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).absolute().parents[3] / "benchmarks"))
+    from fake_services import install_fake_orcabus_api_tools
+    install_fake_orcabus_api_tools()
+
+
+def get_http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"{status_code} Error", response=response)
+
+
+class FakeFastqManager:
+    """
+    Stands in for the fastq manager get_fastq call.
+
+    Fastqs added to fastq_obj_by_id are returned as they are, any other fastq id is returned as {"id": fastq_id},
+    unless it starts with 'deleted' (404), 'unavailable' (503) or 'forbidden' (403).
+    Each call takes delay_seconds, and the most calls in flight at once is recorded.
+    """
+
+    def __init__(self, delay_seconds: float = 0.0):
+        self.fastq_obj_by_id: Dict[str, Dict] = {}
+        self.get_fastq_calls: List[str] = []
+        self.delay_seconds = delay_seconds
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = Lock()
+
+    def get_fastq(self, fastq_id: str, **kwargs) -> Dict:
+        with self.lock:
+            self.get_fastq_calls.append(fastq_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay_seconds > 0:
+                time.sleep(self.delay_seconds)
+            if fastq_id.startswith("deleted"):
+                raise get_http_error(404)
+            if fastq_id.startswith("unavailable"):
+                raise get_http_error(503)
+            if fastq_id.startswith("forbidden"):
+                raise get_http_error(403)
+            return self.fastq_obj_by_id.get(fastq_id, {"id": fastq_id})
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def active_task_token_index_env(monkeypatch):
+    # Set by CDK in the lambda environment (see infrastructure/stage/constants.ts)
+    monkeypatch.setenv("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_NAME", "ActiveTaskTokenIndex")
+    monkeypatch.setenv("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME", "task_token_status")
+    monkeypatch.setenv("FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE", "ACTIVE")
+
+
+@pytest.fixture
+def fastq_manager(monkeypatch):
+    from fastq_sync_tools.utils import fastq_error_cache
+
+    fastq_error_cache.FASTQ_ERROR_CACHE.clear()
+    fastq_manager = FakeFastqManager()
+    monkeypatch.setattr(fastq_error_cache, "get_fastq", fastq_manager.get_fastq)
+    yield fastq_manager
+    fastq_error_cache.FASTQ_ERROR_CACHE.clear()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+
+"""
+A local, in-memory stand-in for the DynamoDB client calls made by the token store and the requirement state
+
+Only the expressions the token store uses are supported:
+  * update expressions made of ADD, SET and DELETE clauses
+  * condition and filter expressions made of size(), contains(), attribute_exists(), attribute_not_exists()
+    and equality terms joined by AND
+  * #name placeholders (ExpressionAttributeNames) in update, condition and filter expressions
+
+Failures can be injected to exercise the retries:
+  * unprocessed_key_rounds: the next n batch_get_item calls only process the first half of their keys
+  * cancelled_transaction_rounds: the next n transact_write_items calls are cancelled with a TransactionConflict
+  * before_transact_write_items: called before each transaction is applied, i.e. to simulate a concurrent writer
+"""
+
+# Standard library imports
+from copy import deepcopy
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import re
+
+
+class FakeClientError(Exception):
+    def __init__(self, message: str, response: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.response = response or {}
+
+
+class FakeDynamoDBExceptions:
+    class ConditionalCheckFailedException(FakeClientError):
+        pass
+
+    class TransactionCanceledException(FakeClientError):
+        pass
+
+    class ValidationException(FakeClientError):
+        pass
+
+
+def _get_key_tuple(key: Dict) -> Tuple[str, str]:
+    return key['id']['S'], key['id_type']['S']
+
+
+def _get_set_values(attribute_value: Dict) -> List[str]:
+    return attribute_value.get('SS', [])
+
+
+class FakeDynamoDBClient:
+    exceptions = FakeDynamoDBExceptions
+
+    def __init__(self):
+        # Table name -> (id, id_type) -> item
+        self.tables: Dict[str, Dict[Tuple[str, str], Dict]] = {}
+        # Operation name -> number of calls
+        self.call_counts: Dict[str, int] = {}
+
+        self.unprocessed_key_rounds = 0
+        self.cancelled_transaction_rounds = 0
+        self.before_transact_write_items: Optional[Callable[[], None]] = None
+
+    def _count_call(self, operation_name: str) -> None:
+        self.call_counts[operation_name] = self.call_counts.get(operation_name, 0) + 1
+
+    @staticmethod
+    def _substitute_names(expression: Optional[str], names: Optional[Dict[str, str]]) -> Optional[str]:
+        if expression is None or names is None:
+            return expression
+        return re.sub(r"#\w+", lambda name_match: names[name_match.group(0)], expression)
+
+    def _get_table(self, table_name: str) -> Dict[Tuple[str, str], Dict]:
+        return self.tables.setdefault(table_name, {})
+
+    def get_items(self, table_name: str) -> Dict[Tuple[str, str], Dict]:
+        return self._get_table(table_name)
+
+    # Expressions
+    @staticmethod
+    def _check_condition(item: Optional[Dict], condition_expression: Optional[str], values: Dict) -> bool:
+        if condition_expression is None:
+            return True
+
+        for term_iter_ in condition_expression.split(" AND "):
+            term_iter_ = term_iter_.strip()
+
+            attribute_exists_match = re.fullmatch(r"attribute_exists\((\w+)\)", term_iter_)
+            if attribute_exists_match is not None:
+                if item is None or attribute_exists_match.group(1) not in item:
+                    return False
+                continue
+
+            attribute_not_exists_match = re.fullmatch(r"attribute_not_exists\((\w+)\)", term_iter_)
+            if attribute_not_exists_match is not None:
+                if item is not None and attribute_not_exists_match.group(1) in item:
+                    return False
+                continue
+
+            if item is None:
+                return False
+
+            equals_match = re.fullmatch(r"(\w+) = (:\w+)", term_iter_)
+            if equals_match is not None:
+                attribute_name, value_name = equals_match.groups()
+                if item.get(attribute_name, None) != values[value_name]:
+                    return False
+                continue
+
+            size_match = re.fullmatch(r"size\((\w+)\) (=|>) (:\w+)", term_iter_)
+            if size_match is not None:
+                attribute_name, operator, value_name = size_match.groups()
+                size = len(_get_set_values(item.get(attribute_name, {})))
+                value = int(values[value_name]['N'])
+                if not (size == value if operator == "=" else size > value):
+                    return False
+                continue
+
+            contains_match = re.fullmatch(r"contains\((\w+), (:\w+)\)", term_iter_)
+            if contains_match is not None:
+                attribute_name, value_name = contains_match.groups()
+                if values[value_name]['S'] not in _get_set_values(item.get(attribute_name, {})):
+                    return False
+                continue
+
+            raise NotImplementedError(f"Unsupported condition '{term_iter_}'")
+
+        return True
+
+    @staticmethod
+    def _apply_update(item: Dict, update_expression: str, values: Dict) -> None:
+        # Split the expression into its clauses, i.e. 'ADD a :a SET b = :b' -> [('ADD', 'a :a'), ('SET', 'b = :b')]
+        for action_iter_, clause_iter_ in re.findall(r"(ADD|SET|DELETE) (.+?)(?= (?:ADD|SET|DELETE) |$)", update_expression):
+            for assignment_iter_ in map(str.strip, clause_iter_.split(",")):
+                if action_iter_ == "SET":
+                    attribute_name, value_name = map(str.strip, assignment_iter_.split("="))
+                    item[attribute_name] = deepcopy(values[value_name])
+                    continue
+
+                attribute_name, value_name = assignment_iter_.split(" ")
+                value = values[value_name]
+
+                if action_iter_ == "ADD" and 'N' in value:
+                    item[attribute_name] = {"N": str(int(item.get(attribute_name, {"N": "0"})['N']) + int(value['N']))}
+                    continue
+
+                set_values = _get_set_values(item.get(attribute_name, {}))
+                if action_iter_ == "ADD":
+                    set_values = list(dict.fromkeys(set_values + value['SS']))
+                else:
+                    set_values = [set_value_iter_ for set_value_iter_ in set_values if set_value_iter_ not in value['SS']]
+
+                # DynamoDB sets cannot be empty, removing the last value removes the attribute
+                if len(set_values) == 0:
+                    item.pop(attribute_name, None)
+                else:
+                    item[attribute_name] = {"SS": set_values}
+
+    # Single item operations
+    def put_item(self, TableName: str, Item: Dict, **kwargs) -> Dict:
+        self._count_call("put_item")
+        self._get_table(TableName)[_get_key_tuple(Item)] = deepcopy(Item)
+        return {}
+
+    def get_item(self, TableName: str, Key: Dict, **kwargs) -> Dict:
+        self._count_call("get_item")
+        item = self._get_table(TableName).get(_get_key_tuple(Key), None)
+        return {"Item": deepcopy(item)} if item is not None else {}
+
+    def update_item(
+            self,
+            TableName: str,
+            Key: Dict,
+            UpdateExpression: str,
+            ConditionExpression: Optional[str] = None,
+            ExpressionAttributeValues: Optional[Dict] = None,
+            ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+            **kwargs
+    ) -> Dict:
+        self._count_call("update_item")
+        table = self._get_table(TableName)
+        item = table.get(_get_key_tuple(Key), None)
+        UpdateExpression = self._substitute_names(UpdateExpression, ExpressionAttributeNames)
+        ConditionExpression = self._substitute_names(ConditionExpression, ExpressionAttributeNames)
+
+        if not self._check_condition(item, ConditionExpression, ExpressionAttributeValues or {}):
+            raise self.exceptions.ConditionalCheckFailedException("The conditional request failed")
+
+        item = table.setdefault(_get_key_tuple(Key), deepcopy(Key))
+        self._apply_update(item, UpdateExpression, ExpressionAttributeValues or {})
+        return {"Attributes": deepcopy(item)}
+
+    def delete_item(self, TableName: str, Key: Dict, **kwargs) -> Dict:
+        self._count_call("delete_item")
+        self._get_table(TableName).pop(_get_key_tuple(Key), None)
+        return {}
+
+    # Scans, all items are returned in a single page
+    def scan(
+            self,
+            TableName: str,
+            FilterExpression: Optional[str] = None,
+            ExpressionAttributeValues: Optional[Dict] = None,
+            ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+            **kwargs
+    ) -> Dict:
+        self._count_call("scan")
+        filter_expression = self._substitute_names(FilterExpression, ExpressionAttributeNames)
+        return {
+            "Items": [
+                deepcopy(item_iter_)
+                for item_iter_ in self._get_table(TableName).values()
+                if self._check_condition(item_iter_, filter_expression, ExpressionAttributeValues or {})
+            ]
+        }
+
+    def get_paginator(self, operation_name: str) -> 'FakePaginator':
+        return FakePaginator(getattr(self, operation_name))
+
+    # Batch operations
+    def batch_get_item(self, RequestItems: Dict[str, Dict], **kwargs) -> Dict:
+        self._count_call("batch_get_item")
+
+        if sum(map(lambda request_iter_: len(request_iter_['Keys']), RequestItems.values())) > 100:
+            raise self.exceptions.ValidationException("Too many items requested for the BatchGetItem call")
+
+        responses: Dict[str, List[Dict]] = {}
+        unprocessed_keys: Dict[str, Dict] = {}
+        for table_name_iter_, request_iter_ in RequestItems.items():
+            key_list = request_iter_['Keys']
+            if self.unprocessed_key_rounds > 0 and len(key_list) > 1:
+                unprocessed_keys[table_name_iter_] = {**request_iter_, "Keys": key_list[len(key_list) // 2:]}
+                key_list = key_list[:len(key_list) // 2]
+
+            table = self._get_table(table_name_iter_)
+            responses[table_name_iter_] = list(map(
+                lambda key_iter_: deepcopy(table[_get_key_tuple(key_iter_)]),
+                filter(lambda key_iter_: _get_key_tuple(key_iter_) in table, key_list)
+            ))
+
+        if self.unprocessed_key_rounds > 0:
+            self.unprocessed_key_rounds -= 1
+
+        return {"Responses": responses, "UnprocessedKeys": unprocessed_keys}
+
+    def transact_write_items(self, TransactItems: List[Dict], **kwargs) -> Dict:
+        self._count_call("transact_write_items")
+
+        if len(TransactItems) > 100:
+            raise self.exceptions.ValidationException("Member must have length less than or equal to 100")
+
+        key_list = list(map(
+            lambda transact_item_iter_: (
+                list(transact_item_iter_.values())[0]['TableName'],
+                _get_key_tuple(
+                    list(transact_item_iter_.values())[0].get('Key')
+                    or list(transact_item_iter_.values())[0]['Item']
+                )
+            ),
+            TransactItems
+        ))
+        if len(set(key_list)) != len(key_list):
+            raise self.exceptions.ValidationException("Transaction request cannot include multiple operations on one item")
+
+        if self.before_transact_write_items is not None:
+            self.before_transact_write_items()
+
+        if self.cancelled_transaction_rounds > 0:
+            self.cancelled_transaction_rounds -= 1
+            raise self.exceptions.TransactionCanceledException(
+                "Transaction cancelled",
+                {"CancellationReasons": [{"Code": "TransactionConflict"}] * len(TransactItems)}
+            )
+
+        # Check every condition before applying any write, transactions are all or nothing
+        cancellation_reasons = list(map(
+            lambda transact_item_iter_, key_iter_: {
+                "Code": (
+                    "None"
+                    if self._check_condition(
+                        self._get_table(key_iter_[0]).get(key_iter_[1], None),
+                        list(transact_item_iter_.values())[0].get('ConditionExpression', None),
+                        list(transact_item_iter_.values())[0].get('ExpressionAttributeValues', {}),
+                    )
+                    else "ConditionalCheckFailed"
+                )
+            },
+            TransactItems, key_list
+        ))
+        if any(map(lambda reason_iter_: reason_iter_['Code'] != "None", cancellation_reasons)):
+            raise self.exceptions.TransactionCanceledException(
+                "Transaction cancelled", {"CancellationReasons": cancellation_reasons}
+            )
+
+        for transact_item_iter_, (table_name_iter_, key_tuple_iter_) in zip(TransactItems, key_list):
+            table = self._get_table(table_name_iter_)
+            if "Put" in transact_item_iter_:
+                table[key_tuple_iter_] = deepcopy(transact_item_iter_['Put']['Item'])
+            elif "Delete" in transact_item_iter_:
+                table.pop(key_tuple_iter_, None)
+            elif "Update" in transact_item_iter_:
+                update = transact_item_iter_['Update']
+                item = table.setdefault(key_tuple_iter_, deepcopy(update['Key']))
+                self._apply_update(item, update['UpdateExpression'], update.get('ExpressionAttributeValues', {}))
+            else:
+                raise NotImplementedError(f"Unsupported transact item {list(transact_item_iter_.keys())}")
+
+        return {}
+
+
+class FakePaginator:
+    def __init__(self, operation: Callable[..., Dict]):
+        self.operation = operation
+
+    def paginate(self, **kwargs) -> Iterator[Dict]:
+        yield self.operation(**kwargs)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the api call metrics and their EMF log lines
+"""
+
+# Standard library imports
+import json
+
+import pytest
+
+from fastq_sync_tools.utils.metrics import (
+    API_METRICS,
+    get_api_metrics_emf_log_lines,
+    get_api_metrics_sample_rate,
+    get_latency_bucket_ms,
+    record_api_call,
+    with_api_metrics,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_api_metrics(monkeypatch):
+    monkeypatch.delenv("FASTQ_SYNC_API_METRICS_ENABLED", raising=False)
+    monkeypatch.delenv("FASTQ_SYNC_API_METRICS_SAMPLE_RATE", raising=False)
+    API_METRICS.reset()
+    yield
+    API_METRICS.reset()
+
+
+def fake_api_call(value: str) -> str:
+    if value == "error":
+        raise ValueError(value)
+    return value
+
+
+def get_emf_log_lines(capsys):
+    return list(map(json.loads, capsys.readouterr().out.splitlines()))
+
+
+@pytest.mark.parametrize(
+    "latency_ms,latency_bucket_ms",
+    [(0, 1), (1, 1), (1.5, 2), (75, 100), (60000, 60000), (120000, 60000)]
+)
+def test_latency_buckets(latency_ms, latency_bucket_ms):
+    assert get_latency_bucket_ms(latency_ms) == latency_bucket_ms
+
+
+def test_record_api_call_counts_calls_and_errors():
+    api_call = record_api_call("fake.api_call", fake_api_call)
+
+    assert api_call("ok") == "ok"
+    with pytest.raises(ValueError):
+        api_call("error")
+
+    snapshot = API_METRICS.get_snapshot()
+    assert snapshot["fake.api_call"]["calls"] == 2
+    assert snapshot["fake.api_call"]["errors"] == 1
+    assert sum(snapshot["fake.api_call"]["latencyHistogramMs"].values()) == 2
+
+
+def test_record_api_call_when_disabled(monkeypatch):
+    monkeypatch.setenv("FASTQ_SYNC_API_METRICS_ENABLED", "false")
+
+    assert record_api_call("fake.api_call", fake_api_call)("ok") == "ok"
+    assert API_METRICS.get_snapshot() == {}
+
+
+@pytest.mark.parametrize("sample_rate_str", ["not-a-number", "1.5", "-1"])
+def test_invalid_sample_rate_falls_back_to_default(monkeypatch, sample_rate_str):
+    monkeypatch.setenv("FASTQ_SYNC_API_METRICS_SAMPLE_RATE", sample_rate_str)
+    assert get_api_metrics_sample_rate() == 1.0
+
+
+def test_emf_log_line_structure():
+    API_METRICS.record("fake.api_call", 3)
+    API_METRICS.record("fake.api_call", 4, is_error=True)
+    API_METRICS.record("fake.api_call", 150)
+
+    log_line_list = get_api_metrics_emf_log_lines(API_METRICS.get_snapshot(), 0.5, function_name="fakeFunction")
+    assert len(log_line_list) == 1
+
+    emf_obj = json.loads(log_line_list[0])
+    cloudwatch_metrics = emf_obj["_aws"]["CloudWatchMetrics"][0]
+    assert cloudwatch_metrics["Dimensions"] == [["FunctionName", "Endpoint"], ["Endpoint"]]
+    assert set(map(lambda metric_iter_: metric_iter_["Name"], cloudwatch_metrics["Metrics"])) == {
+        "ApiCalls", "ApiErrors", "ApiErrorRate", "ApiLatency"
+    }
+    # Every metric and dimension must be a top level member of the log line
+    assert all(map(lambda metric_iter_: metric_iter_["Name"] in emf_obj, cloudwatch_metrics["Metrics"]))
+    assert emf_obj["FunctionName"] == "fakeFunction"
+    assert emf_obj["Endpoint"] == "fake.api_call"
+    assert emf_obj["SampleRate"] == 0.5
+    assert emf_obj["ApiCalls"] == 3
+    assert emf_obj["ApiErrors"] == 1
+    assert emf_obj["ApiErrorRate"] == pytest.approx(100 / 3)
+    assert emf_obj["ApiLatency"] == {"Values": [5, 200], "Counts": [2, 1]}
+
+
+def test_with_api_metrics_flushes_and_resets(capsys):
+    api_call = record_api_call("fake.api_call", fake_api_call)
+
+    @with_api_metrics
+    def handler(event, context):
+        return api_call(event["value"])
+
+    assert handler({"value": "ok"}, None) == "ok"
+
+    emf_obj_list = get_emf_log_lines(capsys)
+    assert len(emf_obj_list) == 1
+    assert emf_obj_list[0]["ApiCalls"] == 1
+    assert API_METRICS.get_snapshot() == {}
+
+
+def test_with_api_metrics_flushes_when_the_handler_raises(capsys):
+    api_call = record_api_call("fake.api_call", fake_api_call)
+
+    @with_api_metrics
+    def handler(event, context):
+        return api_call(event["value"])
+
+    with pytest.raises(ValueError):
+        handler({"value": "error"}, None)
+
+    emf_obj_list = get_emf_log_lines(capsys)
+    assert len(emf_obj_list) == 1
+    assert emf_obj_list[0]["ApiErrors"] == 1
+
+
+def test_with_api_metrics_not_sampled(monkeypatch, capsys):
+    monkeypatch.setenv("FASTQ_SYNC_API_METRICS_SAMPLE_RATE", "0")
+    api_call = record_api_call("fake.api_call", fake_api_call)
+
+    @with_api_metrics
+    def handler(event, context):
+        return api_call(event["value"])
+
+    handler({"value": "ok"}, None)
+
+    assert get_emf_log_lines(capsys) == []
+    # Unsampled metrics are still reset, so they don't leak into the next invocation
+    assert API_METRICS.get_snapshot() == {}
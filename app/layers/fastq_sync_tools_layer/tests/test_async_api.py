@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the asyncio variants of the orcabus api calls
+"""
+
+# Standard library imports
+from typing import List
+import asyncio
+import time
+
+import pytest
+
+from fastq_sync_tools.utils import async_api, fastq_helpers
+from fastq_sync_tools.utils.async_api import (
+    any_async,
+    get_async_max_concurrency,
+    run_api_call_async,
+    run_async,
+)
+
+
+@pytest.fixture
+def async_max_concurrency(monkeypatch):
+    # The thread pool is sized on first use, so start from a fresh one
+    monkeypatch.setenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", "4")
+    monkeypatch.setattr(async_api, "_ASYNC_EXECUTOR", None)
+    yield 4
+    async_api.get_async_executor().shutdown(wait=True)
+
+
+def test_async_max_concurrency(monkeypatch):
+    monkeypatch.delenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", raising=False)
+    assert get_async_max_concurrency() == 256
+    monkeypatch.setenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", "50")
+    assert get_async_max_concurrency() == 50
+    monkeypatch.setenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", "0")
+    assert get_async_max_concurrency() == 256
+    monkeypatch.setenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", "lots")
+    assert get_async_max_concurrency() == 256
+
+
+def test_get_fastq_list_async(fastq_manager, async_max_concurrency):
+    fastq_manager.delay_seconds = 0.01
+    fastq_id_list = [f"fqr.{i}" for i in range(20)] + ["deleted-1"]
+
+    fastq_obj_list, failed_fastq_id_list = run_async(fastq_helpers.get_fastq_list_async(fastq_id_list))
+
+    assert fastq_obj_list == [{"id": f"fqr.{i}"} for i in range(20)]
+    assert failed_fastq_id_list == ["deleted-1"]
+    assert 1 < fastq_manager.max_in_flight <= async_max_concurrency
+
+
+def test_get_fastq_list_async_hundreds_in_flight(fastq_manager, monkeypatch):
+    # With the default concurrency, a few hundred fastqs are all fetched at once
+    monkeypatch.delenv("FASTQ_SYNC_ASYNC_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setattr(async_api, "_ASYNC_EXECUTOR", None)
+    fastq_manager.delay_seconds = 0.2
+    fastq_id_list = [f"fqr.{i}" for i in range(200)]
+
+    try:
+        fastq_obj_list, failed_fastq_id_list = run_async(fastq_helpers.get_fastq_list_async(fastq_id_list))
+    finally:
+        async_api.get_async_executor().shutdown(wait=True)
+
+    assert len(fastq_obj_list) == 200
+    assert failed_fastq_id_list == []
+    assert fastq_manager.max_in_flight > 100
+
+
+def test_run_async_in_running_event_loop(async_max_concurrency):
+    async def _outer() -> int:
+        # A sync wrapper called from inside an event loop
+        return run_async(run_api_call_async(lambda: 1))
+
+    assert asyncio.run(_outer()) == 1
+
+
+def test_any_async_short_circuits(async_max_concurrency):
+    calls: List[str] = []
+
+    def _check(name: str, result: bool, delay_seconds: float) -> bool:
+        time.sleep(delay_seconds)
+        calls.append(name)
+        return result
+
+    assert run_async(any_async([
+        ("slow", lambda: run_api_call_async(_check, "slow", True, 0.5)),
+        ("fast", lambda: run_api_call_async(_check, "fast", True, 0.0)),
+    ]))
+    assert calls == ["fast"]
+
+    assert not run_async(any_async([
+        ("a", lambda: run_api_call_async(_check, "a", False, 0.0)),
+        ("b", lambda: run_api_call_async(_check, "b", False, 0.0)),
+    ]))
+    assert not run_async(any_async([]))
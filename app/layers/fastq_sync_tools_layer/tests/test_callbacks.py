@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Tests for releasing a list of durable execution callbacks
+"""
+
+# Standard library imports
+from threading import Lock
+
+from fastq_sync_tools.utils.callbacks import release_callback_id_list
+
+
+class FakeLambdaClientExceptions:
+    class InvalidParameterValueException(Exception):
+        pass
+
+    class ResourceNotFoundException(Exception):
+        pass
+
+    class CallbackTimeoutException(Exception):
+        pass
+
+    class TooManyRequestsException(Exception):
+        pass
+
+
+class FakeLambdaClient:
+    """
+    Callback ids starting with 'released' have already been released, 'invalid' are not valid callback ids,
+    'timed-out' have timed out and 'throttled' are throttled.
+    """
+    exceptions = FakeLambdaClientExceptions
+
+    def __init__(self):
+        self.released_callback_id_list = []
+        self._lock = Lock()
+
+    def send_durable_execution_callback_success(self, CallbackId: str, Result: str):
+        if CallbackId.startswith("released"):
+            raise self.exceptions.ResourceNotFoundException(CallbackId)
+        if CallbackId.startswith("invalid"):
+            raise self.exceptions.InvalidParameterValueException(CallbackId)
+        if CallbackId.startswith("timed-out"):
+            raise self.exceptions.CallbackTimeoutException(CallbackId)
+        if CallbackId.startswith("throttled"):
+            raise self.exceptions.TooManyRequestsException(CallbackId)
+
+        with self._lock:
+            self.released_callback_id_list.append(CallbackId)
+        return {}
+
+
+def test_release_callback_id_list():
+    client = FakeLambdaClient()
+    callback_id_list = [f"callback-{index_iter_}" for index_iter_ in range(50)]
+
+    callback_result_list = release_callback_id_list(callback_id_list, client=client)
+
+    assert list(map(lambda result_iter_: result_iter_["callbackId"], callback_result_list)) == callback_id_list
+    assert all(map(lambda result_iter_: result_iter_["status"] == "RELEASED", callback_result_list))
+    assert sorted(client.released_callback_id_list) == sorted(callback_id_list)
+
+
+def test_release_callback_id_list_tolerates_errors():
+    client = FakeLambdaClient()
+
+    callback_result_list = release_callback_id_list(
+        ["callback-1", "released-1", "invalid-1", "timed-out-1", "throttled-1"],
+        client=client
+    )
+
+    assert list(map(lambda result_iter_: result_iter_["status"], callback_result_list)) == [
+        "RELEASED", "NOT_FOUND", "INVALID", "TIMED_OUT", "FAILED"
+    ]
+    assert callback_result_list[0]["error"] is None
+    assert callback_result_list[4]["error"] == "throttled-1"
+    assert client.released_callback_id_list == ["callback-1"]
+
+
+def test_release_callback_id_list_releases_each_callback_id_once():
+    client = FakeLambdaClient()
+
+    callback_result_list = release_callback_id_list(["callback-1", "callback-1", "callback-2"], client=client)
+
+    assert len(callback_result_list) == 2
+    assert sorted(client.released_callback_id_list) == ["callback-1", "callback-2"]
+
+
+def test_release_empty_callback_id_list():
+    assert release_callback_id_list([], client=FakeLambdaClient()) == []
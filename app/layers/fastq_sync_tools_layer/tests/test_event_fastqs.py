@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Tests for using fastqs taken from event payloads in place of get_fastq calls
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fastq_sync_tools import get_fastq_list_with_event_fastqs, get_requirements_matrix, is_event_fastq_usable
+
+
+def get_event_fastq_obj():
+    return {
+        "id": "fqr.01JABCDEFGHJKMNPQRSTVWXYZ0",
+        "readSet": {
+            "r1": {"storageClass": "Standard", "gzipCompressionSizeInBytes": None, "rawMd5sum": None},
+            "r2": {"storageClass": "Standard", "gzipCompressionSizeInBytes": None, "rawMd5sum": None},
+            "compressionFormat": "ORA",
+        },
+        "qc": None,
+        "ntsm": None,
+        "readCount": None,
+        "baseCountEst": None,
+    }
+
+
+def get_event_time(age_seconds: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=age_seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_fresh_complete_event_fastq_is_usable():
+    assert is_event_fastq_usable(get_event_fastq_obj(), get_event_time(10), max_age_seconds=300)
+
+
+def test_stale_event_fastq_is_not_usable():
+    assert not is_event_fastq_usable(get_event_fastq_obj(), get_event_time(600), max_age_seconds=300)
+
+
+@pytest.mark.parametrize("event_time", [None, "", "not-a-timestamp"])
+def test_event_fastq_without_valid_event_time_is_not_usable(event_time):
+    assert not is_event_fastq_usable(get_event_fastq_obj(), event_time, max_age_seconds=300)
+
+
+@pytest.mark.parametrize("missing_key", ["readSet", "qc", "ntsm", "readCount", "baseCountEst"])
+def test_event_fastq_with_missing_fields_is_not_usable(missing_key):
+    event_fastq_obj = get_event_fastq_obj()
+    del event_fastq_obj[missing_key]
+
+    assert not is_event_fastq_usable(event_fastq_obj, get_event_time(10), max_age_seconds=300)
+
+
+def test_event_fastq_without_storage_class_is_not_usable():
+    event_fastq_obj = get_event_fastq_obj()
+    event_fastq_obj['readSet']['r2'] = {}
+
+    assert not is_event_fastq_usable(event_fastq_obj, get_event_time(10), max_age_seconds=300)
+
+
+@pytest.mark.parametrize("missing_key", ["storageClass", "gzipCompressionSizeInBytes", "rawMd5sum"])
+def test_event_fastq_with_missing_read_fields_is_not_usable(missing_key):
+    event_fastq_obj = get_event_fastq_obj()
+    del event_fastq_obj['readSet']['r1'][missing_key]
+
+    assert not is_event_fastq_usable(event_fastq_obj, get_event_time(10), max_age_seconds=300)
+
+
+def test_out_of_order_event_fastq_is_not_usable():
+    last_event_at = int((datetime.now(timezone.utc) - timedelta(seconds=10)).timestamp())
+
+    assert not is_event_fastq_usable(
+        get_event_fastq_obj(), get_event_time(60), max_age_seconds=300, last_event_at=last_event_at
+    )
+    assert is_event_fastq_usable(
+        get_event_fastq_obj(), get_event_time(5), max_age_seconds=300, last_event_at=last_event_at
+    )
+
+
+def test_event_fastq_requirements_matrix(fastq_manager):
+    # The event fastq is evaluated in place of a get_fastq call
+    event_fastq_obj = get_event_fastq_obj()
+    fastq_obj_list, failed_fastq_id_list = get_fastq_list_with_event_fastqs(
+        [event_fastq_obj['id']],
+        event_fastq_obj_list=[event_fastq_obj],
+        event_time=get_event_time(10),
+    )
+    assert fastq_manager.get_fastq_calls == []
+    assert failed_fastq_id_list == []
+
+    requirements_matrix = get_requirements_matrix(
+        fastq_list=fastq_obj_list,
+        requirements=[
+            "hasActiveReadSet", "hasQc", "hasFingerprint",
+            "hasFileCompressionInformation", "hasReadCountInformation",
+        ],
+    )
+
+    assert requirements_matrix == {
+        event_fastq_obj['id']: {
+            "hasActiveReadSet": True,
+            "hasQc": False,
+            "hasFingerprint": False,
+            "hasFileCompressionInformation": False,
+            "hasReadCountInformation": False,
+        }
+    }
+
+
+def test_event_fastq_without_readset_is_usable():
+    event_fastq_obj = get_event_fastq_obj()
+    event_fastq_obj['readSet'] = None
+
+    assert is_event_fastq_usable(event_fastq_obj, get_event_time(10), max_age_seconds=300)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the negative cache of failed fastq manager calls
+"""
+
+import pytest
+import requests
+
+from fastq_sync_tools.utils import fastq_helpers
+from fastq_sync_tools.utils.fastq_error_cache import (
+    get_fastq_error_ttl_seconds,
+    get_fastq_with_error_cache,
+    get_not_found_fastq_id_list,
+)
+
+
+def test_not_found_fastq_is_not_fetched_again(fastq_manager):
+    for _ in range(3):
+        with pytest.raises(requests.HTTPError):
+            get_fastq_with_error_cache("deleted-1")
+
+    assert fastq_manager.get_fastq_calls == ["deleted-1"]
+    assert get_not_found_fastq_id_list(["fqr.1", "deleted-1", "deleted-1"]) == ["deleted-1"]
+
+
+def test_server_errors_are_cached_but_not_reported_as_not_found(fastq_manager):
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            get_fastq_with_error_cache("unavailable-1")
+
+    assert fastq_manager.get_fastq_calls == ["unavailable-1"]
+    assert get_not_found_fastq_id_list(["unavailable-1"]) == []
+
+
+def test_other_errors_are_not_cached(fastq_manager):
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            get_fastq_with_error_cache("forbidden-1")
+
+    assert fastq_manager.get_fastq_calls == ["forbidden-1", "forbidden-1"]
+
+
+def test_fastq_error_ttl_seconds():
+    assert get_fastq_error_ttl_seconds(404) == get_fastq_error_ttl_seconds(410) == 60 * 60
+    assert get_fastq_error_ttl_seconds(500) == get_fastq_error_ttl_seconds(503) == 30
+    assert get_fastq_error_ttl_seconds(403) is None
+    assert get_fastq_error_ttl_seconds(None) is None
+
+
+def test_get_fastq_list_skips_cached_errors(fastq_manager):
+    fastq_helpers.get_fastq_list(["fqr.1", "deleted-1"])
+    fastq_obj_list, failed_fastq_id_list = fastq_helpers.get_fastq_list(["fqr.1", "deleted-1"])
+
+    assert fastq_obj_list == [{"id": "fqr.1"}]
+    assert failed_fastq_id_list == ["deleted-1"]
+    assert fastq_manager.get_fastq_calls.count("deleted-1") == 1
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Payload size regression tests for the slim fastq projection
+
+The slim projection is what we return into the state machines,
+so it must stay well under the 256 KB step functions payload limit, however large the fastq object is.
+"""
+
+# Standard library imports
+import json
+
+import pytest
+
+from fastq_sync_tools import get_fastq_projection, project_fastq
+
+# Step functions payload limit
+SFN_PAYLOAD_LIMIT_BYTES = 256 * 1024
+
+# The slim projection has a fixed set of fields, so should stay tiny
+MAX_SLIM_PROJECTION_BYTES = 1024
+
+
+def get_large_readset_obj(read_number: int, storage_class: str, num_s3_details: int):
+    return {
+        "ingestId": f"0193ab4c-{read_number:04d}-7000-8000-000000000000",
+        "s3Uri": f"s3://pipeline-cache-bucket/byob-icav2/production/primary/250101_A01052_0001_AHXXXXXXX/{'x' * 128}/L_R{read_number}_001.fastq.ora",
+        "storageClass": storage_class,
+        "sha256": "a" * 64,
+        "gzipCompressionSizeInBytes": 123456789,
+        "rawMd5sum": "b" * 32,
+        # Stand in for the S3 details (object versions, tags, etc) that make the fastq object large
+        "s3Details": [
+            {
+                "s3ObjectId": f"0193ab4c-{read_number:04d}-{detail_iter_:04d}-8000-000000000000",
+                "bucket": "pipeline-cache-bucket",
+                "key": f"byob-icav2/production/primary/250101_A01052_0001_AHXXXXXXX/{'y' * 256}/{detail_iter_}",
+                "versionId": "c" * 32,
+                "eTag": "d" * 32,
+                "sizeInBytes": 123456789,
+                "lastModifiedDate": "2025-01-01T00:00:00Z",
+                "attributes": {f"tag{tag_iter_}": "z" * 64 for tag_iter_ in range(10)},
+            }
+            for detail_iter_ in range(num_s3_details)
+        ],
+    }
+
+
+def get_large_fastq_obj(storage_class: str = "Standard", num_s3_details: int = 50):
+    return {
+        "id": "fqr.01JABCDEFGHJKMNPQRSTVWXYZ0",
+        "index": "AAAAAAAA+CCCCCCCC",
+        "lane": 1,
+        "instrumentRunId": "250101_A01052_0001_AHXXXXXXX",
+        "library": {
+            "orcabusId": "lib.01JABCDEFGHJKMNPQRSTVWXYZ0",
+            "libraryId": "L2500001",
+        },
+        "platform": "Illumina",
+        "center": "UMCCR",
+        "date": "2025-01-01T00:00:00",
+        "readSet": {
+            "r1": get_large_readset_obj(1, storage_class, num_s3_details),
+            "r2": get_large_readset_obj(2, storage_class, num_s3_details),
+            "compressionFormat": "ORA",
+        },
+        "qc": {
+            "insertSizeEstimate": 300,
+            "rawWgsCoverageEstimate": 30.0,
+            "r1Q20Fraction": 0.95,
+            "r2Q20Fraction": 0.95,
+            "r1GcFraction": 0.4,
+            "r2GcFraction": 0.4,
+            "duplicationFractionEstimate": 0.1,
+            "sequaliReports": {f"report{report_iter_}": "q" * 512 for report_iter_ in range(20)},
+        },
+        "ntsm": {
+            "ntsmUri": "s3://pipeline-cache-bucket/ntsm/L2500001.ntsm",
+        },
+        "readCount": 400000000,
+        "baseCountEst": 120000000000,
+        "isValid": True,
+    }
+
+
+@pytest.mark.parametrize("num_s3_details", [1, 50, 200])
+def test_slim_projection_payload_size(num_s3_details):
+    fastq_obj = get_large_fastq_obj(num_s3_details=num_s3_details)
+
+    full_payload_size = len(json.dumps(fastq_obj).encode())
+    slim_payload_size = len(json.dumps(get_fastq_projection(fastq_obj)).encode())
+
+    assert slim_payload_size <= MAX_SLIM_PROJECTION_BYTES
+    assert slim_payload_size < full_payload_size
+
+    # The slim payload size should not depend on the number of S3 details
+    assert slim_payload_size == len(json.dumps(get_fastq_projection(get_large_fastq_obj(num_s3_details=1))).encode())
+
+
+def test_slim_projection_of_fastq_over_payload_limit():
+    # A fastq object that by itself would not fit in a step functions payload
+    fastq_obj = get_large_fastq_obj(num_s3_details=400)
+    assert len(json.dumps(fastq_obj).encode()) > SFN_PAYLOAD_LIMIT_BYTES
+
+    assert len(json.dumps(get_fastq_projection(fastq_obj)).encode()) <= MAX_SLIM_PROJECTION_BYTES
+
+
+def test_slim_projection_fields():
+    fastq_projection = get_fastq_projection(get_large_fastq_obj(storage_class="DeepArchive"))
+
+    assert fastq_projection['id'] == "fqr.01JABCDEFGHJKMNPQRSTVWXYZ0"
+    assert fastq_projection['readSet'] == {
+        "compressionFormat": "ORA",
+        "storageClasses": ["DeepArchive", "DeepArchive"],
+    }
+    assert fastq_projection['readCount'] == 400000000
+    assert fastq_projection['baseCountEst'] == 120000000000
+    assert fastq_projection['requirementFlags'] == {
+        "hasActiveReadSet": False,
+        "hasQc": True,
+        "hasFingerprint": True,
+        "hasFileCompressionInformation": False,
+        "hasReadCountInformation": True,
+    }
+
+
+def test_slim_projection_without_readset():
+    fastq_obj = get_large_fastq_obj()
+    fastq_obj['readSet'] = None
+
+    fastq_projection = get_fastq_projection(fastq_obj)
+
+    assert fastq_projection['readSet'] is None
+    assert fastq_projection['requirementFlags']['hasActiveReadSet'] is False
+
+
+def test_project_fastq_modes():
+    fastq_obj = get_large_fastq_obj()
+
+    assert project_fastq(fastq_obj, "FULL") is fastq_obj
+    assert project_fastq(fastq_obj, "SLIM") == get_fastq_projection(fastq_obj)
+
+    with pytest.raises(ValueError):
+        project_fastq(fastq_obj, "MEDIUM")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the lazy imports of the fastq_sync_tools package
+"""
+
+# Standard library imports
+import ast
+from importlib import import_module
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+import fastq_sync_tools
+
+
+def get_type_checking_imports() -> Dict[str, str]:
+    """
+    Attribute name -> module, for the imports under TYPE_CHECKING in the package __init__
+    """
+    module_tree = ast.parse(Path(fastq_sync_tools.__file__).read_text())
+
+    type_checking_imports: Dict[str, str] = {}
+    for node_iter_ in module_tree.body:
+        if isinstance(node_iter_, ast.If) and ast.unparse(node_iter_.test) == "typing.TYPE_CHECKING":
+            for import_iter_ in node_iter_.body:
+                for alias_iter_ in import_iter_.names:
+                    type_checking_imports[alias_iter_.name] = "." * import_iter_.level + import_iter_.module
+
+    return type_checking_imports
+
+
+def test_all_matches_lazy_imports():
+    assert fastq_sync_tools.__all__ == list(fastq_sync_tools._LAZY_IMPORTS.keys())
+    assert get_type_checking_imports() == fastq_sync_tools._LAZY_IMPORTS
+
+
+@pytest.mark.parametrize("name", fastq_sync_tools.__all__)
+def test_all_entries_resolve(name):
+    # Check the submodule directly, so attributes already cached on the package are checked too
+    assert hasattr(import_module(fastq_sync_tools._LAZY_IMPORTS[name], "fastq_sync_tools"), name)
+    assert getattr(fastq_sync_tools, name) is not None
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the requirement plan evaluation order and early stop
+"""
+
+# Standard library imports
+from typing import List
+
+import pytest
+
+from fastq_sync_tools import compile_requirement_plan, get_requirements_matrix
+from fastq_sync_tools.utils import requirement_plan
+
+
+def get_fastq_obj(storage_class: str = "Standard", has_qc: bool = True):
+    return {
+        "id": "fqr.01JABCDEFGHJKMNPQRSTVWXYZ0",
+        "readSet": {
+            "r1": {"storageClass": storage_class, "gzipCompressionSizeInBytes": 100, "rawMd5sum": "abc"},
+            "r2": {"storageClass": storage_class, "gzipCompressionSizeInBytes": 100, "rawMd5sum": "abc"},
+            "compressionFormat": "ORA",
+        },
+        "qc": {} if has_qc else None,
+        "ntsm": None,
+        "readCount": None,
+        "baseCountEst": None,
+    }
+
+
+@pytest.fixture
+def network_backed_evaluator_calls(monkeypatch) -> List[str]:
+    # Register a network-backed requirement that records each fastq it is called for
+    monkeypatch.setattr(
+        requirement_plan, "REQUIREMENT_EVALUATOR_REGISTRY", dict(requirement_plan.REQUIREMENT_EVALUATOR_REGISTRY)
+    )
+    calls: List[str] = []
+
+    def _evaluate(fastq_obj, context):
+        calls.append(fastq_obj['id'])
+        return True
+
+    requirement_plan.register_requirement_evaluator("hasNetworkCheck", _evaluate, is_network_backed=True)
+    yield calls
+
+
+def test_requirement_plan_order(network_backed_evaluator_calls):
+    plan = compile_requirement_plan(
+        ["hasNetworkCheck", "hasReadCountInformation", "hasQc", "hasActiveReadSet"],
+        is_unarchiving_allowed=True,
+    )
+
+    # Preconditions first, then local checks in registration order, network-backed checks last
+    assert list(map(lambda evaluator_iter_: evaluator_iter_.requirement, plan.evaluators)) == [
+        "hasActiveReadSet", "hasQc", "hasReadCountInformation", "hasNetworkCheck",
+    ]
+    # Split still returns the requirements in the order they were given
+    assert plan.split(get_fastq_obj()) == (
+        ["hasNetworkCheck", "hasQc", "hasActiveReadSet"], ["hasReadCountInformation"]
+    )
+
+
+def test_requirement_plan_stops_on_first_unsatisfied(network_backed_evaluator_calls):
+    plan = compile_requirement_plan(
+        ["hasNetworkCheck", "hasFingerprint", "hasQc", "hasActiveReadSet"],
+        is_unarchiving_allowed=True,
+    )
+
+    assert not plan.has_all_requirements(get_fastq_obj())
+    assert plan.split(get_fastq_obj(), stop_on_first_unsatisfied=True) == (
+        ["hasQc", "hasActiveReadSet"], ["hasFingerprint"]
+    )
+    # The network-backed check is never made for a fastq that already fails a local check
+    assert network_backed_evaluator_calls == []
+
+    plan = compile_requirement_plan(["hasNetworkCheck", "hasQc"])
+    assert plan.has_all_requirements(get_fastq_obj())
+    assert network_backed_evaluator_calls == [get_fastq_obj()["id"]]
+
+
+def test_requirement_plan_precondition_is_not_skipped():
+    # hasActiveReadSet still raises for an archived fastq, even though the fastq fails hasQc
+    plan = compile_requirement_plan(["hasQc", "hasActiveReadSet"])
+
+    with pytest.raises(ValueError):
+        plan.has_all_requirements(get_fastq_obj(storage_class="DeepArchive", has_qc=False))
+
+
+def test_requirements_matrix_stops_on_first_unsatisfied():
+    requirements_matrix = get_requirements_matrix(
+        [get_fastq_obj(has_qc=False)],
+        ["hasReadCountInformation", "hasQc", "hasActiveReadSet"],
+        stop_on_first_unsatisfied=True,
+    )
+
+    assert requirements_matrix == {get_fastq_obj()["id"]: {"hasActiveReadSet": True, "hasQc": False}}
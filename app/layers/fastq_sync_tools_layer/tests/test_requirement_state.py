@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Tests for skipping the fastqs already known to satisfy their requirements,
+run against the in-memory DynamoDB stand-in in fake_dynamodb.py
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+import pytest
+
+from fastq_sync_tools.utils import requirement_state, token_store
+from fastq_sync_tools.utils.requirement_state import (
+    get_known_satisfied_requirements,
+    get_requirements_matrix_with_requirement_state,
+)
+
+from fake_dynamodb import FakeDynamoDBClient
+
+TABLE_NAME = "FastqSyncTaskTokenTable"
+
+FASTQ_ID = "fqr.01JABCDEFGHJKMNPQRSTVWXYZ0"
+
+
+def get_fastq_obj(fastq_id: str = FASTQ_ID, storage_class: str = "Standard", has_qc: bool = True) -> Dict:
+    return {
+        "id": fastq_id,
+        "readSet": {
+            "r1": {"storageClass": storage_class, "gzipCompressionSizeInBytes": 1, "rawMd5sum": "abc"},
+            "r2": None,
+            "compressionFormat": "ORA",
+        },
+        "qc": {"insertSizeEstimate": 300} if has_qc else None,
+        "ntsm": None,
+        "readCount": 1000,
+        "baseCountEst": 150000,
+    }
+
+
+@pytest.fixture
+def client(monkeypatch, active_task_token_index_env):
+    client = FakeDynamoDBClient()
+    monkeypatch.setenv("FASTQ_SYNC_TASK_TOKEN_TABLE_NAME", TABLE_NAME)
+    monkeypatch.delenv("FASTQ_SYNC_REQUIREMENT_STATE_ENABLED", raising=False)
+    monkeypatch.delenv("FASTQ_SYNC_ACTIVE_READSET_STATE_TTL_SECONDS", raising=False)
+    monkeypatch.setattr(token_store, "get_dynamodb_client", lambda: client)
+    return client
+
+
+def test_known_fastq_is_not_fetched(client, fastq_manager):
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj()
+
+    first_requirements_matrix, _ = get_requirements_matrix_with_requirement_state(
+        [FASTQ_ID], ["hasActiveReadSet", "hasQc"]
+    )
+    second_requirements_matrix, failed_fastq_id_list = get_requirements_matrix_with_requirement_state(
+        [FASTQ_ID], ["hasActiveReadSet", "hasQc"]
+    )
+
+    assert fastq_manager.get_fastq_calls == [FASTQ_ID]
+    assert first_requirements_matrix == second_requirements_matrix == {
+        FASTQ_ID: {"hasActiveReadSet": True, "hasQc": True}
+    }
+    assert failed_fastq_id_list == []
+    # Written once, the second check did not change the state
+    assert client.call_counts["update_item"] == 1
+
+
+def test_unsatisfied_requirement_is_fetched(client, fastq_manager):
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj()
+
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasQc"])
+    requirements_matrix, _ = get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasQc", "hasFingerprint"])
+
+    assert fastq_manager.get_fastq_calls == [FASTQ_ID, FASTQ_ID]
+    assert requirements_matrix == {FASTQ_ID: {"hasQc": True, "hasFingerprint": False}}
+
+
+def test_satisfied_requirements_are_never_removed(client, fastq_manager):
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj()
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasFingerprint"])
+
+    # A stale read of the fastq, from before the qc was run
+    token_store.update_requirement_state_item_list([
+        requirement_state.get_requirement_state_from_fastq(get_fastq_obj(has_qc=False), checked_at=0)
+    ])
+
+    item = client.get_items(TABLE_NAME)[(FASTQ_ID, "REQUIREMENT_STATE")]
+    assert "hasQc" in item["satisfied_requirement_set"]["SS"]
+
+
+def test_archived_event_fastq_invalidates_active_readset(client, fastq_manager):
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj()
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasActiveReadSet"])
+
+    # A FastqStateChange event for the readset being archived
+    requirements_matrix, _ = get_requirements_matrix_with_requirement_state(
+        [FASTQ_ID], ["hasActiveReadSet", "hasFileCompressionInformation"],
+        is_unarchiving_allowed=True,
+        event_fastq_obj_list=[get_fastq_obj(storage_class="DeepArchive")],
+        event_time=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+
+    assert requirements_matrix == {FASTQ_ID: {"hasActiveReadSet": False, "hasFileCompressionInformation": False}}
+    item = client.get_items(TABLE_NAME)[(FASTQ_ID, "REQUIREMENT_STATE")]
+    assert item["has_active_readset"] == {"BOOL": False}
+    # Monotonic requirements are kept, but are no longer enough to skip the fastq
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj(storage_class="DeepArchive")
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasQc"])
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasFileCompressionInformation"])
+    assert fastq_manager.get_fastq_calls == [FASTQ_ID, FASTQ_ID]
+
+
+def test_out_of_order_event_fastq_is_fetched(client, fastq_manager):
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj(storage_class="DeepArchive")
+    now = datetime.now(timezone.utc)
+
+    # The readset is archived
+    get_requirements_matrix_with_requirement_state(
+        [FASTQ_ID], ["hasActiveReadSet"],
+        is_unarchiving_allowed=True,
+        event_fastq_obj_list=[get_fastq_obj(storage_class="DeepArchive")],
+        event_time=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+    item = client.get_items(TABLE_NAME)[(FASTQ_ID, "REQUIREMENT_STATE")]
+    assert item["last_event_at"] == {"N": str(int(now.replace(microsecond=0).timestamp()))}
+
+    # An earlier event, from before the readset was archived, arrives late
+    requirements_matrix, _ = get_requirements_matrix_with_requirement_state(
+        [FASTQ_ID], ["hasActiveReadSet"],
+        is_unarchiving_allowed=True,
+        event_fastq_obj_list=[get_fastq_obj()],
+        event_time=(now - timedelta(seconds=60)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+
+    assert fastq_manager.get_fastq_calls == [FASTQ_ID]
+    assert requirements_matrix == {FASTQ_ID: {"hasActiveReadSet": False}}
+
+
+def test_known_satisfied_requirements():
+    requirement_state_item = {
+        "fastqId": FASTQ_ID,
+        "satisfiedRequirementsList": ["hasQc", "hasFileCompressionInformation"],
+        "hasActiveReadSet": True,
+        "activeReadSetCheckedAt": 1000,
+        "lastEventAt": 0,
+    }
+
+    assert get_known_satisfied_requirements(requirement_state_item, now=1000) == [
+        "hasActiveReadSet", "hasQc", "hasFileCompressionInformation"
+    ]
+    # Readset availability in a context is not recorded
+    assert get_known_satisfied_requirements(
+        requirement_state_item, has_active_readset_context={"bucket": "bucket", "prefix": "prefix/"}, now=1000
+    ) == ["hasQc", "hasFileCompressionInformation"]
+    # The active readset is no longer trusted
+    assert get_known_satisfied_requirements(requirement_state_item, now=1000 + 60 * 60 + 1) == ["hasQc"]
+
+
+def test_requirement_state_disabled(client, fastq_manager, monkeypatch):
+    monkeypatch.setenv("FASTQ_SYNC_REQUIREMENT_STATE_ENABLED", "false")
+    fastq_manager.fastq_obj_by_id[FASTQ_ID] = get_fastq_obj()
+
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasQc"])
+    get_requirements_matrix_with_requirement_state([FASTQ_ID], ["hasQc"])
+
+    assert fastq_manager.get_fastq_calls == [FASTQ_ID, FASTQ_ID]
+    assert client.call_counts == {}
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the running job checks
+"""
+
+# Standard library imports
+from typing import Dict, List
+
+import pytest
+
+from fastq_sync_tools.utils import running_jobs
+from fastq_sync_tools.utils.fastq_error_cache import get_not_found_fastq_id_list
+from fastq_sync_tools.utils.running_jobs import check_running_jobs_for_fastq_id_list
+
+from conftest import get_http_error
+
+
+@pytest.fixture
+def job_services(monkeypatch, fastq_manager):
+    # Fastq id -> fastq manager job statuses, and the fastq ids with active unarchiving jobs
+    services: Dict[str, Dict] = {
+        "fastq_jobs": {},
+        "unarchiving_fastq_id_list": [],
+        "active_workflow_runs": [],
+        "list_workflow_runs_calls": 0,
+    }
+
+    def _get_fastq_jobs(fastq_id: str) -> List[Dict]:
+        if fastq_id.startswith("deleted"):
+            raise get_http_error(404)
+        return [{"status": status_iter_} for status_iter_ in services["fastq_jobs"].get(fastq_id, [])]
+
+    def _list_workflow_runs(workflow_name: str, current_status: str) -> List[Dict]:
+        services["list_workflow_runs_calls"] += 1
+        if current_status != "RUNNING":
+            return []
+        return [{"orcabusId": f"wfr.{workflow_name}"}] if workflow_name == "bclconvert" else []
+
+    def _get_workflow_run(orcabus_id: str) -> Dict:
+        return {"libraries": [{"libraryId": library_id} for library_id in services["active_workflow_runs"]]}
+
+    monkeypatch.setattr(running_jobs, "get_fastq_jobs_with_error_cache", _get_fastq_jobs)
+    monkeypatch.setattr(
+        running_jobs, "get_fastq_id_list_with_active_unarchiving_jobs",
+        lambda fastq_id_list: [
+            fastq_id for fastq_id in fastq_id_list if fastq_id in services["unarchiving_fastq_id_list"]
+        ]
+    )
+    monkeypatch.setattr(running_jobs, "list_workflow_runs", _list_workflow_runs)
+    monkeypatch.setattr(running_jobs, "get_workflow_run", _get_workflow_run)
+    monkeypatch.setattr(running_jobs, "LIBRARY_ID_TO_ACTIVE_WORKFLOW_RUN_INDEX", None)
+    yield services
+
+
+def test_no_jobs_running(job_services, fastq_manager):
+    fastq_id_list = [f"fqr.{i}" for i in range(5)] + ["deleted-1"]
+    for fastq_id in fastq_id_list:
+        fastq_manager.fastq_obj_by_id[fastq_id] = {"id": fastq_id, "library": {"libraryId": f"L{fastq_id}"}}
+    job_services["fastq_jobs"]["fqr.0"] = ["SUCCEEDED", "FAILED"]
+
+    assert not check_running_jobs_for_fastq_id_list(fastq_id_list)
+    # The active workflow run index is only built once, for all fastqs
+    assert job_services["list_workflow_runs_calls"] == 8
+
+
+@pytest.mark.parametrize("job_source", ["fastqManagerJobs", "unarchivingJobs", "workflowRuns"])
+def test_jobs_running(job_services, fastq_manager, job_source):
+    fastq_id_list = [f"fqr.{i}" for i in range(5)]
+    for fastq_id in fastq_id_list:
+        fastq_manager.fastq_obj_by_id[fastq_id] = {"id": fastq_id, "library": {"libraryId": f"L{fastq_id}"}}
+
+    if job_source == "fastqManagerJobs":
+        job_services["fastq_jobs"]["fqr.3"] = ["RUNNING"]
+    elif job_source == "unarchivingJobs":
+        job_services["unarchiving_fastq_id_list"].append("fqr.3")
+    else:
+        job_services["active_workflow_runs"].append("Lfqr.3")
+
+    assert check_running_jobs_for_fastq_id_list(fastq_id_list)
+
+
+def test_jobs_running_reports_every_fastq_not_found(job_services, fastq_manager):
+    # The unarchiving check answers first, the fastqs that do not exist are still all looked up
+    fastq_manager.delay_seconds = 0.05
+    fastq_id_list = ["fqr.1"] + [f"deleted-{i}" for i in range(10)]
+    job_services["unarchiving_fastq_id_list"].append("fqr.1")
+
+    assert check_running_jobs_for_fastq_id_list(fastq_id_list)
+    assert get_not_found_fastq_id_list(fastq_id_list) == [f"deleted-{i}" for i in range(10)]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""
+Tests for registering and unregistering task tokens against their fastq ids,
+run against the in-memory DynamoDB stand-in in fake_dynamodb.py
+"""
+
+import pytest
+
+from fastq_sync_tools import TaskTokenStoreError
+from fastq_sync_tools.utils import token_store
+from fastq_sync_tools.utils.token_store import (
+    get_task_token_table_version,
+    mark_fastq_id_satisfied,
+    migrate_task_token_table,
+    register_task_token,
+    register_task_token_list,
+    unregister_task_token,
+)
+
+from fake_dynamodb import FakeDynamoDBClient
+
+TABLE_NAME = "FastqSyncTaskTokenTable"
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(monkeypatch, active_task_token_index_env):
+    monkeypatch.setenv("FASTQ_SYNC_TASK_TOKEN_TABLE_NAME", TABLE_NAME)
+    monkeypatch.setattr(token_store, "_sleep_before_retry", lambda attempt: None)
+
+
+@pytest.fixture
+def client():
+    return FakeDynamoDBClient()
+
+
+def get_fastq_id_list(size: int):
+    return [f"fqr.TEST{index_iter_:06d}" for index_iter_ in range(size)]
+
+
+def get_task_token_set(client: FakeDynamoDBClient, fastq_id: str):
+    item = client.get_items(TABLE_NAME).get((fastq_id, "FASTQ_ID"), None)
+    if item is None:
+        return None
+    return set(item.get("task_token_set", {}).get("SS", []))
+
+
+def test_register_task_token_list(client):
+    fastq_id_list = get_fastq_id_list(250)
+
+    register_task_token_list(["token-a", "token-b"], fastq_id_list, ["hasQc"], client=client)
+
+    # 2 task token rows + 250 fastq id rows, at most 100 per transaction
+    assert client.call_counts == {"transact_write_items": 3}
+
+    for task_token_iter_ in ["token-a", "token-b"]:
+        item = client.get_items(TABLE_NAME)[(task_token_iter_, "TASK_TOKEN")]
+        assert set(item["fastq_id_set"]["SS"]) == set(fastq_id_list)
+        assert item["remaining_count"] == {"N": "250"}
+        assert item["task_token_status"] == {"S": "ACTIVE"}
+
+    assert all(map(
+        lambda fastq_id_iter_: get_task_token_set(client, fastq_id_iter_) == {"token-a", "token-b"},
+        fastq_id_list
+    ))
+
+
+def test_register_task_token_list_keeps_existing_task_tokens(client):
+    fastq_id_list = get_fastq_id_list(3)
+    register_task_token_list(["token-a"], fastq_id_list[:2], ["hasQc"], client=client)
+
+    register_task_token_list(["token-b"], fastq_id_list, ["hasQc"], client=client)
+
+    assert get_task_token_set(client, fastq_id_list[0]) == {"token-a", "token-b"}
+    assert get_task_token_set(client, fastq_id_list[2]) == {"token-b"}
+
+
+def test_register_task_token_list_is_idempotent(client):
+    fastq_id_list = get_fastq_id_list(3)
+
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+
+    assert len(client.get_items(TABLE_NAME)) == 4
+    assert get_task_token_set(client, fastq_id_list[0]) == {"token-a"}
+
+
+def test_register_task_token_list_retries_cancelled_transactions(client):
+    client.cancelled_transaction_rounds = 2
+
+    register_task_token_list(["token-a"], get_fastq_id_list(3), ["hasQc"], client=client)
+
+    assert client.call_counts["transact_write_items"] == 3
+    assert len(client.get_items(TABLE_NAME)) == 4
+
+
+def test_register_task_token_list_gives_up(client):
+    client.cancelled_transaction_rounds = token_store.MAX_BATCH_ATTEMPTS
+
+    with pytest.raises(TaskTokenStoreError):
+        register_task_token_list(["token-a"], get_fastq_id_list(3), ["hasQc"], client=client)
+
+
+def test_register_task_token_list_validation(client):
+    with pytest.raises(ValueError):
+        register_task_token_list([], get_fastq_id_list(3), ["hasQc"], client=client)
+
+    with pytest.raises(ValueError):
+        register_task_token_list(["token-a"], [], ["hasQc"], client=client)
+
+
+def test_unregister_task_token(client):
+    fastq_id_list = get_fastq_id_list(250)
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+    register_task_token_list(["token-b"], fastq_id_list[:10], ["hasQc"], client=client)
+    client.call_counts.clear()
+
+    unregister_task_token("token-a", fastq_id_list, client=client)
+
+    # 250 fastq ids at most 100 per read and per transaction
+    assert client.call_counts == {"delete_item": 1, "batch_get_item": 3, "transact_write_items": 3}
+
+    assert ("token-a", "TASK_TOKEN") not in client.get_items(TABLE_NAME)
+    assert ("token-b", "TASK_TOKEN") in client.get_items(TABLE_NAME)
+    # Fastq ids shared with token-b keep their row, the rest are deleted
+    assert all(map(
+        lambda fastq_id_iter_: get_task_token_set(client, fastq_id_iter_) == {"token-b"},
+        fastq_id_list[:10]
+    ))
+    assert all(map(
+        lambda fastq_id_iter_: get_task_token_set(client, fastq_id_iter_) is None,
+        fastq_id_list[10:]
+    ))
+
+
+def test_unregister_task_token_skips_missing_fastq_ids(client):
+    fastq_id_list = get_fastq_id_list(3)
+    register_task_token_list(["token-a"], fastq_id_list[:1], ["hasQc"], client=client)
+    register_task_token_list(["token-b"], fastq_id_list[1:2], ["hasQc"], client=client)
+
+    unregister_task_token("token-a", fastq_id_list, client=client)
+
+    assert get_task_token_set(client, fastq_id_list[0]) is None
+    # Not registered against token-a, so left alone
+    assert get_task_token_set(client, fastq_id_list[1]) == {"token-b"}
+
+
+def test_unregister_task_token_retries_unprocessed_keys(client):
+    fastq_id_list = get_fastq_id_list(8)
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+    client.unprocessed_key_rounds = 2
+    client.call_counts.clear()
+
+    unregister_task_token("token-a", fastq_id_list, client=client)
+
+    assert client.call_counts["batch_get_item"] == 3
+    assert len(client.get_items(TABLE_NAME)) == 0
+
+
+def test_unregister_task_token_rereads_rows_after_a_concurrent_write(client):
+    fastq_id_list = get_fastq_id_list(3)
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+
+    # Another task token is registered against the first fastq id between our read and our write,
+    # so our delete of that fastq id row must not go through
+    def _register_token_b():
+        client.before_transact_write_items = None
+        register_task_token_list(["token-b"], fastq_id_list[:1], ["hasQc"], client=client)
+
+    client.before_transact_write_items = _register_token_b
+
+    unregister_task_token("token-a", fastq_id_list, client=client)
+
+    assert get_task_token_set(client, fastq_id_list[0]) == {"token-b"}
+    assert get_task_token_set(client, fastq_id_list[1]) is None
+    assert get_task_token_set(client, fastq_id_list[2]) is None
+
+
+def test_unregister_task_token_gives_up(client):
+    fastq_id_list = get_fastq_id_list(3)
+    register_task_token_list(["token-a"], fastq_id_list, ["hasQc"], client=client)
+    client.cancelled_transaction_rounds = token_store.MAX_BATCH_ATTEMPTS
+
+    with pytest.raises(TaskTokenStoreError):
+        unregister_task_token("token-a", fastq_id_list, client=client)
+
+
+def test_register_task_token_matches_register_task_token_list(client):
+    fastq_id_list = get_fastq_id_list(3)
+
+    register_task_token("token-a", fastq_id_list, ["hasQc", "hasQc"], client=client)
+    register_task_token_list(["token-b"], fastq_id_list, ["hasQc", "hasQc"], client=client)
+
+    item_a = client.get_items(TABLE_NAME)[("token-a", "TASK_TOKEN")]
+    item_b = client.get_items(TABLE_NAME)[("token-b", "TASK_TOKEN")]
+    # Registered a moment apart, so the expiry times may differ by a second
+    assert {**item_a, "id": None, "expiresAt": None} == {**item_b, "id": None, "expiresAt": None}
+
+
+def test_migrate_task_token_table(client):
+    register_task_token("task-token-1", get_fastq_id_list(2), ["hasQc"], client=client)
+    # A task token row written before the active task token index and the remaining count existed
+    client.get_items(TABLE_NAME)[("task-token-1", "TASK_TOKEN")].pop("task_token_status")
+    client.get_items(TABLE_NAME)[("task-token-1", "TASK_TOKEN")].pop("remaining_count")
+
+    assert migrate_task_token_table(client=client) == 2
+    assert client.get_items(TABLE_NAME)[("task-token-1", "TASK_TOKEN")]["task_token_status"] == {"S": "ACTIVE"}
+    assert client.get_items(TABLE_NAME)[("task-token-1", "TASK_TOKEN")]["remaining_count"] == {"N": "2"}
+    assert get_task_token_table_version(client=client) == len(token_store.TASK_TOKEN_TABLE_MIGRATION_LIST)
+
+    # Once migrated, the table is not scanned again
+    assert migrate_task_token_table(client=client) == 0
+    assert client.call_counts["scan"] == 2
+
+
+@pytest.mark.parametrize("has_remaining_count", [True, False])
+def test_mark_fastq_id_satisfied(client, has_remaining_count):
+    fastq_id_list = get_fastq_id_list(2)
+    register_task_token("task-token-1", fastq_id_list, ["hasQc"], client=client)
+    if not has_remaining_count:
+        # A task token row written before the remaining count existed
+        client.get_items(TABLE_NAME)[("task-token-1", "TASK_TOKEN")].pop("remaining_count")
+
+    assert mark_fastq_id_satisfied("task-token-1", fastq_id_list[0], client=client) == 1
+    # Repeat events are a no-op
+    assert mark_fastq_id_satisfied("task-token-1", fastq_id_list[0], client=client) is None
+    assert mark_fastq_id_satisfied("task-token-1", fastq_id_list[1], client=client) == 0
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the active unarchiving job lookups
+"""
+
+# Standard library imports
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from fastq_sync_tools.utils import unarchiving_helpers
+from fastq_sync_tools.utils.unarchiving_helpers import (
+    get_active_unarchiving_jobs_for_fastq_id_list,
+    get_fastq_id_list_with_active_unarchiving_jobs,
+)
+
+
+def test_active_unarchiving_jobs_are_queried_per_fastq_id(monkeypatch):
+    unarchiving_jobs = [
+        {"id": "ufj.1", "fastqIds": ["fqr.1", "fqr.2"], "status": "RUNNING"},
+        {"id": "ufj.2", "fastqIds": ["fqr.3"], "status": "SUCCEEDED"},
+        {"id": "ufj.3", "fastqIds": ["fqr.other"], "status": "PENDING"},
+    ]
+    calls: List[Tuple[str, Optional[str]]] = []
+    calls_lock = Lock()
+
+    def _get_job_list_for_fastq(fastq_id: str, job_status: Optional[str] = None) -> List[Dict]:
+        with calls_lock:
+            calls.append((fastq_id, job_status))
+        return list(filter(
+            lambda job_iter_: fastq_id in job_iter_["fastqIds"] and job_iter_["status"] == job_status,
+            unarchiving_jobs
+        ))
+
+    monkeypatch.setattr(unarchiving_helpers, "get_unarchiving_job_list_for_fastq", _get_job_list_for_fastq)
+
+    fastq_id_list = ["fqr.1", "fqr.2", "fqr.3", "fqr.1"]
+    assert get_active_unarchiving_jobs_for_fastq_id_list(fastq_id_list) == {
+        "fqr.1": [unarchiving_jobs[0]],
+        "fqr.2": [unarchiving_jobs[0]],
+        "fqr.3": [],
+    }
+    # One filtered query per unique fastq id and active status, we never list every job in the account
+    assert sorted(calls) == sorted(
+        (fastq_id, job_status)
+        for fastq_id in ["fqr.1", "fqr.2", "fqr.3"]
+        for job_status in ["PENDING", "RUNNING"]
+    )
+
+    assert get_fastq_id_list_with_active_unarchiving_jobs(fastq_id_list) == ["fqr.1", "fqr.2"]
+    assert get_active_unarchiving_jobs_for_fastq_id_list([]) == {}
@@ -9,6 +9,10 @@ export const LAYERS_ROOT = path.join(APP_ROOT, 'layers');
 
 // Table constants
 export const FASTQ_SYNC_TASK_TOKEN_TABLE_NAME = 'FastqSyncTaskTokenTable';
+// Sparse index over the task token rows only (the index key attribute is only set on task token rows)
+export const ACTIVE_TASK_TOKEN_INDEX_NAME = 'ActiveTaskTokenIndex';
+export const ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME = 'task_token_status';
+export const ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE = 'ACTIVE';
 
 // Event constants
 export const FASTQ_SYNC_EVENT_DETAIL_TYPE = 'FastqSync';
@@ -24,6 +28,10 @@ export const FASTQ_UNARCHIVING_MANAGER_EVENT_SOURCE = 'orcabus.fastqunarchiving'
 // Event rule constants
 export const HEART_BEAT_SCHEDULER_RULE_NAME = 'heartbeatFastqSyncJobsScheduler';
 export const DEFAULT_HEART_BEAT_INTERVAL = Duration.seconds(900); // 15 minutes in seconds
+// Task tokens with no fastq updates since their last evaluation are only fully re-evaluated
+// once this much time has passed (to catch changes that do not raise a fastq event).
+// Until then, tokens with jobs running are heartbeated, and tokens with no jobs running only have their requirements re-checked
+export const DEFAULT_FULL_REEVALUATION_INTERVAL = Duration.hours(1);
 
 // Slack Topic Name
 export const DEFAULT_SLACK_TOPIC_NAME = 'AwsChatBotTopic';
@@ -32,6 +40,10 @@ export const DEFAULT_SLACK_TOPIC_NAME = 'AwsChatBotTopic';
 export const DEFAULT_SQS_QUEUE_NAME = 'FastqSyncRequestQueue';
 export const DEFAULT_QUEUE_TIMEOUT = Duration.seconds(360);
 export const DEFAULT_MAX_FASTQ_SYNC_REQUEST_CONCURRENCY = 20;
+// Each handleMessages invocation runs up to this many requests in parallel durable branches
+// Matching requests that arrive within the same batching window are coalesced into one evaluation
+export const DEFAULT_FASTQ_SYNC_REQUEST_BATCH_SIZE = 10;
+export const DEFAULT_FASTQ_SYNC_REQUEST_MAX_BATCHING_WINDOW = Duration.seconds(5);
 
 // Step functions constants
 export const STACK_PREFIX = 'fastq-sync';
@@ -7,6 +7,7 @@ import {
 } from '@orcabus/platform-cdk-constructs/dynamodb/config';
 import { RemovalPolicy } from 'aws-cdk-lib';
 import { TaskTokenTableProps } from './interfaces';
+import { ACTIVE_TASK_TOKEN_INDEX_NAME, ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME } from '../constants';
 
 export function buildTaskTokenTable(scope: Construct, props: TaskTokenTableProps): TableV2 {
   return new dynamodb.TableV2(scope, props.tableName, {
@@ -22,6 +23,24 @@ export function buildTaskTokenTable(scope: Construct, props: TaskTokenTableProps
       name: DEFAULT_SORT_KEY_NAME,
       type: dynamodb.AttributeType.STRING,
     },
+    /* Sparse index of active task tokens */
+    // Only task token rows have the index partition key attribute,
+    // so the heartbeat monitor can list tokens without scanning the fastq id rows
+    globalSecondaryIndexes: [
+      {
+        indexName: ACTIVE_TASK_TOKEN_INDEX_NAME,
+        partitionKey: {
+          name: ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME,
+          type: dynamodb.AttributeType.STRING,
+        },
+        sortKey: {
+          name: DEFAULT_PARTITION_KEY_NAME,
+          type: dynamodb.AttributeType.STRING,
+        },
+        // Task token rows are small, and the heartbeat monitor needs the dirty tracking attributes too
+        projectionType: dynamodb.ProjectionType.ALL,
+      },
+    ],
     /* Backup / removal policies */
     // This table is used for task tokens, which are ephemeral and should not persist beyond their lifecycle.
     // So we set the removal policy to DESTROY.
@@ -23,6 +23,9 @@ function buildFastqIdUpdatedTargetFastqStateChange(props: AddSfnAsEventBridgeTar
     new eventsTargets.SfnStateMachine(props.stateMachineObj, {
       input: events.RuleTargetInput.fromObject({
         fastqIdList: [EventField.fromPath('$.detail.id')],
+        // The event detail is the updated fastq, so we can evaluate requirements without another get_fastq call
+        fastqObjList: [EventField.fromPath('$.detail')],
+        eventTime: EventField.fromPath('$.time'),
       }),
     })
   );
@@ -15,6 +15,11 @@ import * as iam from 'aws-cdk-lib/aws-iam';
 import { camelCaseToSnakeCase } from '../utils';
 import { getPythonUvDockerImage, PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
 import {
+  ACTIVE_TASK_TOKEN_INDEX_NAME,
+  ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME,
+  ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE,
+  DEFAULT_FASTQ_SYNC_REQUEST_BATCH_SIZE,
+  DEFAULT_FASTQ_SYNC_REQUEST_MAX_BATCHING_WINDOW,
   DEFAULT_MAX_FASTQ_SYNC_REQUEST_CONCURRENCY,
   LAMBDA_ROOT,
   LAYERS_ROOT,
@@ -35,7 +40,9 @@ function buildLambda(scope: Construct, props: LambdaProps): LambdaObject {
     architecture: lambda.Architecture.ARM_64,
     index: lambdaNameToSnakeCase + '.py',
     handler: 'handler',
-    timeout: props.lambdaName === 'handleMessages' ? Duration.seconds(300) : Duration.seconds(60),
+    timeout: ['handleMessages', 'launchRequirementsForFastqIdList'].includes(props.lambdaName)
+      ? Duration.seconds(300)
+      : Duration.seconds(60),
     memorySize: 2048,
     includeOrcabusApiToolsLayer: lambdaRequirements.needsOrcabusApiToolsLayer,
     durableConfig: lambdaRequirements.needsDurableFunctionWrapper
@@ -71,8 +78,11 @@ function buildLambda(scope: Construct, props: LambdaProps): LambdaObject {
     lambdaFunction.currentVersion.addEventSource(
       new SqsEventSource(props.sqsQueue, {
         maxConcurrency: DEFAULT_MAX_FASTQ_SYNC_REQUEST_CONCURRENCY,
-        // Allow only one message per batch to be processed
-        batchSize: 1,
+        // Each invocation handles a batch of messages in parallel durable branches
+        batchSize: DEFAULT_FASTQ_SYNC_REQUEST_BATCH_SIZE,
+        maxBatchingWindow: DEFAULT_FASTQ_SYNC_REQUEST_MAX_BATCHING_WINDOW,
+        // Only the failed messages in a batch are returned to the queue
+        reportBatchItemFailures: true,
       })
     );
   }
@@ -94,6 +104,7 @@ function buildLambda(scope: Construct, props: LambdaProps): LambdaObject {
       'checkFastqIdListAgainstRequirements',
       'getFastqAndRemainingRequirements',
       'launchRequirementJob',
+      'launchRequirementsForFastqIdList',
     ].includes(props.lambdaName)
   ) {
     lambdaFunction.addEnvironment('PIPELINE_CACHE_BUCKET', props.pipelineCacheBucket);
@@ -103,6 +114,22 @@ function buildLambda(scope: Construct, props: LambdaProps): LambdaObject {
     lambdaFunction.addEnvironment('TEST_DATA_PREFIX', props.testDataPrefix);
   }
 
+  // Read and write the task token table
+  if (lambdaRequirements.needsDbAccess) {
+    props.tableObj.grantReadWriteData(lambdaFunction);
+    lambdaFunction.addEnvironment('FASTQ_SYNC_TASK_TOKEN_TABLE_NAME', props.tableObj.tableName);
+    // The same index settings are substituted into the step function templates
+    lambdaFunction.addEnvironment('FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_NAME', ACTIVE_TASK_TOKEN_INDEX_NAME);
+    lambdaFunction.addEnvironment(
+      'FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME',
+      ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME
+    );
+    lambdaFunction.addEnvironment(
+      'FASTQ_SYNC_ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE',
+      ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE
+    );
+  }
+
   // Needs Callback Permissions
   if (lambdaRequirements.needsCallbackPermissions) {
     // Grant write permissions to allow the lambda to unlock durable executions
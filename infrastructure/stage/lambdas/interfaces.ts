@@ -1,11 +1,13 @@
 import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
 import { LayerVersion } from 'aws-cdk-lib/aws-lambda';
 import { IQueue } from 'aws-cdk-lib/aws-sqs';
+import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
 import { StepFunctionsName } from '../step-functions/interfaces';
 
 export type LambdaName =
   // Shared function
   | 'checkFastqIdListAgainstRequirements'
+  | 'updateTaskTokenStore'
   // Initialise task token
   | 'unlockCallbackId'
   // External Heartbeat monitor
@@ -13,12 +15,15 @@ export type LambdaName =
   // Launch Fastq List Row Requirements
   | 'getFastqAndRemainingRequirements'
   | 'launchRequirementJob'
+  // Batch launch requirements
+  | 'launchRequirementsForFastqIdList'
   // Non sfn functions
   | 'handleMessages';
 
 export const lambdaNameList: LambdaName[] = [
   // Shared function
   'checkFastqIdListAgainstRequirements',
+  'updateTaskTokenStore',
   // Initialise task token
   'unlockCallbackId',
   // External Heartbeat monitor
@@ -26,6 +31,8 @@ export const lambdaNameList: LambdaName[] = [
   // Launch Fastq List Row Requirements
   'getFastqAndRemainingRequirements',
   'launchRequirementJob',
+  // Batch launch requirements
+  'launchRequirementsForFastqIdList',
   // Non sfn functions
   'handleMessages',
 ];
@@ -35,6 +42,7 @@ export interface LambdaRequirements {
   needsFastqSyncLayer?: boolean;
   needsDurableFunctionWrapper?: boolean;
   needsCallbackPermissions?: boolean;
+  needsDbAccess?: boolean;
 }
 
 export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
@@ -42,14 +50,21 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
   checkFastqIdListAgainstRequirements: {
     needsOrcabusApiToolsLayer: true,
     needsFastqSyncLayer: true,
+    needsDbAccess: true,
+  },
+  updateTaskTokenStore: {
+    needsFastqSyncLayer: true,
+    needsDbAccess: true,
   },
   // Initialise task token
   unlockCallbackId: {
+    needsFastqSyncLayer: true,
     needsCallbackPermissions: true,
   },
   // External Heartbeat monitor
   checkRunningJobsForFastqIdList: {
     needsOrcabusApiToolsLayer: true,
+    needsFastqSyncLayer: true,
   },
   // Launch Fastq List Row Requirements
   getFastqAndRemainingRequirements: {
@@ -60,8 +75,14 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsOrcabusApiToolsLayer: true,
     needsFastqSyncLayer: true,
   },
+  // Batch launch requirements
+  launchRequirementsForFastqIdList: {
+    needsOrcabusApiToolsLayer: true,
+    needsFastqSyncLayer: true,
+  },
   // Non sfn functions
   handleMessages: {
+    needsFastqSyncLayer: true,
     needsDurableFunctionWrapper: true,
   },
 };
@@ -69,6 +90,7 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
 export interface BuildAllLambdaProps {
   fastqSyncLayer: LayerVersion;
   sqsQueue: IQueue;
+  tableObj: ITableV2;
   initialiseTaskTokenForFastqIdListSfnName: StepFunctionsName;
   pipelineCacheBucket: string;
   pipelineCachePrefix: string;
@@ -11,6 +11,7 @@ import * as sqs from 'aws-cdk-lib/aws-sqs';
 import { buildAllEventRules } from './event-rules';
 import { buildAllEventBridgeTargets } from './event-targets';
 import { IQueue } from 'aws-cdk-lib/aws-sqs';
+import { ACTIVE_TASK_TOKEN_INDEX_NAME } from './constants';
 
 export type StatelessApplicationStackProps = cdk.StackProps & StatelessApplicationConfig;
 
@@ -26,7 +27,11 @@ export class StatelessApplicationStack extends GitStack {
     const eventBus = events.EventBus.fromEventBusName(this, 'event-bus', props.eventBusName);
 
     // Get the table from the props
-    const tableObj = dynamodb.TableV2.fromTableName(this, 'table', props.tableName);
+    // We import the table with its indexes so that table grants also cover the index
+    const tableObj = dynamodb.TableV2.fromTableAttributes(this, 'table', {
+      tableName: props.tableName,
+      globalIndexes: [ACTIVE_TASK_TOKEN_INDEX_NAME],
+    });
 
     // Get the internal SQS Queue from props
     const sqsQueue: IQueue = sqs.Queue.fromQueueArn(
@@ -42,6 +47,7 @@ export class StatelessApplicationStack extends GitStack {
     const lambdaObjects = buildAllLambdas(this, {
       fastqSyncLayer: fastqSyncToolsLayer,
       sqsQueue: sqsQueue,
+      tableObj: tableObj,
       initialiseTaskTokenForFastqIdListSfnName: 'initialiseTaskTokenForFastqIdList',
       ...props,
     });
@@ -23,7 +23,15 @@ import {
 } from './interfaces';
 import { camelCaseToSnakeCase } from '../utils';
 import { NagSuppressions } from 'cdk-nag';
-import { HEART_BEAT_SCHEDULER_RULE_NAME, STACK_PREFIX, STEP_FUNCTIONS_ROOT } from '../constants';
+import {
+  ACTIVE_TASK_TOKEN_INDEX_NAME,
+  ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME,
+  ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE,
+  DEFAULT_FULL_REEVALUATION_INTERVAL,
+  HEART_BEAT_SCHEDULER_RULE_NAME,
+  STACK_PREFIX,
+  STEP_FUNCTIONS_ROOT,
+} from '../constants';
 import { StateMachine } from 'aws-cdk-lib/aws-stepfunctions';
 import { LambdaObject } from '../lambdas/interfaces';
 
@@ -50,6 +58,11 @@ function createStateMachineDefinitionSubstitutions(props: SfnProps): {
   if (sfnRequirements.needsDbAccess) {
     definitionSubstitutions['__task_token_sort_key__'] = 'TASK_TOKEN';
     definitionSubstitutions['__dynamodb_table_name__'] = props.tableObj.tableName;
+    definitionSubstitutions['__active_task_token_index_name__'] = ACTIVE_TASK_TOKEN_INDEX_NAME;
+    definitionSubstitutions['__active_task_token_index_partition_key__'] =
+      ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_NAME;
+    definitionSubstitutions['__active_task_token_index_partition_key_value__'] =
+      ACTIVE_TASK_TOKEN_INDEX_PARTITION_KEY_VALUE;
   }
 
   if (sfnRequirements.needsSfnExecutionAccess) {
@@ -61,6 +74,8 @@ function createStateMachineDefinitionSubstitutions(props: SfnProps): {
 
   if (sfnRequirements.needsHeartBeatRuleSwitchAccess) {
     definitionSubstitutions['__heartbeat_scheduler_rule_name__'] = HEART_BEAT_SCHEDULER_RULE_NAME;
+    definitionSubstitutions['__full_reevaluation_interval_seconds__'] =
+      DEFAULT_FULL_REEVALUATION_INTERVAL.toSeconds().toString();
   }
 
   if (sfnRequirements.needsSqsSendMessagePermissions) {
@@ -47,8 +47,6 @@ export const stepFunctionsRequirementsMap: Record<StepFunctionsName, StepFunctio
     needsSqsSendMessagePermissions: true,
   },
   initialiseTaskTokenForFastqIdList: {
-    needsDbAccess: true,
-    needsSfnExecutionAccess: true,
     needsSendTaskExecutionAccess: true,
     needsHeartBeatRuleSwitchAccess: true,
   },
@@ -57,7 +55,6 @@ export const stepFunctionsRequirementsMap: Record<StepFunctionsName, StepFunctio
   // Listen to fastq related events to release task tokens
   fastqIdUpdated: {
     needsDbAccess: true,
-    needsSfnExecutionAccess: true,
     needsSendTaskExecutionAccess: true,
   },
   // External heartbeat monitoring
@@ -72,12 +69,18 @@ export const stepFunctionsRequirementsMap: Record<StepFunctionsName, StepFunctio
 // Map the lambda functions to their step function names
 export const stepFunctionLambdaMap: Record<StepFunctionsName, LambdaName[]> = {
   sendFastqSyncRequestToQueue: [],
-  initialiseTaskTokenForFastqIdList: ['checkFastqIdListAgainstRequirements', 'unlockCallbackId'],
+  initialiseTaskTokenForFastqIdList: [
+    'checkFastqIdListAgainstRequirements',
+    'updateTaskTokenStore',
+    'unlockCallbackId',
+    'launchRequirementsForFastqIdList',
+  ],
   launchFastqListRowRequirements: ['getFastqAndRemainingRequirements', 'launchRequirementJob'],
-  fastqIdUpdated: ['checkFastqIdListAgainstRequirements'],
+  fastqIdUpdated: ['checkFastqIdListAgainstRequirements', 'launchRequirementsForFastqIdList'],
   externalHeartbeatMonitor: [
     'checkRunningJobsForFastqIdList',
     'checkFastqIdListAgainstRequirements',
+    'updateTaskTokenStore',
   ],
 };
 